@@ -1,9 +1,23 @@
 from django.contrib import admin
-from .models import User
+from .models import AccountPurge, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ("id", "username", "email", "is_staff", "date_joined")
+    list_display = ("id", "username", "email", "is_active", "is_staff", "date_joined")
     search_fields = ("username", "email")
 
+@admin.register(AccountPurge)
+class AccountPurgeAdmin(admin.ModelAdmin):
+    list_display = ("account_id", "username", "progress_display", "reviews_deleted", "reactions_deleted",
+                    "requested_at", "finished_at")
+    search_fields = ("username",)
+    readonly_fields = [field.name for field in AccountPurge._meta.fields]
+
+    @admin.display(description="progress")
+    def progress_display(self, obj):
+        return f"{obj.progress:.0%}"
+
+    def has_add_permission(self, request):
+        return False
+
 # Register your models here.
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount every user's review/reaction counters from the source tables. "
+        "Run after bulk imports or any write that bypasses model signals."
+    )
+
+    def handle(self, *args, **options):
+        updated = stats.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed stats for {updated} users."))
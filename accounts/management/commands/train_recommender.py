@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from accounts import recommendations
+
+
+class Command(BaseCommand):
+    help = "Train the latent-factor recommendation model (weighted ALS) and publish it for /auth/me/recommendations/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, default=32)
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--reg", type=float, default=1.0, help="L2 regularisation of the factor vectors.")
+        parser.add_argument("--workers", type=int, default=None, help="Threads used per ALS half-step (default: all cores).")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        model = recommendations.train(
+            factors=options["factors"],
+            iterations=options["iterations"],
+            reg=options["reg"],
+            workers=options["workers"],
+            seed=options["seed"],
+            log=self.stdout.write,
+        )
+        version = recommendations.save(model)
+        self.stdout.write(json.dumps(model["meta"], indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f"Published model {version}: {len(model['user_ids'])} users x {len(model['movie_ids'])} movies."
+        ))
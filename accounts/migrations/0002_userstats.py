@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_stats(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserStats = apps.get_model('accounts', 'UserStats')
+    Review = apps.get_model('reviews', 'Review')
+    Reaction = apps.get_model('reviews', 'Reaction')
+
+    UserStats.objects.bulk_create([UserStats(user_id=pk) for pk in User.objects.values_list('pk', flat=True)])
+    reviews = Review.objects.filter(user=OuterRef('user_id')).order_by().values('user')
+    received = Reaction.objects.filter(review__user=OuterRef('user_id')).order_by().values('review__user')
+    given = Reaction.objects.filter(user=OuterRef('user_id')).order_by().values('user')
+    UserStats.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(n=Count('id')).values('n')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s')), 0),
+        likes_received=Coalesce(Subquery(received.filter(is_like=True).annotate(n=Count('id')).values('n')), 0),
+        dislikes_received=Coalesce(Subquery(received.filter(is_like=False).annotate(n=Count('id')).values('n')), 0),
+        reactions_given=Coalesce(Subquery(given.annotate(n=Count('id')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('reviews', '0003_reaction_delete_like'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('likes_received', models.PositiveIntegerField(default=0)),
+                ('dislikes_received', models.PositiveIntegerField(default=0)),
+                ('reactions_given', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
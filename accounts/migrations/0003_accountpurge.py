@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_id', models.BigIntegerField(unique=True)),
+                ('username', models.CharField(max_length=150)),
+                ('reviews_total', models.PositiveIntegerField(default=0)),
+                ('reactions_total', models.PositiveIntegerField(default=0)),
+                ('reviews_deleted', models.PositiveIntegerField(default=0)),
+                ('reactions_deleted', models.PositiveIntegerField(default=0)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-requested_at'],
+            },
+        ),
+    ]
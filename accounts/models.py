@@ -7,4 +7,49 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+class UserStats(models.Model):
+    """Per-user activity counters, maintained on review/reaction writes (see accounts.stats)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    likes_received = models.PositiveIntegerField(default=0)
+    dislikes_received = models.PositiveIntegerField(default=0)
+    reactions_given = models.PositiveIntegerField(default=0)
+
+    @property
+    def average_rating_given(self):
+        return self.rating_sum / self.review_count if self.review_count else None
+
+    def __str__(self):
+        return f"Stats for {self.user_id}"
+
+class AccountPurge(models.Model):
+    """
+    A deactivated account whose reviews and reactions are being deleted in the
+    background (see accounts.purge). Kept after the user row is gone, as a
+    record of progress and completion for staff.
+    """
+    account_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    reviews_total = models.PositiveIntegerField(default=0)
+    reactions_total = models.PositiveIntegerField(default=0)
+    reviews_deleted = models.PositiveIntegerField(default=0)
+    reactions_deleted = models.PositiveIntegerField(default=0)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-requested_at"]
+
+    @property
+    def progress(self):
+        """Share of the rows deleted so far, from 0.0 to 1.0."""
+        if self.finished_at:
+            return 1.0
+        total = self.reviews_total + self.reactions_total
+        return min((self.reviews_deleted + self.reactions_deleted) / total, 1.0) if total else 0.0
+
+    def __str__(self):
+        return f"Purge of {self.username} ({self.account_id})"
+
 # Create your models here.
@@ -0,0 +1,71 @@
+"""
+Account deletion in the background.
+
+Deleting a ``User`` cascades through every review and reaction they wrote and
+every reaction others left on their reviews, in one transaction. Instead,
+``request_purge`` deactivates the account at once (its tokens stop working
+and its public profile disappears) and queues ``purge_account``, which
+removes the data with the batched deletes of ``reviews.deletion``, keeping
+user stats and movie ratings consistent, and deletes the user last. Progress
+is recorded on an ``AccountPurge`` row, listed in the admin; reactivating
+the user before the task runs cancels the purge.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from reviews import archive, shards
+from reviews.deletion import BATCH_SIZE, PAUSE, delete_archived, delete_reactions, delete_reviews
+from reviews.models import Reaction, Review
+from tasks.queue import enqueue
+from .models import AccountPurge, User
+
+
+def _reactions_total(user):
+    """Reactions by ``user`` plus reactions by others on their reviews, without joining across shards."""
+    reviews = Review.objects.filter(user=user)
+    received = reviews.aggregate(n=Sum(F("likes_count") + F("dislikes_count")))["n"] or 0
+    given = set()
+    for reactions in shards.scatter(Reaction.objects.filter(user=user)):
+        given.update(reactions.values_list("review_id", flat=True))
+    for reactions in archive.archived(user_id=user.pk).values():
+        given.update(review_id for _, review_id, _ in reactions)
+    # Reactions on their own reviews are in both sets.
+    own = given.intersection(reviews.values_list("pk", flat=True))
+    return len(given) + received - len(own)
+
+
+def request_purge(user):
+    """Deactivate ``user`` and queue the deletion of their data; returns the ``AccountPurge``."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        purge, _ = AccountPurge.objects.update_or_create(account_id=user.pk, defaults={
+            "username": user.username,
+            "reviews_total": Review.objects.filter(user=user).count(),
+            "reactions_total": _reactions_total(user),
+        })
+        enqueue("accounts.tasks.purge_account", {"user_id": user.pk}, key=f"account-purge:{user.pk}")
+    return purge
+
+
+def purge_account(user_id, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Delete the reactions and reviews of a deactivated user, then the user."""
+    purges = AccountPurge.objects.filter(account_id=user_id)
+    if User.objects.filter(pk=user_id, is_active=True).exists():
+        # Reactivated by staff since the request: keep the account.
+        purges.delete()
+        return
+
+    def progress(reviews=0, reactions=0):
+        purges.update(reviews_deleted=F("reviews_deleted") + reviews,
+                      reactions_deleted=F("reactions_deleted") + reactions)
+
+    for reactions in shards.scatter(Reaction.objects.filter(user_id=user_id)):
+        delete_reactions(reactions, batch_size, pause, progress)
+    delete_archived(user_id=user_id, batch_size=batch_size, pause=pause, progress=progress)
+    delete_reviews(Review.objects.filter(user_id=user_id), batch_size, pause, progress)
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        # Only small rows (stats, admin log entries) are left to cascade.
+        user.delete()
+    purges.update(finished_at=timezone.now())
@@ -0,0 +1,297 @@
+"""
+Personalised "for you" movie recommendations.
+
+A latent-factor model is trained offline with weighted alternating least
+squares over explicit review ratings plus weaker pseudo-ratings derived from
+the user's likes/dislikes on other people's reviews. Each half-step solves one
+small ``k x k`` system per user (or movie); systems are batched with NumPy and
+spread over a thread pool, since the reductions and ``linalg.solve`` release
+the GIL.
+
+The trained model is written as ``.npy`` arrays into a versioned directory
+under ``settings.RECOMMENDER_DIR`` and opened with ``mmap_mode="r"`` so every
+worker process shares the same pages; ``save`` keeps the newest ``KEEP_VERSIONS``.
+
+Each user's ranked list is cached under a key derived from their reviews (how
+many, and when the newest was written), so a review written or deleted by any
+process changes the key everywhere, whatever the cache backend.
+"""
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from movies.models import Movie
+from reviews import archive, shards
+from reviews.models import Review, Reaction, ReviewReactionArchive
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REACTION_WEIGHT = 0.3
+CACHE_SIZE = 100
+CACHE_TIMEOUT = 60 * 60
+# The version being replaced stays on disk for workers that read LATEST just before it moved.
+KEEP_VERSIONS = 2
+
+
+def cache_key(user_id):
+    """Changes whenever the user's reviews do, in every process."""
+    state = Review.objects.filter(user_id=user_id).aggregate(n=Count("id"), latest=Max("updated_at"))
+    latest = state["latest"].timestamp() if state["latest"] else 0
+    return f"recommendations:{user_id}:{state['n']}:{latest}"
+
+
+def _values_array(queryset, fields, chunk_size=100_000):
+    """Stream ``values_list(*fields)`` into an int64 array without building one big list."""
+    rows = queryset.order_by().values_list(*fields).iterator(chunk_size=chunk_size)
+    chunks = []
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        chunks.append(np.array(chunk, dtype=np.int64))
+    return np.concatenate(chunks) if chunks else np.empty((0, len(fields)), dtype=np.int64)
+
+
+def _archived_array():
+    """``(user_id, review_id, is_like)`` rows for every archived reaction (``reviews.archive``)."""
+    chunks = [np.empty((0, 3), dtype=np.int64)]
+    for queryset in shards.scatter(ReviewReactionArchive.objects.all()):
+        for review_id, likers, dislikers in queryset.order_by().values_list("review_id", "likers", "dislikers").iterator():
+            for packed, is_like in ((likers, 1), (dislikers, 0)):
+                users = np.frombuffer(packed, dtype=archive.DTYPE).astype(np.int64)
+                chunks.append(np.column_stack([users, np.full(len(users), review_id), np.full(len(users), is_like)]))
+    return np.concatenate(chunks)
+
+
+def load_interactions():
+    """
+    Return ``(user_ids, movie_ids, values, weights)`` arrays. A like on someone's
+    review counts as agreeing with its rating, a dislike as the mirrored rating;
+    both only apply to movies the user has not reviewed themselves.
+    """
+    reviews = _values_array(Review.objects.all(), ("id", "user_id", "movie_id", "rating"))
+    reviews = reviews[np.argsort(reviews[:, 0])]
+    # Reactions may be on other databases (reviews.shards), so their reviews' movie and rating are
+    # looked up here instead of joined.
+    reactions = np.concatenate([
+        *(_values_array(queryset, ("user_id", "review_id", "is_like"))
+          for queryset in shards.scatter(Reaction.objects.all())),
+        _archived_array(),
+    ])
+    position = np.searchsorted(reviews[:, 0], reactions[:, 1])
+    known = position < len(reviews)
+    known[known] = reviews[position[known], 0] == reactions[known, 1]
+    reviewed = reviews[position[known]]
+    reactions = np.column_stack([reactions[known, 0], reviewed[:, 2], reviewed[:, 3], reactions[known, 2]])
+    reviews = reviews[:, 1:]
+
+    implicit = np.column_stack([
+        reactions[:, 0], reactions[:, 1], np.where(reactions[:, 3] == 1, reactions[:, 2], 6 - reactions[:, 2]),
+    ])
+    if len(implicit):
+        width = int(max(reviews[:, 1].max(initial=0), implicit[:, 1].max())) + 1
+        implicit = implicit[~np.isin(implicit[:, 0] * width + implicit[:, 1], reviews[:, 0] * width + reviews[:, 1])]
+        # Several reactions on reviews of the same movie collapse into their mean.
+        pairs, inverse = np.unique(implicit[:, :2], axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        implicit = np.column_stack([pairs, np.bincount(inverse, weights=implicit[:, 2]) / np.bincount(inverse)])
+
+    data = np.concatenate([reviews.astype(np.float64), implicit.astype(np.float64).reshape(-1, 3)])
+    weights = np.concatenate([np.ones(len(reviews)), np.full(len(data) - len(reviews), REACTION_WEIGHT)])
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2], weights
+
+
+def _solve_side(rows, cols, residual, weights, fixed, n_rows, reg, workers, entries_per_task=8192):
+    """Solve ``(sum w q q^T + reg I) p = sum w e q`` for every row, entries sorted by row."""
+    k = fixed.shape[1]
+    indptr = np.searchsorted(rows, np.arange(n_rows + 1))
+    bounds = []
+    r0 = 0
+    while r0 < n_rows:
+        r1 = int(np.searchsorted(indptr, indptr[r0] + entries_per_task, side="right")) - 1
+        r1 = min(max(r1, r0 + 1), n_rows)
+        bounds.append((r0, r1))
+        r0 = r1
+
+    out = np.zeros((n_rows, k), dtype=np.float32)
+    eye = reg * np.eye(k)
+
+    def solve(bound):
+        r0, r1 = bound
+        lo, hi = indptr[r0], indptr[r1]
+        factors = fixed[cols[lo:hi]].astype(np.float64)
+        weighted = factors * weights[lo:hi, None]
+        offsets = indptr[r0:r1] - lo
+        present = indptr[r0 + 1:r1 + 1] > indptr[r0:r1]
+        if not present.any():
+            return
+        offsets = offsets[present]
+        gram = np.add.reduceat(weighted[:, :, None] * factors[:, None, :], offsets, axis=0) + eye
+        rhs = np.add.reduceat(weighted * residual[lo:hi, None], offsets, axis=0)
+        out[r0:r1][present] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(solve, bounds))
+    return out
+
+
+def train(factors=32, iterations=10, reg=1.0, bias_reg=5.0, workers=None, seed=0, log=None):
+    """Train the factor model and return it as a dict of arrays plus metadata."""
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    user_ids, movie_ids, values, weights = load_interactions()
+    users, u = np.unique(user_ids, return_inverse=True)
+    movies, m = np.unique(movie_ids, return_inverse=True)
+    loaded = time.perf_counter()
+
+    mu = float(np.average(values, weights=weights)) if len(values) else 0.0
+    movie_bias = np.bincount(m, weights=weights * (values - mu), minlength=len(movies)) / (
+        np.bincount(m, weights=weights, minlength=len(movies)) + bias_reg)
+    user_bias = np.bincount(u, weights=weights * (values - mu - movie_bias[m]), minlength=len(users)) / (
+        np.bincount(u, weights=weights, minlength=len(users)) + bias_reg)
+    residual = values - mu - movie_bias[m] - user_bias[u]
+
+    by_user = np.argsort(u, kind="stable")
+    by_movie = np.argsort(m, kind="stable")
+    rng = np.random.default_rng(seed)
+    user_factors = (rng.standard_normal((len(users), factors)) * 0.1).astype(np.float32)
+    movie_factors = (rng.standard_normal((len(movies), factors)) * 0.1).astype(np.float32)
+
+    rmse = float("nan")
+    for iteration in range(iterations):
+        user_factors = _solve_side(u[by_user], m[by_user], residual[by_user], weights[by_user],
+                                   movie_factors, len(users), reg, workers)
+        movie_factors = _solve_side(m[by_movie], u[by_movie], residual[by_movie], weights[by_movie],
+                                    user_factors, len(movies), reg, workers)
+        predicted = np.einsum("ij,ij->i", user_factors[u], movie_factors[m]) if len(u) else np.empty(0)
+        rmse = float(np.sqrt(np.average((residual - predicted) ** 2, weights=weights))) if len(u) else 0.0
+        if log:
+            log(f"iteration {iteration + 1}/{iterations}: weighted RMSE {rmse:.4f}")
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return {
+        "user_ids": users,
+        "user_factors": user_factors,
+        "movie_ids": movies,
+        "movie_factors": movie_factors,
+        "movie_bias": movie_bias.astype(np.float32),
+        "meta": {
+            "global_mean": mu,
+            "factors": factors,
+            "iterations": iterations,
+            "interactions": int(len(values)),
+            "rmse": rmse,
+            "workers": workers,
+            "load_seconds": round(loaded - started, 3),
+            "train_seconds": round(time.perf_counter() - loaded, 3),
+            "peak_rss_mb": round(peak, 1) if peak else None,
+            "trained_at": timezone.now().isoformat(),
+        },
+    }
+
+
+def save(model, directory=None):
+    """Write ``model`` into a fresh version directory and point ``LATEST`` at it."""
+    root = os.fspath(directory or settings.RECOMMENDER_DIR)
+    version = timezone.now().strftime("%Y%m%d%H%M%S%f")
+    path = os.path.join(root, version)
+    os.makedirs(path)
+    for name in ("user_ids", "user_factors", "movie_ids", "movie_factors", "movie_bias"):
+        np.save(os.path.join(path, f"{name}.npy"), model[name])
+    with open(os.path.join(path, "meta.json"), "w") as fh:
+        json.dump(model["meta"], fh)
+    tmp = os.path.join(root, "LATEST.tmp")
+    with open(tmp, "w") as fh:
+        fh.write(version)
+    os.replace(tmp, os.path.join(root, "LATEST"))
+    prune(root)
+    return version
+
+
+def prune(root, keep=KEEP_VERSIONS):
+    """Delete all but the newest ``keep`` version directories under ``root``."""
+    versions = sorted(name for name in os.listdir(root) if name.isdigit() and os.path.isdir(os.path.join(root, name)))
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class FactorModel:
+    """Read-only view of a saved model backed by memory-mapped arrays."""
+
+    _loaded = {}
+
+    def __init__(self, path, version):
+        self.version = version
+        for name in ("user_ids", "user_factors", "movie_ids", "movie_factors", "movie_bias"):
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    @classmethod
+    def current(cls):
+        root = os.fspath(settings.RECOMMENDER_DIR)
+        try:
+            with open(os.path.join(root, "LATEST")) as fh:
+                version = fh.read().strip()
+        except FileNotFoundError:
+            return None
+        model = cls._loaded.get(root)
+        if model is None or model.version != version:
+            model = cls._loaded[root] = cls(os.path.join(root, version), version)
+        return model
+
+    def user_vector(self, user_id):
+        pos = int(np.searchsorted(self.user_ids, user_id))
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return self.user_factors[pos]
+        return None
+
+    def top_n(self, user_id, exclude, n):
+        """Return ``[(movie_id, score)]``; users without a vector get the best-regarded movies."""
+        scores = np.array(self.movie_bias, dtype=np.float32)
+        vector = self.user_vector(user_id)
+        if vector is not None:
+            scores += self.movie_factors @ vector
+        if exclude:
+            excluded = np.fromiter(exclude, dtype=np.int64)
+            positions = np.searchsorted(self.movie_ids, excluded)
+            valid = positions < len(self.movie_ids)
+            positions, excluded = positions[valid], excluded[valid]
+            scores[positions[self.movie_ids[positions] == excluded]] = -np.inf
+        n = min(n, int(np.isfinite(scores).sum()))
+        if n <= 0:
+            return []
+        best = np.argpartition(-scores, n - 1)[:n]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return list(zip(self.movie_ids[best].tolist(), scores[best].tolist()))
+
+
+def recommend(user, limit=20):
+    """Cached top-N recommendations for ``user`` (``None`` when no model is trained)."""
+    model = FactorModel.current()
+    if model is None:
+        return None
+    key = cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is None or cached["version"] != model.version:
+        reviewed = set(Review.objects.filter(user=user).values_list("movie_id", flat=True))
+        ranked = model.top_n(user.pk, reviewed, CACHE_SIZE)
+        movies = Movie.objects.only("id", "title", "release_year", "genre").in_bulk([movie_id for movie_id, _ in ranked])
+        cached = {
+            "version": model.version,
+            "results": [
+                {"id": movie.id, "title": movie.title, "release_year": movie.release_year,
+                 "genre": movie.genre, "score": round(score, 4)}
+                for movie_id, score in ranked
+                if (movie := movies.get(movie_id)) is not None
+            ],
+        }
+        cache.set(key, cached, CACHE_TIMEOUT)
+    return cached["results"][:limit]
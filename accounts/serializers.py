@@ -1,11 +1,44 @@
 from rest_framework import serializers
-from .models import User
+from .models import User, UserStats
 from django.contrib.auth.password_validation import validate_password
 
+class UserStatsSerializer(serializers.ModelSerializer):
+    average_rating_given = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserStats
+        fields = ("review_count", "average_rating_given", "likes_received", "dislikes_received", "reactions_given")
+
+    def get_average_rating_given(self, obj):
+        average = obj.average_rating_given
+        return round(average, 2) if average is not None else None
+
+class StatsField(serializers.Field):
+    """Read-only user stats; users without a counter row yet read as zeros."""
+
+    def __init__(self, **kwargs):
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, user):
+        try:
+            stats = user.stats
+        except UserStats.DoesNotExist:
+            stats = UserStats(user=user)
+        return UserStatsSerializer(stats).data
+
 class UserSerializer(serializers.ModelSerializer):
+    stats = StatsField()
+
+    class Meta:
+        model = User
+        fields = ("id", "username", "email", "date_joined", "stats")
+
+class PublicProfileSerializer(serializers.ModelSerializer):
+    stats = StatsField()
+
     class Meta:
         model = User
-        fields = ("id", "username", "email", "date_joined")
+        fields = ("id", "username", "date_joined", "stats")
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password], style={"input_type": "password"})
@@ -0,0 +1,96 @@
+"""
+Per-user activity counters.
+
+Review and reaction signals call ``adjust``/``adjust_review_author`` with
+deltas, each a single UPDATE. ``refresh`` recomputes rows from the review
+and reaction tables (creating missing ones) and is the safety net for writes
+that bypass signals (``bulk_create``, ``QuerySet.update``). Set-based
+writes apply their combined deltas with ``adjust_many``.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import User, UserStats
+
+COUNTERS = ("review_count", "rating_sum", "likes_received", "dislikes_received", "reactions_given")
+
+
+def adjust(user_id, **deltas):
+    UserStats.objects.filter(user_id=user_id).update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def adjust_review_author(review_id, **deltas):
+    """Adjust the counters of whoever wrote ``review_id`` without loading the review."""
+    from reviews.models import Review
+
+    UserStats.objects.filter(user_id=Subquery(Review.objects.filter(pk=review_id).values("user_id")[:1])).update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+
+
+def adjust_many(deltas, chunk_size=5000):
+    """Apply ``{user_id: {counter: delta}}`` with one UPDATE per distinct set of deltas."""
+    groups = defaultdict(list)
+    for user_id, changes in deltas.items():
+        groups[tuple(sorted((name, delta) for name, delta in changes.items() if delta))].append(user_id)
+    for changes, user_ids in groups.items():
+        if not changes:
+            continue
+        for start in range(0, len(user_ids), chunk_size):
+            UserStats.objects.filter(user_id__in=user_ids[start:start + chunk_size]).update(
+                **{name: F(name) + delta for name, delta in changes}
+            )
+
+
+def _count(queryset, group_by, value=None):
+    grouped = queryset.order_by().values(group_by)
+    aggregate = Sum(value) if value else Count("id")
+    return Coalesce(Subquery(grouped.annotate(n=aggregate).values("n")[:1]), 0)
+
+
+def _reactions_given(user_ids):
+    """``{user_id: reactions}`` counted on every reaction shard, archived ones included."""
+    from reviews import archive, shards
+    from reviews.models import Reaction
+
+    reactions = Reaction.objects.all() if user_ids is None else Reaction.objects.filter(user_id__in=user_ids)
+    given = Counter()
+    for queryset in shards.scatter(reactions):
+        given.update(dict(queryset.order_by().values_list("user_id").annotate(n=Count("id")).iterator()))
+    given.update(archive.given(user_ids))
+    return given
+
+
+def refresh(user_ids=None):
+    """
+    Recompute the counters of ``user_ids`` (default: every user) from the source
+    tables. Likes received are summed from the reviews' stored counts, which are
+    recounted first.
+    """
+    from reviews import counters
+    from reviews.models import Review
+
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    reviews = Review.objects.all() if user_ids is None else Review.objects.filter(user_id__in=user_ids)
+    counters.refresh(None if user_ids is None else reviews.values_list("pk", flat=True))
+    given = _reactions_given(user_ids)
+    with transaction.atomic():
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in users.filter(stats__isnull=True).values_list("pk", flat=True)],
+            ignore_conflicts=True,
+        )
+        rows = UserStats.objects.all() if user_ids is None else UserStats.objects.filter(user_id__in=user_ids)
+        written = Review.objects.filter(user=OuterRef("user_id"))
+        updated = rows.update(
+            review_count=_count(written, "user"),
+            rating_sum=_count(written, "user", "rating"),
+            likes_received=_count(written, "user", "likes_count"),
+            dislikes_received=_count(written, "user", "dislikes_count"),
+            reactions_given=0,
+        )
+        # Reactions may be on other databases, so their counts are written from Python.
+        adjust_many({user_id: {"reactions_given": n} for user_id, n in given.items()})
+    return updated
@@ -0,0 +1,13 @@
+from tasks.queue import task
+
+from . import purge, stats
+
+
+@task
+def refresh_user_stats(user_ids):
+    stats.refresh(user_ids=user_ids)
+
+
+@task
+def purge_account(user_id):
+    purge.purge_account(user_id)
@@ -1,4 +1,8 @@
-from django.test import TestCase
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APITestCase
@@ -181,3 +185,348 @@ class AccountAPITestCase(APITestCase):
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RecommendationsAPITestCase(APITestCase):
+    def setUp(self):
+        from movies.models import Movie
+        from reviews.models import Review
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.settings_override = override_settings(RECOMMENDER_DIR=self.tmpdir.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.action = [Movie.objects.create(title=f'Action {i}', genre='Action') for i in range(3)]
+        self.drama = [Movie.objects.create(title=f'Drama {i}', genre='Drama') for i in range(3)]
+        # Action fans love action and dislike drama; drama fans the opposite.
+        for i in range(6):
+            fan = User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123')
+            liked, disliked = (self.action, self.drama) if i % 2 == 0 else (self.drama, self.action)
+            for movie in liked:
+                Review.objects.create(user=fan, movie=movie, rating=5, content='Loved it')
+            for movie in disliked:
+                Review.objects.create(user=fan, movie=movie, rating=1, content='Hated it')
+
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        Review.objects.create(user=self.user, movie=self.action[0], rating=5, content='Loved it')
+        Review.objects.create(user=self.user, movie=self.drama[0], rating=1, content='Hated it')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def train(self):
+        from accounts import recommendations
+
+        recommendations.save(recommendations.train(factors=4, iterations=10, reg=0.1, workers=2))
+
+    def test_recommendations_unavailable_before_training(self):
+        """Test that the feed reports 503 until a model is published"""
+        response = self.client.get(reverse('me-recommendations'))
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_recommendations_follow_taste_and_skip_reviewed_movies(self):
+        """Test that the user's unreviewed movies are ranked by learned taste"""
+        self.train()
+
+        response = self.client.get(reverse('me-recommendations'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [movie['title'] for movie in response.data['results']]
+        self.assertEqual(len(titles), 4)
+        self.assertNotIn('Action 0', titles)
+        self.assertNotIn('Drama 0', titles)
+        self.assertEqual(set(titles[:2]), {'Action 1', 'Action 2'})
+
+    def test_recommendations_cache_invalidated_on_new_review(self):
+        """Test that reviewing a recommended movie removes it from the cached feed"""
+        from reviews.models import Review
+
+        self.train()
+        first = self.client.get(reverse('me-recommendations'), {'limit': 1}).data['results'][0]
+        Review.objects.create(user=self.user, movie_id=first['id'], rating=4, content='Good')
+
+        response = self.client.get(reverse('me-recommendations'))
+
+        self.assertNotIn(first['id'], [movie['id'] for movie in response.data['results']])
+
+    def test_recommendations_cache_key_follows_reviews_without_signals(self):
+        """Test that a review written without signals, as by another process, still changes the cached feed"""
+        from reviews.models import Review
+
+        self.train()
+        first = self.client.get(reverse('me-recommendations'), {'limit': 1}).data['results'][0]
+        Review.objects.bulk_create([Review(user=self.user, movie_id=first['id'], rating=4, content='Good')])
+
+        response = self.client.get(reverse('me-recommendations'))
+
+        self.assertNotIn(first['id'], [movie['id'] for movie in response.data['results']])
+
+    def test_save_prunes_old_model_versions(self):
+        """Test that publishing a model keeps only the newest versions on disk"""
+        from accounts import recommendations
+
+        for _ in range(3):
+            self.train()
+        root = settings.RECOMMENDER_DIR
+        versions = sorted(name for name in os.listdir(root) if name.isdigit())
+        self.assertEqual(len(versions), recommendations.KEEP_VERSIONS)
+        with open(os.path.join(root, 'LATEST')) as fh:
+            self.assertEqual(fh.read(), versions[-1])
+
+    def test_recommendations_require_authentication(self):
+        """Test that the feed requires authentication"""
+        self.client.credentials()
+        response = self.client.get(reverse('me-recommendations'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserStatsAPITestCase(APITestCase):
+    def setUp(self):
+        from movies.models import Movie
+        from reviews.models import Review
+
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', email='fan@example.com', password='testpass123')
+        self.movies = [Movie.objects.create(title=f'Movie {i}') for i in range(2)]
+        self.first = Review.objects.create(user=self.author, movie=self.movies[0], rating=5, content='Great')
+        self.second = Review.objects.create(user=self.author, movie=self.movies[1], rating=2, content='Meh')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.fan).access_token}')
+
+    def stats(self, user):
+        return self.client.get(reverse('user-detail', args=[user.id])).data['stats']
+
+    def test_me_includes_stats(self):
+        """Test that /auth/me/ returns the current user's counters"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.author).access_token}')
+        response = self.client.get(reverse('me'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stats']['review_count'], 2)
+        self.assertEqual(response.data['stats']['average_rating_given'], 3.5)
+
+    def test_public_profile_hides_email(self):
+        """Test that the public profile is readable anonymously and omits the email"""
+        self.client.credentials()
+        response = self.client.get(reverse('user-detail', args=[self.author.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'author')
+        self.assertNotIn('email', response.data)
+
+    def test_reactions_update_stats(self):
+        """Test that like, switch to dislike and removal keep both users' counters in step"""
+        like = reverse('review-like', args=[self.first.id])
+        dislike = reverse('review-dislike', args=[self.first.id])
+
+        self.client.post(like)
+        self.assertEqual(self.stats(self.author)['likes_received'], 1)
+        self.assertEqual(self.stats(self.fan)['reactions_given'], 1)
+
+        self.client.post(dislike)
+        author = self.stats(self.author)
+        self.assertEqual((author['likes_received'], author['dislikes_received']), (0, 1))
+
+        self.client.post(dislike)
+        author = self.stats(self.author)
+        self.assertEqual((author['likes_received'], author['dislikes_received']), (0, 0))
+        self.assertEqual(self.stats(self.fan)['reactions_given'], 0)
+
+    def test_review_edit_and_delete_update_stats(self):
+        """Test that rating changes and deletes (with cascaded reactions) adjust the counters"""
+        self.client.post(reverse('review-like', args=[self.second.id]))
+        self.second.rating = 4
+        self.second.save()
+        self.assertEqual(self.stats(self.author)['average_rating_given'], 4.5)
+
+        self.second.delete()
+
+        self.assertEqual(self.stats(self.author)['review_count'], 1)
+        self.assertEqual(self.stats(self.author)['likes_received'], 0)
+        self.assertEqual(self.stats(self.fan)['reactions_given'], 0)
+
+    def test_refresh_recounts_missing_rows(self):
+        """Test that refresh_user_stats rebuilds counters for users without a row"""
+        from io import StringIO
+        from django.core.management import call_command
+        from accounts.models import UserStats
+
+        UserStats.objects.all().delete()
+        self.assertEqual(self.stats(self.author)['review_count'], 0)
+
+        call_command('refresh_user_stats', stdout=StringIO())
+
+        self.assertEqual(self.stats(self.author)['review_count'], 2)
+
+
+class UserHistoryAPITestCase(APITestCase):
+    def setUp(self):
+        from movies.models import Movie
+        from reviews.models import Review, Reaction
+
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', email='fan@example.com', password='testpass123')
+        movies = [Movie.objects.create(title=f'Movie {i}') for i in range(5)]
+        self.reviews = [
+            Review.objects.create(user=self.author, movie=movie, rating=i + 1, content='Review')
+            for i, movie in enumerate(movies)
+        ]
+        Reaction.objects.create(user=self.fan, review=self.reviews[0], is_like=True)
+        Reaction.objects.create(user=self.fan, review=self.reviews[1], is_like=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.author).access_token}')
+
+    def test_my_reviews_newest_first_with_counts(self):
+        """Test that /auth/me/reviews/ lists own reviews newest first with reaction counts"""
+        response = self.client.get(reverse('me-reviews'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [review['id'] for review in response.data['results']]
+        self.assertEqual(ids, [review.id for review in reversed(self.reviews)])
+        first = response.data['results'][-1]
+        self.assertEqual((first['likes_count'], first['dislikes_count']), (1, 0))
+
+    def test_my_reviews_cursor_pages(self):
+        """Test that following the next cursor walks every review exactly once"""
+        seen = []
+        url = reverse('me-reviews') + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(review['id'] for review in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [review.id for review in reversed(self.reviews)])
+
+    def test_my_reactions(self):
+        """Test that /auth/me/reactions/ lists reacted reviews with the user's reaction"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.fan).access_token}')
+        response = self.client.get(reverse('me-reactions'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['reaction'] for item in response.data['results']], ['dislike', 'like'])
+        self.assertEqual(response.data['results'][0]['review']['user_reaction'], 'dislike')
+        self.assertEqual(response.data['results'][0]['review']['dislikes_count'], 1)
+
+    def test_public_user_reviews(self):
+        """Test that /api/users/{id}/reviews/ is readable anonymously"""
+        self.client.credentials()
+        response = self.client.get(reverse('user-reviews', args=[self.author.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['results'][0]['user_reaction'])
+
+    def test_history_requires_authentication(self):
+        """Test that the current user's history endpoints require authentication"""
+        self.client.credentials()
+
+        self.assertEqual(self.client.get(reverse('me-reviews')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('me-reactions')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LoginThrottleTestCase(APITestCase):
+    def setUp(self):
+        from core.throttling import get_store
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'login': '3/min'}
+        override = override_settings(
+            THROTTLE_STORE=os.path.join(tmpdir.name, 'throttle.sqlite3'),
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(lambda: get_store().reset())
+        User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+
+    def test_login_attempts_throttled_per_address(self):
+        """Test that repeated login attempts from one address are refused with Retry-After"""
+        codes = [
+            self.client.post(reverse('login'), {'username': 'testuser', 'password': 'wrong'}).status_code
+            for _ in range(3)
+        ]
+        response = self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpass123'})
+
+        self.assertEqual(codes, [status.HTTP_401_UNAUTHORIZED] * 3)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+
+class AccountPurgeTestCase(APITestCase):
+    def setUp(self):
+        from movies.models import Movie
+        from reviews.models import Reaction, Review
+
+        self.leaving = User.objects.create_user(username='leaving', email='leaving@example.com', password='testpass123')
+        self.others = [
+            User.objects.create_user(username=f'other{i}', email=f'other{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        self.movies = [Movie.objects.create(title=f'Movie {i}') for i in range(3)]
+        for movie in self.movies:
+            for author in [self.leaving, *self.others]:
+                Review.objects.create(user=author, movie=movie, rating=author.pk % 5 + 1, content='Fine')
+        for review in Review.objects.all():
+            for fan in [self.leaving, *self.others]:
+                if fan.pk != review.user_id:
+                    Reaction.objects.create(user=fan, review=review, is_like=(fan.pk + review.pk) % 2 == 0)
+        self.token = RefreshToken.for_user(self.leaving).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def snapshot(self):
+        from accounts.models import UserStats
+        from movies.models import Movie
+
+        return (
+            list(UserStats.objects.order_by('user_id').values_list(
+                'review_count', 'rating_sum', 'likes_received', 'dislikes_received', 'reactions_given')),
+            list(Movie.objects.order_by('pk').values_list('rating_count', 'rating_sum')),
+        )
+
+    def test_delete_deactivates_now_and_purges_in_background(self):
+        """Test that deleting the profile deactivates the account and a worker removes its data consistently"""
+        from accounts import stats
+        from accounts.models import AccountPurge
+        from movies.ratings import resync_movie
+        from reviews.models import Reaction, Review
+        from tasks import queue
+
+        with override_settings(TASKS_EAGER=False):
+            response = self.client.delete(reverse('profile'))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_401_UNAUTHORIZED)
+            self.client.credentials()
+            self.assertEqual(self.client.get(f'/api/users/{self.leaving.pk}/').status_code, 404)
+            purge = AccountPurge.objects.get(account_id=self.leaving.pk)
+            self.assertEqual((purge.reviews_total, purge.reactions_total, purge.progress), (3, 18, 0.0))
+
+            self.assertTrue(queue.run(queue.claim()))
+
+        purge.refresh_from_db()
+        self.assertEqual((purge.reviews_deleted, purge.reactions_deleted, purge.progress), (3, 18, 1.0))
+        self.assertFalse(User.objects.filter(pk=self.leaving.pk).exists())
+        self.assertFalse(Review.objects.filter(user_id=self.leaving.pk).exists())
+        self.assertFalse(Reaction.objects.filter(user_id=self.leaving.pk).exists())
+        self.assertEqual(Reaction.objects.count(), 18)
+
+        remaining = self.snapshot()
+        stats.refresh()
+        for movie in self.movies:
+            resync_movie(movie.pk)
+        self.assertEqual(remaining, self.snapshot())
+
+    def test_reactivated_account_is_kept(self):
+        """Test that reactivating the user before the purge runs cancels it"""
+        from accounts.models import AccountPurge
+        from accounts.purge import purge_account, request_purge
+        from reviews.models import Review
+
+        with override_settings(TASKS_EAGER=False):
+            request_purge(self.leaving)
+        User.objects.filter(pk=self.leaving.pk).update(is_active=True)
+        purge_account(self.leaving.pk, pause=0)
+
+        self.assertEqual(Review.objects.filter(user=self.leaving).count(), 3)
+        self.assertFalse(AccountPurge.objects.exists())
@@ -1,12 +1,15 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import RegisterView, ProfileView, MeView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .views import RegisterView, LoginView, ProfileView, MeView, MyReviewsView, MyReactionsView, RecommendationsView
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
-    path("login/", TokenObtainPairView.as_view(), name="login"),
+    path("login/", LoginView.as_view(), name="login"),
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("profile/", ProfileView.as_view(), name="profile"),
     path("me/", MeView.as_view(), name="me"),
+    path("me/reviews/", MyReviewsView.as_view(), name="me-reviews"),
+    path("me/reactions/", MyReactionsView.as_view(), name="me-reactions"),
+    path("me/recommendations/", RecommendationsView.as_view(), name="me-recommendations"),
 ]
 
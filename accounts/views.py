@@ -1,11 +1,20 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, mixins, permissions, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework_simplejwt.views import TokenObtainPairView
+from reviews import history
+from reviews.serializers import ReviewSerializer, ReactionHistorySerializer
+from . import purge
 from .models import User
-from .serializers import RegisterSerializer, UserSerializer, ProfileUpdateSerializer
+from .serializers import RegisterSerializer, UserSerializer, ProfileUpdateSerializer, PublicProfileSerializer
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = "register"
+
+class LoginView(TokenObtainPairView):
+    throttle_scope = "login"
 
 class ProfileView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProfileUpdateSerializer
@@ -14,6 +23,10 @@ class ProfileView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self):
         return self.request.user
 
+    def perform_destroy(self, instance):
+        # The account is deactivated now and its data deleted in the background.
+        purge.request_purge(instance)
+
 class MeView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -21,4 +34,76 @@ class MeView(generics.RetrieveAPIView):
     def get_object(self):
         return self.request.user
 
+class MyReviewsView(generics.ListAPIView):
+    """
+    GET /auth/me/reviews/ - The current user's reviews, newest first.
+    """
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = history.HistoryPagination
+    throttle_scope = "list"
+
+    def get_queryset(self):
+        return history.user_reviews(self.request.user.pk)
+
+    def list(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        history.attach_reactions(page, request.user)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+class MyReactionsView(generics.ListAPIView):
+    """
+    GET /auth/me/reactions/ - Reviews the current user liked or disliked, newest reaction first.
+    """
+    serializer_class = ReactionHistorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = history.HistoryPagination
+    throttle_scope = "list"
+
+    def get_queryset(self):
+        return history.user_reactions(self.request.user.pk)
+
+    def list(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        history.attach_reactions(history.attach_reviews(page), request.user)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+class UserViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    GET /api/users/{id}/ - Public profile with activity stats (no email).
+    GET /api/users/{id}/reviews/ - The user's reviews, newest first.
+    """
+    queryset = User.objects.filter(is_active=True).select_related("stats")
+    serializer_class = PublicProfileSerializer
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = None
+    pagination_class = history.HistoryPagination
+
+    @action(detail=True, methods=["get"], throttle_scope="list")
+    def reviews(self, request, pk=None):
+        user = self.get_object()
+        page = self.paginate_queryset(history.user_reviews(user.pk))
+        history.attach_reactions(page, request.user)
+        serializer = ReviewSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+class RecommendationsView(generics.GenericAPIView):
+    """
+    GET /auth/me/recommendations/?limit=20 - Movies picked for the current user
+    from the model published by `manage.py train_recommender`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from . import recommendations  # NumPy is only loaded once this is used
+
+        try:
+            limit = min(int(request.query_params.get("limit", 20)), recommendations.CACHE_SIZE)
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=400)
+        results = recommendations.recommend(request.user, limit=max(limit, 0))
+        if results is None:
+            return Response({"detail": "Recommendations are not available yet."}, status=503)
+        return Response({"results": results})
+
 # Create your views here.
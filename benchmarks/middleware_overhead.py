@@ -0,0 +1,102 @@
+"""
+Per-request overhead and worker memory of the full and API-only applications.
+
+Each mode runs in a fresh process that loads its WSGI application
+(``core.wsgi`` or ``core.wsgi_api``), records its resident set size, then
+times requests dispatched straight through the WSGI handler, so the numbers
+cover the middleware stack, URL resolution and DRF but no network or server.
+The paths need no database: the API root and an unknown URL (404), with the
+autocomplete warm-up turned off.
+
+    python benchmarks/middleware_overhead.py --requests 20000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"full": ("core.settings", "core.wsgi"), "api": ("core.settings_api", "core.wsgi_api")}
+PATHS = ["/api/", "/api/does-not-exist/"]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == "darwin" else 1024)
+
+
+def run_mode(mode, requests):
+    """Child process: load one application and report startup RSS and per-request timings."""
+    settings_module, wsgi_module = MODES[mode]
+    sys.path.insert(0, ROOT)
+    os.environ["DJANGO_SETTINGS_MODULE"] = settings_module
+    os.environ.setdefault("ALLOWED_HOSTS", "localhost")
+    os.environ.setdefault("DEBUG", "False")
+    os.environ.setdefault("AUTOCOMPLETE_WARMUP", "False")
+    before = rss_mb()
+    started = time.perf_counter()
+    application = __import__(wsgi_module, fromlist=["application"]).application
+    startup = time.perf_counter() - started
+    loaded = rss_mb()
+
+    from django.conf import settings
+
+    from core.startup import wsgi_environ
+
+    results = {"mode": mode, "middleware": len(settings.MIDDLEWARE), "apps": len(settings.INSTALLED_APPS),
+               "startup_ms": startup * 1000, "rss_loaded_mb": loaded, "rss_app_mb": loaded - before, "paths": {}}
+    for path in PATHS:
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(status)
+
+        for _ in range(min(requests, 500)):  # warm up
+            b"".join(application(wsgi_environ(path), start_response))
+        begin = time.perf_counter()
+        for _ in range(requests):
+            b"".join(application(wsgi_environ(path), start_response))
+        per_request = (time.perf_counter() - begin) / requests * 1e6
+        results["paths"][path] = {"us": per_request, "status": statuses[-1]}
+    results["rss_after_mb"] = rss_mb()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        run_mode(args.mode, args.requests)
+        return
+
+    runs = {}
+    for mode in MODES:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                                 "--requests", str(args.requests)], check=True, capture_output=True, text=True)
+        runs[mode] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    for mode, run in runs.items():
+        print(f"{mode:<5} {run['middleware']} middleware, {run['apps']} apps, startup {run['startup_ms']:.0f} ms, "
+              f"RSS {run['rss_loaded_mb']:.1f} MB loaded (+{run['rss_app_mb']:.1f} MB for the app), "
+              f"{run['rss_after_mb']:.1f} MB after requests")
+    print()
+    for path in PATHS:
+        full, api = runs["full"]["paths"][path], runs["api"]["paths"][path]
+        print(f"{path:<24} full {full['us']:7.1f} us ({full['status'][:3]})   api {api['us']:7.1f} us "
+              f"({api['status'][:3]})   saved {full['us'] - api['us']:+.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Deleting a heavily reviewed movie: Django's cascade versus ``movies.deletion``.
+
+Builds a throwaway SQLite database holding two identical movies, each with
+``--reviews`` reviews and ``--reactions`` reactions spread over them, then
+deletes one with ``movies.deletion.delete_movie`` (batched, set-based) and the
+other with ``Movie.delete()`` (the collector, with per-row signals). A second
+thread keeps making a small unrelated write every few milliseconds
+throughout; the longest it waited shows how long each approach holds the
+database's write lock.
+
+    python benchmarks/movie_delete.py --reactions 1000000 --reviews 2000
+"""
+import argparse
+import itertools
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+DATABASE = os.path.join(tempfile.mkdtemp(), "movie_delete.sqlite3")
+settings.DATABASES["default"].update(NAME=DATABASE, OPTIONS={"timeout": 600})
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import F  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from accounts import stats  # noqa: E402
+from accounts.models import User  # noqa: E402
+from movies.deletion import delete_movie  # noqa: E402
+from movies.models import Movie  # noqa: E402
+from movies.ratings import resync_movie  # noqa: E402
+from reviews.models import Reaction, Review  # noqa: E402
+
+
+def seed(reviews, reactions):
+    fans = -(-reactions // reviews)
+    User.objects.bulk_create([User(username=f"bench{i}", email=f"bench{i}@example.com")
+                              for i in range(reviews + fans)], batch_size=5000)
+    users = list(User.objects.order_by("pk").values_list("pk", flat=True))
+    authors, fans = users[:reviews], users[reviews:]
+    movies = [Movie.objects.create(title=title) for title in ("Batched", "Cascade", "Probe")]
+    now = timezone.now()
+    table = Reaction._meta.db_table
+    for movie in movies[:2]:
+        created = Review.objects.bulk_create(
+            [Review(user_id=user_id, movie=movie, rating=user_id % 5 + 1, content="Seen it.") for user_id in authors],
+            batch_size=5000,
+        )
+        pairs = itertools.islice(((fan, review.pk) for review in created for fan in fans), reactions)
+        rows = ((fan, review_id, fan % 3 != 0, now) for fan, review_id in pairs)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {table} (user_id, review_id, is_like, created_at) VALUES (%s, %s, %s, %s)",
+                               rows)
+        resync_movie(movie.pk)
+    stats.refresh()
+    return movies
+
+
+def measure(name, delete, probe_id):
+    waits = []
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            started = time.perf_counter()
+            Movie.all_objects.filter(pk=probe_id).update(rating_sum=F("rating_sum"))
+            waits.append(time.perf_counter() - started)
+            time.sleep(0.005)
+        connection.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    started = time.perf_counter()
+    delete()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    thread.join()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 1024)
+    print(f"{name:<22} {elapsed:8.2f} s   longest wait of a concurrent write {max(waits) * 1000:8.1f} ms "
+          f"({len(waits)} writes)   peak RSS so far {peak:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reactions", type=int, default=1_000_000, help="Reactions per movie.")
+    parser.add_argument("--reviews", type=int, default=2000, help="Reviews per movie.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=1.0, help="Idle time after each batch, relative to its duration.")
+    parser.add_argument("--skip-cascade", action="store_true", help="Only time the batched delete.")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    batched, cascade, probe = seed(args.reviews, args.reactions)
+    print(f"Seeded {Reaction.objects.count()} reactions on {Review.objects.count()} reviews "
+          f"in {time.perf_counter() - started:.1f}s ({DATABASE})")
+
+    measure("delete_movie", lambda: delete_movie(batched.pk, batch_size=args.batch_size, pause=args.pause), probe.pk)
+    if not args.skip_cascade:
+        measure("Movie.delete()", cascade.delete, probe.pk)
+    os.remove(DATABASE)
+
+
+if __name__ == "__main__":
+    main()
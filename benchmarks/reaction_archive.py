@@ -0,0 +1,118 @@
+"""
+Reaction table size and read latency before and after ``archive_reactions``.
+
+Seeds a throwaway SQLite database with ``seed_data`` (reaction timestamps
+spread over a year), then measures the on-disk size of the reaction table,
+its indexes and the archive tables (from SQLite's ``dbstat``) and the median
+latency of the reads that touch reactions: a movie's review page as a signed-in
+user (the viewer's reactions), a popular review's reactions list, the stored
+count recount and the user stats recount. It then archives reactions older
+than ``--days`` and measures again.
+
+    python benchmarks/reaction_archive.py --users 2000 --reactions-per-user 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ["REACTION_SHARDS"] = "0"
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+DATABASE = os.path.join(tempfile.mkdtemp(), "reaction_archive.sqlite3")
+settings.DATABASES["default"].update(NAME=DATABASE, OPTIONS={"timeout": 600})
+settings.ALLOWED_HOSTS = ["testserver"]
+settings.THROTTLE_STORE = ""
+settings.TASKS_EAGER = True
+django.setup()
+
+from datetime import timedelta  # noqa: E402
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import F  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from accounts import stats  # noqa: E402
+from accounts.models import User  # noqa: E402
+from reviews import archive, counters  # noqa: E402
+from reviews.models import Reaction, Review  # noqa: E402
+
+TABLES = ("reviews_reaction", "reviews_reviewreactionarchive", "reviews_userreactionarchive")
+
+
+def sizes():
+    """``{table: (table bytes, index bytes)}`` from dbstat."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE tbl_name IN (%s, %s, %s)" % (("%s",) * 3),
+                       TABLES)
+        owners = dict(cursor.fetchall())
+        cursor.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+        found = {table: [0, 0] for table in TABLES}
+        for name, size in cursor.fetchall():
+            if name in owners:
+                found[owners[name]][name != owners[name]] += size
+    return found
+
+
+def timed(action, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def measure(label, repeat):
+    viewer = User.objects.filter(reactions__isnull=False).order_by("pk").first()
+    review = Review.objects.order_by((F("likes_count") + F("dislikes_count")).desc()).first()
+    client = APIClient()
+    client.force_authenticate(viewer)
+    page = reverse("review-list")
+    reactions = reverse("review-reactions", args=[review.pk])
+    print(f"\n{label}: {Reaction.objects.count()} reaction rows")
+    for table, (data, index) in sizes().items():
+        print(f"  {table:<32} table {data / 2**20:8.1f} MiB   indexes {index / 2**20:8.1f} MiB")
+    print(f"  {'review page (signed in)':<32} {timed(lambda: client.get(page, {'movie': review.movie_id}), repeat):8.2f} ms")
+    print(f"  {'reactions of top review':<32} {timed(lambda: client.get(reactions), repeat):8.2f} ms")
+    print(f"  {'counters.refresh()':<32} {timed(counters.refresh, max(1, repeat // 10)):8.2f} ms")
+    print(f"  {'stats.refresh()':<32} {timed(stats.refresh, max(1, repeat // 10)):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--reactions-per-user", type=int, default=200)
+    parser.add_argument("--days", type=int, default=settings.REACTION_ARCHIVE_DAYS,
+                        help="Archive reactions older than this many days.")
+    parser.add_argument("--repeat", type=int, default=50, help="Runs per read (a tenth of it for the recounts).")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    call_command("seed_data", users=args.users, reactions_per_user=args.reactions_per_user, verbosity=0,
+                 stdout=open(os.devnull, "w"))
+    print(f"Seeded in {time.perf_counter() - started:.1f}s ({DATABASE})")
+    measure("Before", args.repeat)
+
+    started = time.perf_counter()
+    moved = archive.archive(timezone.now() - timedelta(days=args.days))
+    elapsed = time.perf_counter() - started
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM")
+    print(f"\nArchived {moved} reactions in {elapsed:.1f}s")
+    measure("After", args.repeat)
+    os.remove(DATABASE)
+
+
+if __name__ == "__main__":
+    main()
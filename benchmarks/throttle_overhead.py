@@ -0,0 +1,128 @@
+"""
+Throttle overhead per request.
+
+Times a minimal DRF view dispatched through the full request cycle without
+throttling, with the in-process store and with the shared SQLite store
+(admitted requests and requests refused by the in-process fast path; refused
+requests also pay for DRF's 429 response), times the stores' ``consume`` on
+its own, then checks that worker processes sharing one SQLite file admit
+exactly one bucket's worth of requests in total.
+
+    python benchmarks/throttle_overhead.py --requests 20000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.settings import api_settings  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+from core import throttling  # noqa: E402
+
+
+class PingView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    throttle_scope = "bench"
+
+    def get(self, request):
+        return Response({"ok": True})
+
+
+def time_requests(view, requests, addresses):
+    factory = APIRequestFactory()
+    prepared = [factory.get("/ping/", REMOTE_ADDR=addresses[i % len(addresses)]) for i in range(requests)]
+    statuses = {}
+    started = time.perf_counter()
+    for request in prepared:
+        status = view(request).status_code
+        statuses[status] = statuses.get(status, 0) + 1
+    return (time.perf_counter() - started) / requests * 1e6, statuses
+
+
+def run_case(name, store_path, rate, requests, addresses, throttled=True):
+    settings = {**django.conf.settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"bench": rate}}
+    with override_settings(THROTTLE_STORE=store_path, REST_FRAMEWORK=settings):
+        PingView.throttle_classes = list(api_settings.DEFAULT_THROTTLE_CLASSES) if throttled else []
+        view = PingView.as_view()
+        time_requests(view, min(requests, 500), addresses)  # warm up connections and imports
+        per_request, statuses = time_requests(view, requests, addresses)
+    print(f"{name:<34} {per_request:8.1f} us/request   {statuses}")
+    return per_request
+
+
+def time_consume(name, store, capacity, calls, keys):
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(calls):
+        store.consume(keys[i % len(keys)], capacity, capacity / 3600, now)
+    per_call = (time.perf_counter() - started) / calls * 1e6
+    print(f"{name:<34} {per_call:8.1f} us/check")
+
+
+def hammer(path, capacity, attempts, start, queue):
+    store = throttling.SQLiteBucketStore(path)
+    start.wait()
+    admitted = sum(1 for _ in range(attempts) if store.consume("shared", capacity, capacity / 3600, time.time()) == 0)
+    queue.put(admitted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=1_000, help="Distinct client addresses.")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    addresses = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.clients)]
+    generous = f"{args.requests * 10}/hour"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "throttle.sqlite3")
+        baseline = run_case("no throttle", "", generous, args.requests, addresses, throttled=False)
+        local = run_case("in-process store", "", generous, args.requests, addresses)
+        shared = run_case("shared SQLite store (admitted)", path, generous, args.requests, addresses)
+        refused = run_case("shared SQLite store (refused)", os.path.join(tmp, "refused.sqlite3"),
+                           "1/hour", args.requests, addresses[:1])
+        print(f"\noverhead vs no throttle: in-process {local - baseline:+.1f} us, "
+              f"shared {shared - baseline:+.1f} us, refused {refused - baseline:+.1f} us\n")
+
+        keys = [f"bench:ip:{address}" for address in addresses]
+        time_consume("consume: in-process", throttling.LocalBucketStore(), args.requests, args.requests, keys)
+        time_consume("consume: shared SQLite (admitted)", throttling.SQLiteBucketStore(path + ".2"),
+                     args.requests, args.requests, keys)
+        time_consume("consume: shared SQLite (refused)", throttling.SQLiteBucketStore(path + ".3"),
+                     1, args.requests, keys[:1])
+        print()
+
+        capacity = 500
+        queue = multiprocessing.Queue()
+        start = multiprocessing.Event()
+        procs = [multiprocessing.Process(target=hammer, args=(os.path.join(tmp, "shared.sqlite3"), capacity,
+                                                               capacity, start, queue))
+                 for _ in range(args.workers)]
+        for proc in procs:
+            proc.start()
+        start.set()
+        admitted = sum(queue.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+        verdict = "ok" if admitted == capacity else "LIMIT EXCEEDED"
+        print(f"{args.workers} workers x {capacity} attempts on one {capacity}-token bucket: "
+              f"{admitted} admitted ({verdict})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Concurrent writers on the reaction hot path, over HTTP, against SQLite files.
+
+Seeds a throwaway file-backed database with users, movies and ``--hot``
+reviews, then serves the full application from ``--workers`` pre-forked
+processes (threaded stdlib WSGI servers sharing one listening socket) and
+drives it from ``--clients`` concurrent client threads for ``--duration``
+seconds. Each request is a like, dislike, review creation or review-list read
+(``--mix``) by a random user; likes, dislikes and reads pick a hot review with
+Zipf-like skew (``--skew``), so a few reviews take most of the writes.
+
+Reports throughput, latency percentiles and status codes per operation, the
+exceptions the workers raised (``database is locked`` separately), and
+whether the stored counters match a recount afterwards: review like/dislike
+counts, user stats and movie rating aggregates. ``--shards`` spreads
+reactions over that many extra SQLite files (``REACTION_SHARDS``).
+
+    python benchmarks/write_contention.py --workers 4 --clients 32 --duration 20 --mix like=50,dislike=20,create=10,read=20
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp()
+
+
+def configure(args):
+    """Point settings at files under TMP; runs before Django is set up."""
+    os.environ["DJANGO_SETTINGS_MODULE"] = "core.settings"
+    os.environ["REACTION_SHARDS"] = str(args.shards)
+    os.environ["REACTION_SHARD_DIR"] = TMP
+    os.environ["DEBUG"] = "False"
+    os.environ["ALLOWED_HOSTS"] = "127.0.0.1"
+    from django.conf import settings
+
+    for database in settings.DATABASES.values():
+        database["OPTIONS"] = {"timeout": args.timeout}
+    settings.DATABASES["default"]["NAME"] = os.path.join(TMP, "db.sqlite3")
+    settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] = dict.fromkeys(settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"])
+    settings.THROTTLE_STORE = ""
+    settings.CATALOG_SNAPSHOT_PATH = os.path.join(TMP, "catalog.snapshot")
+    settings.REVIEW_SEARCH_DIR = os.path.join(TMP, "review-search")
+
+
+def seed(args):
+    from django.core.management import call_command
+    from django.db import connections
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from accounts import stats
+    from accounts.models import User
+    from movies.models import Movie
+    from reviews.models import Review
+
+    for alias in connections:
+        call_command("migrate", database=alias, verbosity=0)
+    users = User.objects.bulk_create([User(username=f"writer{i}", email=f"writer{i}@example.com")
+                                      for i in range(args.users + args.hot)])
+    movies = Movie.objects.bulk_create([Movie(title=f"Contended {i}") for i in range(args.movies)])
+    # Created one by one so the movie aggregates and author stats are maintained.
+    hot = [Review.objects.create(user=author, movie=movie, rating=3, content="Hot take.")
+           for author, movie in zip(users[args.users:], movies)]
+    stats.refresh()  # bulk_create skipped the users' stats rows
+    tokens = [str(RefreshToken.for_user(user).access_token) for user in users[:args.users]]
+    return tokens, [movie.pk for movie in movies], [(review.pk, review.movie_id) for review in hot]
+
+
+class Server(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(server, stop, results):
+    """Worker process: answer requests until ``stop`` is set, then report the exceptions raised."""
+    from django.core.signals import got_request_exception
+
+    errors = Counter()
+    lock = threading.Lock()
+
+    def record(sender, **kwargs):
+        error = sys.exc_info()[1]
+        with lock:
+            errors["database is locked" if "database is locked" in str(error) else type(error).__name__] += 1
+
+    got_request_exception.connect(record, weak=False)
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    threading.Thread(target=lambda: (stop.wait(), server.shutdown()), daemon=True).start()
+    server.serve_forever(poll_interval=0.05)
+    results.put(dict(errors))
+
+
+def request(port, method, path, token, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+        body = json.dumps(body)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def drive(args, port, tokens, movie_ids, hot, deadline, results):
+    """Client thread: send the configured mix until ``deadline``; appends ``(op, status, seconds)``."""
+    rng = random.Random()
+    ops, weights = zip(*args.mix.items())
+    cum = list(itertools.accumulate(1 / (rank + 1) ** args.skew for rank in range(len(hot))))
+    while time.monotonic() < deadline:
+        op = rng.choices(ops, weights)[0]
+        review_id, movie_id = rng.choices(hot, cum_weights=cum)[0]
+        token = rng.choice(tokens)
+        if op in ("like", "dislike"):
+            call = ("POST", f"/api/reviews/{review_id}/{op}/", None)
+        elif op == "create":
+            body = {"movie": rng.choice(movie_ids), "rating": rng.randint(1, 5), "content": "Under load."}
+            call = ("POST", "/api/reviews/", body)
+        else:
+            call = ("GET", f"/api/reviews/?movie={movie_id}", None)
+        started = time.perf_counter()
+        try:
+            status = request(port, call[0], call[1], token, call[2])
+        except OSError as error:
+            status = type(error).__name__
+        results.append((op, status, time.perf_counter() - started))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+
+
+def check():
+    """How many stored counters differ from a recount: ``{name: (wrong, checked)}``. Rewrites them."""
+    from django.core.management import call_command
+    from django.db.models import Count, Sum
+
+    from accounts import stats
+    from accounts.models import UserStats
+    from movies.models import Movie
+    from reviews import counters
+    from reviews.models import Review
+
+    # Stats recounts queued by the write path are part of what the app promises.
+    call_command("run_workers", "--once", "--threads", "1", stdout=open(os.devnull, "w"))
+    found = {"review like/dislike counts": (counters.refresh(), Review.objects.count())}
+    fields = ("user_id", "review_count", "rating_sum", "likes_received", "dislikes_received", "reactions_given")
+    before = set(UserStats.objects.values_list(*fields))
+    stats.refresh()
+    after = set(UserStats.objects.values_list(*fields))
+    found["user stats"] = (len(after - before), len(after))
+    actual = {row["movie"]: (row["n"], row["total"])
+              for row in Review.objects.order_by().values("movie").annotate(n=Count("id"), total=Sum("rating"))}
+    stored = Movie.all_objects.values_list("pk", "rating_count", "rating_sum")
+    found["movie rating aggregates"] = (sum(1 for pk, n, total in stored if actual.get(pk, (0, 0)) != (n, total or 0)),
+                                        len(stored))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Server processes.")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent client threads.")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of traffic.")
+    parser.add_argument("--mix", default="like=50,dislike=20,create=10,read=20",
+                        help="Relative weights of like, dislike, create and read requests.")
+    parser.add_argument("--hot", type=int, default=50, help="Reviews the likes, dislikes and reads go to.")
+    parser.add_argument("--skew", type=float, default=1.2, help="Zipf exponent over the hot reviews (0: uniform).")
+    parser.add_argument("--users", type=int, default=500, help="Users the clients act as.")
+    parser.add_argument("--movies", type=int, default=2000, help="Movies new reviews are written for.")
+    parser.add_argument("--shards", type=int, default=0, help="Reaction shard files (REACTION_SHARDS).")
+    parser.add_argument("--timeout", type=float, default=5.0, help="SQLite busy timeout in seconds.")
+    args = parser.parse_args()
+    args.mix = {op: float(weight) for op, weight in (part.split("=") for part in args.mix.split(","))}
+    unknown = set(args.mix) - {"like", "dislike", "create", "read"}
+    if unknown:
+        parser.error(f"unknown operations in --mix: {', '.join(sorted(unknown))}")
+    args.hot = min(args.hot, args.movies)
+
+    configure(args)
+    import django
+
+    django.setup()
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connections
+
+    tokens, movie_ids, hot = seed(args)
+    server = Server(("127.0.0.1", 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    server.socket.setblocking(False)  # workers that lose the race for a connection go back to waiting
+    port = server.server_address[1]
+    connections.close_all()  # forked workers must not share the parent's connections
+
+    context = multiprocessing.get_context("fork")
+    stop, errors = context.Event(), context.Queue()
+    workers = [context.Process(target=serve, args=(server, stop, errors)) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    print(f"{args.workers} workers x {args.clients} clients for {args.duration:.0f}s on {len(hot)} hot reviews "
+          f"(skew {args.skew}, mix {args.mix}, shards {args.shards}, busy timeout {args.timeout}s)")
+
+    results = []
+    deadline = time.monotonic() + args.duration
+    clients = [threading.Thread(target=drive, args=(args, port, tokens, movie_ids, hot, deadline, results))
+               for _ in range(args.clients)]
+    started = time.monotonic()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - started
+    stop.set()
+    raised = Counter()
+    for _ in workers:
+        raised.update(errors.get())
+    for worker in workers:
+        worker.join()
+
+    print(f"\n{len(results)} requests in {elapsed:.1f}s: {len(results) / elapsed:.1f} requests/s\n")
+    print(f"{'operation':<10}{'count':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses")
+    by_op = defaultdict(list)
+    for op, status, seconds in results:
+        by_op[op].append((status, seconds))
+    for op in args.mix:
+        rows = by_op.get(op, [])
+        if not rows:
+            continue
+        latencies = sorted(seconds for _, seconds in rows)
+        statuses = Counter(status for status, _ in rows)
+        print(f"{op:<10}{len(rows):>8}{len(rows) / elapsed:>8.1f}{percentile(latencies, 0.5):>9.1f}"
+              f"{percentile(latencies, 0.95):>9.1f}{percentile(latencies, 0.99):>9.1f}{latencies[-1] * 1000:>9.1f}  "
+              + ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items(), key=str)))
+    print("\nexceptions in workers: " + (", ".join(f"{name}: {n}" for name, n in raised.most_common()) or "none"))
+    print("counters after the run:")
+    for name, (wrong, checked) in check().items():
+        print(f"  {name:<28} {'ok' if not wrong else 'WRONG'}: {wrong} of {checked} differ from a recount")
+    server.server_close()
+    shutil.rmtree(TMP)
+
+
+if __name__ == "__main__":
+    main()
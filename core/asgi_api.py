@@ -0,0 +1,14 @@
+"""
+ASGI config for the API-only deployment.
+
+Serves ``/api/`` and ``/auth/`` with the lean ``core.settings_api`` profile;
+run the admin from ``core.asgi`` as a separate application.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings_api')
+
+application = get_asgi_application()
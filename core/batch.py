@@ -0,0 +1,33 @@
+"""
+Fetching several objects by id in one request.
+
+``requested_ids`` parses ``?ids=3,1,2`` (at most ``settings.BATCH_FETCH_LIMIT``
+distinct ids, duplicates dropped, order kept) and ``ordered_response`` lays the
+fetched objects out in that order, listing the ids that were not found.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def requested_ids(request):
+    """The distinct ids in ``?ids=``, in request order; raises ``ValidationError`` (400) if unusable."""
+    raw = [part.strip() for part in request.query_params.get("ids", "").split(",") if part.strip()]
+    if not raw:
+        raise ValidationError({"ids": ["Provide ?ids=<comma-separated ids>."]})
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw))
+    except ValueError:
+        raise ValidationError({"ids": ["Ids must be integers."]})
+    if len(ids) > settings.BATCH_FETCH_LIMIT:
+        raise ValidationError({"ids": [f"At most {settings.BATCH_FETCH_LIMIT} ids per request."]})
+    return ids
+
+
+def ordered_response(ids, objects, serialize):
+    """``{"results": [...], "missing": [...]}`` for ``objects`` (``{id: object}``) in the order of ``ids``."""
+    found = [objects[pk] for pk in ids if pk in objects]
+    return Response({
+        "results": serialize(found),
+        "missing": [pk for pk in ids if pk not in objects],
+    })
@@ -0,0 +1,78 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start each application in a fresh interpreter and report boot time, per-app import/ready "
+        "times, time to first response and the packages imported at boot and by the first request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--application", action="append", choices=startup.APPLICATIONS,
+                            help="Application module to profile (repeatable; default: core.wsgi and core.asgi).")
+        parser.add_argument("--path", default="/api/", help="Path of the first request.")
+        parser.add_argument("--top", type=int, default=12, help="Packages listed per phase.")
+        parser.add_argument("--json", action="store_true", help="Print the raw reports as JSON lines.")
+
+    def handle(self, *args, **options):
+        for module in options["application"] or ["core.wsgi", "core.asgi"]:
+            report = self.profile(module, options["path"])
+            if options["json"]:
+                self.stdout.write(json.dumps(report))
+            else:
+                self.print_report(report, options["top"])
+
+    def profile(self, module, path):
+        env = dict(os.environ)
+        env.pop("DJANGO_SETTINGS_MODULE", None)  # each entry point picks its own settings profile
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "core.startup", module, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"{module} failed to start:\n{result.stderr[-2000:]}")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        boot, _, first = result.stderr.partition(startup.PHASE_MARKER)
+        report["imports_ms"] = {"boot": self.by_package(boot), "first_request": self.by_package(first)}
+        # Whatever the worker logged besides -X importtime output, e.g. a traceback from a background thread.
+        report["stderr"] = "\n".join(line for line in result.stderr.splitlines()
+                                     if not line.startswith("import time:") and line != startup.PHASE_MARKER)
+        return report
+
+    def by_package(self, importtime):
+        totals = Counter()
+        for match in IMPORT_LINE.finditer(importtime):
+            totals[match[2].split(".")[0]] += int(match[1]) / 1000
+        return dict(totals.most_common())
+
+    def print_report(self, report, top):
+        self.stdout.write(self.style.MIGRATE_HEADING(report["application"]))
+        self.stdout.write(
+            f"  boot {report['boot_ms']:.1f} ms, first request {report['path']} -> {report['status']} in "
+            f"{report['first_request_ms']:.1f} ms, time to first response {report['time_to_first_response_ms']:.1f} ms"
+        )
+        loaded = ", ".join(f"{name} {'loaded' if flag else 'not loaded'}" for name, flag in report["loaded"].items())
+        self.stdout.write(f"  {loaded}")
+        self.stdout.write(f"  {'app':<20} {'import':>8} {'models':>8} {'ready':>8}  (ms)")
+        for label, times in report["apps"].items():
+            self.stdout.write(
+                f"  {label:<20} {times.get('import_ms', 0):8.1f} {times.get('import_models_ms', 0):8.1f} "
+                f"{times.get('ready_ms', 0):8.1f}"
+            )
+        for phase, packages in report["imports_ms"].items():
+            listed = ", ".join(f"{name} {ms:.1f}" for name, ms in list(packages.items())[:top])
+            self.stdout.write(f"  {phase.replace('_', ' ')} imports, {sum(packages.values()):.1f} ms: {listed}")
+        if report["stderr"]:
+            self.stdout.write(self.style.WARNING(f"  stderr:\n{report['stderr']}"))
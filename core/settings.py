@@ -48,9 +48,11 @@ INSTALLED_APPS = [
     "django_filters",
 
     # local apps
+    "core",
     "accounts",
     "movies",
     "reviews",
+    "tasks",
 ]
 
 MIDDLEWARE = [
@@ -90,10 +92,24 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Reactions can be spread over REACTION_SHARDS extra SQLite files by review id (see reviews.shards);
+# 0 keeps them in the default database. Run `manage.py reshard_reactions` after changing it.
+REACTION_SHARDS = [f'reactions_{n}' for n in range(int(os.getenv('REACTION_SHARDS', '0')))]
+REACTION_SHARD_DIR = Path(os.getenv('REACTION_SHARD_DIR', BASE_DIR))
+# Shard files left from a larger layout stay reachable (but unrouted) so resharding can empty them.
+for _alias in sorted({*REACTION_SHARDS, *(path.stem for path in REACTION_SHARD_DIR.glob('reactions_*.sqlite3'))}):
+    DATABASES[_alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': REACTION_SHARD_DIR / f'{_alias}.sqlite3'}
+
+DATABASE_ROUTERS = ['reviews.shards.ReactionRouter']
+
+# `manage.py archive_reactions` packs reactions older than this into per-review and per-user rows
+# (see reviews.archive). Keep it above the trending window (7 days).
+REACTION_ARCHIVE_DAYS = int(os.getenv('REACTION_ARCHIVE_DAYS', '90'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -150,6 +166,39 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ),
+    # Token buckets per user/IP and scope (see core.throttling); the rate is also the burst size.
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.ScopedTokenBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "review-like": os.getenv('THROTTLE_REVIEW_LIKE', '30/min'),
+        "review-dislike": os.getenv('THROTTLE_REVIEW_DISLIKE', '30/min'),
+        "login": os.getenv('THROTTLE_LOGIN', '10/min'),
+        "register": os.getenv('THROTTLE_REGISTER', '5/hour'),
+        "list": os.getenv('THROTTLE_LIST', '120/min'),
+        "autocomplete": os.getenv('THROTTLE_AUTOCOMPLETE', '600/min'),
+    },
 }
 
+# Shared token-bucket file for all workers on the host; empty keeps buckets per process.
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', str(BASE_DIR / 'var' / 'throttle.sqlite3'))
+
+# Pre-rendered anonymous movie list pages (see `manage.py build_catalog_snapshot`); empty disables.
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', str(BASE_DIR / 'var' / 'catalog.snapshot'))
+
+# Review full-text index (see `manage.py build_review_index`); empty disables search and journaling.
+REVIEW_SEARCH_DIR = os.getenv('REVIEW_SEARCH_DIR', str(BASE_DIR / 'var' / 'review-search'))
+
+# Most ids accepted by the `batch` endpoints (`/api/movies/batch/`, `/api/reviews/batch/`).
+BATCH_FETCH_LIMIT = int(os.getenv('BATCH_FETCH_LIMIT', '100'))
+
+# Build each worker's autocomplete index in the background when it serves its first request.
+AUTOCOMPLETE_WARMUP = os.getenv('AUTOCOMPLETE_WARMUP', 'True').lower() == 'true'
+
+# Run deferred tasks inline as they are enqueued instead of through `manage.py run_workers`.
+TASKS_EAGER = os.getenv('TASKS_EAGER', 'False').lower() == 'true'
+
 AUTH_USER_MODEL = "accounts.User"
+
+# Trained recommendation models (see `manage.py train_recommender`)
+RECOMMENDER_DIR = Path(os.getenv('RECOMMENDER_DIR', BASE_DIR / 'var' / 'recommender'))
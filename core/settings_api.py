@@ -0,0 +1,41 @@
+"""
+API-only settings profile, used by ``core.wsgi_api`` and ``core.asgi_api``.
+
+Every ``/api/`` and ``/auth/`` route authenticates with JWT bearer tokens, so
+this profile drops the session, CSRF, message and clickjacking middleware and
+the apps that only the admin and the browsable API need. Responses are JSON
+only. The admin is served by the full application (``core.wsgi`` /
+``core.asgi``) as a separate deployment.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in {
+        "django.contrib.admin", "django.contrib.sessions", "django.contrib.messages", "django.contrib.staticfiles",
+    }
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+ROOT_URLCONF = "core.urls_api"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {"context_processors": []},
+    },
+]
+
+WSGI_APPLICATION = "core.wsgi_api.application"
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+}
@@ -0,0 +1,33 @@
+"""
+Settings for the test suite: ``manage.py test`` uses them unless
+``DJANGO_SETTINGS_MODULE`` is set; elsewhere pass ``--settings
+core.settings_test`` (``python -m django test``) or set the variable (pytest).
+
+The test client sends every request from one address, so tests opt in to
+throttling explicitly. They must never be answered from a snapshot or search
+index built against the development database, and run deferred tasks inline
+unless they test the queue itself. Autocomplete indexes are built on first use,
+not by a background warm-up thread. Two reaction shards exist for the tests that
+switch sharding on; everything else runs with the defaults of ``core.settings``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, REST_FRAMEWORK
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": dict.fromkeys(REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]),
+}
+THROTTLE_STORE = ""
+CATALOG_SNAPSHOT_PATH = ""
+REVIEW_SEARCH_DIR = ""
+TASKS_EAGER = True
+AUTOCOMPLETE_WARMUP = False
+REACTION_SHARDS = []
+DATABASES = {
+    **DATABASES,
+    # A file rather than SQLite's shared in-memory database, whose table locks fail at once instead of
+    # waiting out the busy timeout, so the worker tests lock the database as production does.
+    "default": {**DATABASES["default"], "TEST": {"NAME": BASE_DIR / "test_default.sqlite3"}},
+    **{alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / f"{alias}.sqlite3"}
+       for alias in ("reactions_0", "reactions_1")},
+}
@@ -0,0 +1,123 @@
+"""
+Cold-start probe for ``manage.py startup_profile``.
+
+Run in a fresh interpreter (``python -X importtime -m core.startup <module>
+<path>``), it loads a WSGI or ASGI application module the way a new worker
+does, timing each app's module import, ``import_models`` and ``ready``, then
+serves one GET request and prints a JSON report to stdout. ``-X importtime``
+output goes to stderr, split at ``PHASE_MARKER`` into boot and first-request
+imports.
+"""
+import io
+import json
+import sys
+import time
+
+APPLICATIONS = ("core.wsgi", "core.asgi", "core.wsgi_api", "core.asgi_api")
+PHASE_MARKER = "startup-profile: first request"
+
+
+def instrument_apps(timings):
+    from django.apps import config
+
+    create = config.AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        started = time.perf_counter()
+        app_config = create(cls, entry)
+        entry_timings = timings[app_config.label] = {"import_ms": (time.perf_counter() - started) * 1000}
+        for step in ("import_models", "ready"):
+            app_config.__dict__[step] = _timed(getattr(app_config, step), entry_timings, f"{step}_ms")
+        return app_config
+
+    config.AppConfig.create = classmethod(timed_create)
+
+
+def _timed(method, timings, key):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings[key] = (time.perf_counter() - started) * 1000
+
+    return wrapper
+
+
+def wsgi_environ(path):
+    """A bodiless JSON ``GET`` of ``path``, as a WSGI server would pass it to the application."""
+    return {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SCRIPT_NAME": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "HTTP_HOST": "localhost",
+        "HTTP_ACCEPT": "application/json", "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http", "wsgi.version": (1, 0), "wsgi.multithread": False,
+        "wsgi.multiprocess": True, "wsgi.run_once": False,
+    }
+
+
+def wsgi_request(application, path):
+    statuses = []
+    b"".join(application(wsgi_environ(path), lambda status, headers, exc_info=None: statuses.append(status)))
+    return int(statuses[0].split()[0])
+
+
+def asgi_request(application, path):
+    import asyncio
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    statuses = []
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+        elif not message.get("more_body"):
+            done.set()
+
+    async def run():
+        nonlocal done
+        done = asyncio.Event()
+        await application(scope, receive, send)
+
+    done = None
+    asyncio.run(run())
+    return statuses[0]
+
+
+def probe(module, path):
+    started = time.perf_counter()
+    import django.apps  # noqa: F401  (needed to instrument app loading)
+
+    apps = {}
+    instrument_apps(apps)
+    application = __import__(module, fromlist=["application"]).application
+    boot = time.perf_counter() - started
+
+    print(PHASE_MARKER, file=sys.stderr, flush=True)
+    request_started = time.perf_counter()
+    serve = asgi_request if "asgi" in module else wsgi_request
+    status = serve(application, path)
+    first = time.perf_counter() - request_started
+    return {
+        "application": module, "path": path, "status": status, "boot_ms": boot * 1000,
+        "first_request_ms": first * 1000, "time_to_first_response_ms": (boot + first) * 1000, "apps": apps,
+        "loaded": {
+            "numpy": "numpy" in sys.modules,
+            "admin registrations": any(f"{app}.admin" in sys.modules for app in ("accounts", "movies", "reviews")),
+        },
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(probe(sys.argv[1], sys.argv[2])))
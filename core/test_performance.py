@@ -0,0 +1,297 @@
+"""
+Query budgets and timing ceilings for every API endpoint.
+
+Each entry of ``ENDPOINTS`` is one action of ``MovieViewSet``,
+``ReviewViewSet`` or the accounts views, requested by an anonymous and by a
+signed-in caller (a JWT, so authentication costs what it does in production).
+The dataset is grown through ``SCALES``: every list, batch and history the
+endpoints return has ``ROWS_PER_SCALE`` times the scale rows in it, from a
+couple of rows to more than a page. Each request must run the same number of
+queries at every scale; a count that changes with the scale means a query per
+row and fails listing the statements that were added. At the first scale the
+count must equal the endpoint's budget exactly, so a query saved lowers the
+budget and a query added has to be argued for. Writes run in a savepoint that
+is rolled back, so every request sees the same data.
+
+Each endpoint's best of ``REPEAT`` runs at the largest scale is divided by the
+best time of the API root (routing, middleware and rendering, no queries).
+The ratios and the counts are written as JSON to ``PERF_REPORT`` (environment;
+``endpoint-performance.json`` in the temporary directory by default, empty to
+skip). Timings depend on the machine, so they are only checked against the
+endpoint's ceiling times ``PERF_TIME_FACTOR`` (default 1; raise it under a
+profiler or coverage) with ``PERF_TIMINGS=1``.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from movies import autocomplete
+from movies.models import Movie
+from reviews import trending
+from reviews.models import Reaction, Review
+
+SCALES = (1, 25)
+ROWS_PER_SCALE = 2
+REPEAT = 5
+TIMINGS = os.getenv("PERF_TIMINGS", "") not in ("", "0")
+TIME_FACTOR = float(os.getenv("PERF_TIME_FACTOR", "1"))
+REPORT = os.getenv("PERF_REPORT", os.path.join(tempfile.gettempdir(), "endpoint-performance.json"))
+CALLERS = ("anonymous", "authenticated")
+PASSWORD = "testpass123"
+
+# (name, method, url name, url kwargs, data, (anonymous, authenticated) statuses,
+#  (anonymous, authenticated) query budgets (exact counts at the first scale), time ceiling as a multiple of the baseline)
+# Placeholders in braces are filled from the dataset: {movie} has a review by every author, {review}
+# is the viewer's review of it, which every author reacted to, and {other} one the viewer liked;
+# {movies} and {reviews} list one per author. Deferred tasks run inline in tests, so profile-delete
+# includes the purge. Login and register hash a password, which outweighs everything else: not timed.
+ENDPOINTS = [
+    ("movie-list", "get", "movie-list", {}, {}, (200, 200), (2, 3), 30),
+    ("movie-list-filtered", "get", "movie-list", {}, {"genre": "Drama", "ordering": "-review_count"},
+     (200, 200), (2, 3), 30),
+    ("movie-create", "post", "movie-list", {}, {"title": "Premiere", "genre": "Drama", "release_year": 2024},
+     (401, 201), (0, 2), 20),
+    ("movie-detail", "get", "movie-detail", {"pk": "{movie}"}, {}, (200, 200), (1, 2), 25),
+    ("movie-update", "put", "movie-detail", {"pk": "{movie}"},
+     {"title": "Retitled", "description": "", "release_year": 2010, "genre": "Drama"}, (401, 200), (0, 3), 30),
+    ("movie-partial-update", "patch", "movie-detail", {"pk": "{movie}"}, {"title": "Retitled"},
+     (401, 200), (0, 3), 25),
+    ("movie-delete", "delete", "movie-detail", {"pk": "{movie}"}, {}, (401, 204), (0, 31), 125),
+    ("movie-top-rated", "get", "movie-top-rated", {}, {}, (200, 200), (2, 3), 35),
+    ("movie-batch", "get", "movie-batch", {}, {"ids": "{movies}"}, (200, 200), (1, 2), 25),
+    ("movie-autocomplete", "get", "movie-autocomplete", {}, {"q": "fea"}, (200, 200), (1, 2), 15),
+    ("movie-page", "get", "movie-page", {"pk": "{movie}"}, {}, (200, 200), (3, 6), 55),
+    ("movie-similar", "get", "movie-similar", {"pk": "{movie}"}, {}, (200, 200), (1, 2), 15),
+    ("review-list", "get", "review-list", {}, {}, (200, 200), (2, 5), 40),
+    ("review-list-movie", "get", "review-list", {}, {"movie": "{movie}"}, (200, 200), (3, 6), 40),
+    ("review-create", "post", "review-list", {}, {"movie": "{spare}", "rating": 4, "content": "Late to it."},
+     (401, 201), (0, 9), 35),
+    ("review-detail", "get", "review-detail", {"pk": "{review}"}, {}, (200, 200), (1, 4), 30),
+    ("review-update", "put", "review-detail", {"pk": "{review}"},
+     {"movie": "{movie}", "rating": 2, "content": "Changed my mind."}, (401, 200), (0, 10), 65),
+    ("review-partial-update", "patch", "review-detail", {"pk": "{review}"}, {"rating": 2}, (401, 200), (0, 9), 65),
+    ("review-delete", "delete", "review-detail", {"pk": "{review}"}, {}, (401, 204), (0, 17), 70),
+    ("review-by-movie", "get", "review-by-movie", {}, {"title": "{title}"}, (200, 200), (2, 5), 40),
+    ("review-search", "get", "review-search", {}, {"q": "soundtrack"}, (200, 200), (1, 4), 55),
+    ("review-batch", "get", "review-batch", {}, {"ids": "{reviews}"}, (200, 200), (1, 4), 35),
+    ("review-bulk", "post", "review-bulk", {},
+     [{"movie": "{spare}", "rating": 4, "content": "Late to it."}, {"movie": "{movie}", "rating": 3, "content": "Again."}],
+     (401, 201), (0, 9), 45),
+    ("review-like", "post", "review-like", {"pk": "{other}"}, {}, (401, 200), (0, 9), 50),
+    ("review-dislike", "post", "review-dislike", {"pk": "{other}"}, {}, (401, 200), (0, 9), 50),
+    ("review-reactions", "get", "review-reactions", {"pk": "{review}"}, {}, (200, 200), (4, 5), 30),
+    ("review-top-liked", "get", "review-top-liked", {}, {}, (200, 200), (2, 5), 35),
+    ("review-trending", "get", "review-trending", {}, {}, (200, 200), (3, 5), 45),
+    ("register", "post", "register", {},
+     {"username": "newcomer", "email": "newcomer@example.com", "password": PASSWORD, "password2": PASSWORD},
+     (201, 201), (7, 8), None),
+    ("login", "post", "login", {}, {"username": "viewer", "password": PASSWORD}, (200, 200), (1, 1), None),
+    ("token-refresh", "post", "token_refresh", {}, {"refresh": "{refresh}"}, (200, 200), (1, 1), 10),
+    ("profile", "get", "profile", {}, {}, (401, 200), (0, 1), 15),
+    ("profile-update", "put", "profile", {}, {"username": "viewer", "email": "renamed@example.com"},
+     (401, 200), (0, 4), 25),
+    ("profile-partial-update", "patch", "profile", {}, {"email": "renamed@example.com"}, (401, 200), (0, 3), 20),
+    ("profile-delete", "delete", "profile", {}, {}, (401, 204), (0, 58), 285),
+    ("me", "get", "me", {}, {}, (401, 200), (0, 2), 20),
+    ("me-reviews", "get", "me-reviews", {}, {}, (401, 200), (0, 4), 30),
+    ("me-reactions", "get", "me-reactions", {}, {}, (401, 200), (0, 4), 35),
+    ("me-recommendations", "get", "me-recommendations", {}, {}, (401, 200), (0, 3), 15),
+    ("user-detail", "get", "user-detail", {"pk": "{viewer}"}, {}, (200, 200), (1, 2), 20),
+    ("user-reviews", "get", "user-reviews", {"pk": "{viewer}"}, {}, (200, 200), (2, 5), 40),
+]
+
+
+def shape(sql):
+    """``sql`` with its numbers and ``IN`` lists collapsed, so the same statement on other rows compares equal."""
+    return re.sub(r"\?(, \?)+", "?", re.sub(r"\d+", "?", sql))
+
+
+def fill(value, values):
+    """``value`` with the ``{placeholder}`` strings in it (at any depth) replaced from ``values``."""
+    if isinstance(value, str) and value.startswith("{"):
+        return values[value[1:-1]]
+    if isinstance(value, dict):
+        return {key: fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, values) for item in value]
+    return value
+
+
+def routes():
+    """``(url name, method)`` of every route served by the movie, review and accounts views."""
+    from accounts import api_urls, urls as account_urls
+    from movies import urls as movie_urls
+    from reviews import urls as review_urls
+
+    found = set()
+    for pattern in [*movie_urls.router.urls, *review_urls.router.urls, *api_urls.router.urls,
+                    *account_urls.urlpatterns]:
+        callback = pattern.callback
+        if pattern.name is None or pattern.name == "api-root":
+            continue
+        if getattr(callback, "actions", None):
+            methods = callback.actions
+        else:
+            view = callback.view_class
+            methods = [method for method in view.http_method_names if hasattr(view, method)]
+        found.update((pattern.name, method) for method in methods if method not in ("head", "options"))
+    return found
+
+
+class EndpointPerformanceTestCase(APITestCase):
+    report = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(username="viewer", email="viewer@example.com", password=PASSWORD)
+        cls.critic = User.objects.create_user(username="critic", email="critic@example.com", password=PASSWORD)
+        cls.movie = Movie.objects.create(title="Feature", genre="Drama", release_year=2010)
+        cls.spare = Movie.objects.create(title="Festival Cut", genre="Drama", release_year=2012)
+        cls.review = Review.objects.create(user=cls.viewer, movie=cls.movie, rating=4,
+                                           content="The soundtrack carries it.")
+        cls.other = Review.objects.create(user=cls.critic, movie=cls.movie, rating=3, content="Too long.")
+        # Liked by the viewer, so the dislike request turns it around.
+        Reaction.objects.create(user=cls.viewer, review=cls.other, is_like=True)
+        trending.record(cls.other, likes=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if REPORT and cls.report:
+            with open(REPORT, "w") as fh:
+                json.dump(cls.report, fh, indent=2, default=str)
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(REVIEW_SEARCH_DIR=os.path.join(tmpdir.name, "search"),
+                                     RECOMMENDER_DIR=os.path.join(tmpdir.name, "recommender"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(cache.clear)
+        self.addCleanup(autocomplete.reset)
+        self.authors = []
+        self.refresh = RefreshToken.for_user(self.viewer)
+
+    def grow(self, scale):
+        """Add authors until every list holds ``ROWS_PER_SCALE * scale`` rows; rebuild the derived data."""
+        from accounts import recommendations
+        from reviews import fulltext
+
+        while len(self.authors) < ROWS_PER_SCALE * scale:
+            n = len(self.authors)
+            author = User.objects.create_user(username=f"author{n}", email=f"author{n}@example.com")
+            own = Movie.objects.create(title=f"Feature {n}", genre="Drama", release_year=2000 + n)
+            review = Review.objects.create(user=author, movie=self.movie, rating=2 + n % 2,
+                                           content=f"The soundtrack, again and again ({n}).")
+            Review.objects.create(user=author, movie=own, rating=5, content="My favourite.")
+            Review.objects.create(user=self.viewer, movie=own, rating=4, content="Worth it.")
+            Reaction.objects.create(user=author, review=self.review, is_like=n % 2 == 0)
+            if n % 2 == 0:
+                # Every page mixes reviews the viewer reacted to with ones they did not, at any scale.
+                Reaction.objects.create(user=self.viewer, review=review, is_like=True)
+                trending.record(review, likes=1)
+            self.authors.append((author, own, review))
+        call_command("build_similar_movies", shrinkage=0, stdout=StringIO())
+        fulltext.build()
+        recommendations.save(recommendations.train(factors=4, iterations=5, reg=0.1, workers=1))
+
+    def values(self):
+        return {
+            "movie": self.movie.pk, "spare": self.spare.pk, "title": self.movie.title, "review": self.review.pk,
+            "other": self.other.pk, "viewer": self.viewer.pk, "refresh": str(self.refresh),
+            "movies": ",".join(str(own.pk) for _, own, _ in self.authors),
+            "reviews": ",".join(str(review.pk) for _, _, review in self.authors),
+        }
+
+    def client_for(self, caller):
+        client = APIClient()
+        if caller == "authenticated":
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+        return client
+
+    def request(self, client, method, path, data):
+        """Send one request from a cold cache, rolled back afterwards; returns ``(response, queries, seconds)``."""
+        cache.clear()
+        autocomplete.reset()
+        kwargs = {} if method == "get" else {"format": "json"}
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data, **kwargs)
+                seconds = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return response, [query["sql"] for query in queries.captured_queries], seconds
+
+    def requests(self):
+        """``(name, caller, method, path, data, status, budget, ceiling)`` for every endpoint and caller."""
+        values = self.values()
+        for name, method, url_name, kwargs, data, statuses, budgets, ceiling in ENDPOINTS:
+            path = reverse(url_name, kwargs=fill(kwargs, values))
+            for caller, status, budget in zip(CALLERS, statuses, budgets):
+                yield name, caller, method, path, fill(data, values), status, budget, ceiling
+
+    def entry(self, name, caller):
+        return self.report.setdefault("endpoints", {}).setdefault(f"{name} ({caller})", {})
+
+    def test_every_route_has_a_budget(self):
+        """Test that every action of the movie, review and accounts views is in ENDPOINTS"""
+        budgeted = {(url_name, method) for _, method, url_name, *_ in ENDPOINTS}
+
+        self.assertEqual(routes() - budgeted, set(), "Add the new endpoints to core/test_performance.py")
+
+    def test_query_counts_do_not_grow_with_the_data(self):
+        """Test that each endpoint runs exactly its budget of queries, and the same number at every scale"""
+        counts, shapes_at = {}, {}
+        for scale in SCALES:
+            self.grow(scale)
+            for name, caller, method, path, data, status, budget, _ in self.requests():
+                response, queries, _ = self.request(self.client_for(caller), method, path, data)
+                counts.setdefault((name, caller), []).append(len(queries))
+                self.entry(name, caller).update(method=method.upper(), path=path, status=response.status_code,
+                                                budget=budget, queries=dict(zip(SCALES, counts[name, caller])))
+                with self.subTest(endpoint=name, caller=caller, scale=scale):
+                    self.assertEqual(response.status_code, status, response.content[:500])
+                    shapes = Counter(map(shape, queries))
+                    first = shapes_at.setdefault((name, caller), shapes)
+                    if len(queries) != counts[name, caller][0]:
+                        changed = "\n".join([*(f"{n} more x {sql}" for sql, n in (shapes - first).items()),
+                                              *(f"{n} fewer x {sql}" for sql, n in (first - shapes).items())])
+                        self.fail(f"{name} ({caller}) runs queries per row: {counts[name, caller][0]} at scale "
+                                  f"{SCALES[0]}, {len(queries)} at scale {scale}:\n{changed}")
+                    self.assertEqual(len(queries), budget, f"{name} ({caller}) ran {len(queries)} queries, "
+                                     f"its budget is {budget}:\n" + "\n".join(queries))
+
+    def test_timings_stay_under_ceilings(self):
+        """Test that each endpoint's timing is reported, and within its ceiling with PERF_TIMINGS=1"""
+        self.grow(SCALES[-1])
+        anonymous = self.client_for("anonymous")
+        baseline = min(self.request(anonymous, "get", reverse("api-root"), {})[2] for _ in range(REPEAT * 4))
+        self.report.update(baseline_seconds=baseline, time_factor=TIME_FACTOR, scales=list(SCALES))
+        for name, caller, method, path, data, _, _, ceiling in self.requests():
+            if ceiling is None:
+                continue
+            client = self.client_for(caller)
+            seconds = min(self.request(client, method, path, data)[2] for _ in range(REPEAT))
+            ratio = seconds / baseline
+            self.entry(name, caller).update(seconds=seconds, ratio=round(ratio, 1), ceiling=ceiling)
+            if not TIMINGS:
+                continue
+            with self.subTest(endpoint=name, caller=caller):
+                self.assertLessEqual(ratio, ceiling * TIME_FACTOR,
+                                     f"{name} ({caller}) took {seconds * 1000:.1f} ms, {ratio:.1f}x the baseline "
+                                     f"({baseline * 1000:.2f} ms); ceiling {ceiling}x")
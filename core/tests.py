@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class StartupProfileTestCase(TestCase):
+    def setUp(self):
+        # The profiled worker is a separate process: point it at a scratch database, not the development one.
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        patch = mock.patch.dict(os.environ, {
+            'DATABASE_PATH': os.path.join(tmpdir.name, 'db.sqlite3'), 'THROTTLE_STORE': '',
+            'CATALOG_SNAPSHOT_PATH': '', 'AUTOCOMPLETE_WARMUP': 'False',
+        })
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_api_worker_starts_without_numpy_or_admin(self):
+        """Test that a fresh API worker answers its first request without loading NumPy or admin modules"""
+        out = StringIO()
+        call_command('startup_profile', application=['core.wsgi_api'], json=True, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['status'], 200)
+        self.assertEqual(report['loaded'], {'numpy': False, 'admin registrations': False})
+        self.assertNotIn('numpy', report['imports_ms']['boot'])
+        self.assertNotIn('numpy', report['imports_ms']['first_request'])
+        self.assertNotIn('Traceback', report['stderr'])
+
+    def test_startup_profile_reports_app_breakdown(self):
+        """Test that the report lists per-app timings and the imports of both phases"""
+        out = StringIO()
+        call_command('startup_profile', application=['core.asgi'], stdout=out)
+
+        output = out.getvalue()
+        self.assertNotIn('Traceback', output)
+        self.assertIn('core.asgi', output)
+        self.assertIn('time to first response', output)
+        for label in ('admin', 'movies', 'reviews', 'boot imports', 'first request imports'):
+            self.assertIn(label, output)
@@ -0,0 +1,174 @@
+"""
+Token-bucket request throttling.
+
+Views opt in with ``throttle_scope`` (viewset ``list`` actions fall back to the
+``list`` scope); each scope's rate comes from
+``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]`` as ``"<requests>/<period>"``,
+which is both the bucket size and how fast it refills. Buckets are keyed by
+scope plus user id (or client address for anonymous requests).
+
+Bucket state lives in the store named by ``settings.THROTTLE_STORE``: a SQLite
+file shared by every worker process on the host, or the in-process store when
+empty. Each check against the shared store is one atomic UPSERT. A key that
+ran dry is then refused in-process until its next token is due, so a client
+hammering a limited endpoint never touches the shared file.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """``"30/min"`` -> ``(30, 60)``; ``None`` means unthrottled."""
+    if rate is None:
+        return None
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """Buckets in a dict; limits hold per process only."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now):
+        """Take one token from ``key``; return 0 if allowed, else seconds until a token is due."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1, now)
+            return 0
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file (WAL mode) shared by every worker process on the host."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS buckets ("
+        "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+    )
+    # SET expressions see the row as it was before the update; the WHERE clause
+    # turns an empty bucket into "no row returned".
+    CONSUME = (
+        "INSERT INTO buckets (key, tokens, updated, full_at) VALUES (:key, :capacity - 1, :now, :now + 1.0 / :rate) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1, "
+        "updated = :now, "
+        "full_at = :now + (:capacity + 1 - min(:capacity, tokens + (:now - updated) * :rate)) / :rate "
+        "WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1 "
+        "RETURNING tokens"
+    )
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._local = threading.local()
+        self._blocked = {}
+        self._calls = 0
+
+    def _connection(self):
+        # Connections are per thread and never cross a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # losing throttle state on a crash is harmless
+            conn.execute(self.SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def consume(self, key, capacity, rate, now):
+        """Take one token from ``key``; return 0 if allowed, else seconds until a token is due."""
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if now < blocked_until:
+                return blocked_until - now
+            self._blocked.pop(key, None)
+
+        conn = self._connection()
+        params = {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        if conn.execute(self.CONSUME, params).fetchone() is not None:
+            self._maybe_prune(conn, now)
+            return 0
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        tokens = min(capacity, row[0] + (now - row[1]) * rate) if row else 0
+        wait = max((1 - tokens) / rate, 0)
+        self._blocked[key] = now + wait
+        return wait
+
+    def _maybe_prune(self, conn, now):
+        # A bucket that has refilled completely is the same as no row at all.
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+            self._blocked = {key: until for key, until in self._blocked.items() if until > now}
+
+    def reset(self):
+        self._blocked.clear()
+        self._connection().execute("DELETE FROM buckets")
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        path = settings.THROTTLE_STORE
+        _store = SQLiteBucketStore(path) if path else LocalBucketStore()
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == "THROTTLE_STORE":
+        _store = None
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    scope_attr = "throttle_scope"
+
+    def get_scope(self, view):
+        scope = getattr(view, self.scope_attr, None)
+        if scope is None and getattr(view, "action", None) == "list":
+            return "list"
+        return scope
+
+    def get_cache_key(self, request, view, scope):
+        if request.user and request.user.is_authenticated:
+            return f"{scope}:user:{request.user.pk}"
+        return f"{scope}:ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        # Rates are read per request so they can change with settings.
+        parsed = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope)) if scope else None
+        if parsed is None:
+            return True
+        capacity, period = parsed
+        self._wait = get_store().consume(self.get_cache_key(request, view, scope), capacity, capacity / period, time.time())
+        return self._wait == 0
+
+    def wait(self):
+        # Throttled() rounds up and sends it as Retry-After.
+        return math.ceil(self._wait * 1000) / 1000
@@ -15,12 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path
+
+from . import urls_api
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("auth/", include("accounts.urls")),
-    path("api/", include("movies.urls")),
-    path("api/", include("reviews.urls")),
+    *urls_api.urlpatterns,
 ]
 
@@ -0,0 +1,14 @@
+"""
+Token-authenticated API routes, without the admin.
+
+The whole URLconf for the API-only profile (``core.settings_api``); the full
+application in ``core.urls`` adds the admin on top.
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path("auth/", include("accounts.urls")),
+    path("api/", include("movies.urls")),
+    path("api/", include("reviews.urls")),
+    path("api/", include("accounts.api_urls")),
+]
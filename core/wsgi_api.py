@@ -0,0 +1,14 @@
+"""
+WSGI config for the API-only deployment.
+
+Serves ``/api/`` and ``/auth/`` with the lean ``core.settings_api`` profile;
+run the admin from ``core.wsgi`` as a separate application.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings_api')
+
+application = get_wsgi_application()
@@ -0,0 +1,241 @@
+"""
+In-process title autocomplete.
+
+Each movie is indexed under its normalised title and under every suffix that
+starts at a word boundary ("the dark knight", "dark knight", "knight"), so a
+query matches title prefixes and word prefixes alike. The terms live in one
+sorted list searched with ``bisect``; matches are ranked by popularity
+(``rating_count``). Prefixes matching more than ``SCAN_LIMIT`` terms keep
+their top results in a small cache, so even one-letter queries stay cheap.
+
+Each worker process starts building its index in a background thread when
+it serves its first request (``warm``, from the ``request_started`` signal,
+so importing the application touches no database and a preforking server
+warms each worker after the fork). An autocomplete request that arrives
+first waits for that build; with ``AUTOCOMPLETE_WARMUP`` off (tests, the
+shell) the index is built inline on first use. The index is kept current by the ``Movie`` save and
+delete signals of the process that made the write. Once it is older than
+``MAX_AGE`` seconds, a request starts a rebuild in a background thread and
+keeps answering from the old index, which is swapped out when the new one
+is ready; writes made in the meantime are replayed onto it first. Rebuilds
+pick up other processes' writes and refresh popularity as reviews come in.
+Bulk writes, which send no signals, call ``invalidate`` to rebuild early.
+"""
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Movie
+from .text import normalize_title
+
+MAX_AGE = 600
+MAX_RESULTS = 20
+SCAN_LIMIT = 2000
+MAX_CACHED_PREFIXES = 1000
+
+_WORDS = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    """Casefolded words joined by single spaces; punctuation separates words."""
+    return " ".join(_WORDS.findall(normalize_title(text)))
+
+
+def terms_for(title):
+    words = normalize(title).split(" ")
+    return {" ".join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class TitleIndex:
+    def __init__(self, rows=()):
+        """``rows`` is an iterable of ``(id, title, release_year, popularity)``."""
+        self.movies = {}
+        self.terms = []
+        self.wide = {}
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+        for movie_id, title, year, popularity in rows:
+            self.movies[movie_id] = (title, year, popularity)
+            self.terms.extend((term, movie_id) for term in terms_for(title))
+        self.terms.sort()
+
+    @classmethod
+    def load(cls):
+        rows = Movie.objects.order_by().values_list("id", "title", "release_year", "rating_count")
+        return cls(rows.iterator(chunk_size=10_000))
+
+    def __len__(self):
+        return len(self.movies)
+
+    def search(self, query, limit=10):
+        """Return up to ``limit`` ``(id, title, release_year)`` for movies matching ``query``."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_RESULTS)
+        with self._lock:
+            ids = self.wide.get(prefix)
+            if ids is None:
+                lo = bisect_left(self.terms, (prefix,))
+                hi = bisect_left(self.terms, (prefix + "\U0010ffff",), lo)
+                ids = self._rank({movie_id for _, movie_id in self.terms[lo:hi]})
+                if hi - lo > SCAN_LIMIT:
+                    if len(self.wide) >= MAX_CACHED_PREFIXES:
+                        self.wide.clear()
+                    self.wide[prefix] = ids
+            return [(movie_id, *self.movies[movie_id][:2]) for movie_id in ids[:limit]]
+
+    def _rank(self, ids):
+        def key(movie_id):
+            title, _, popularity = self.movies[movie_id]
+            return -popularity, len(title), movie_id
+
+        return heapq.nsmallest(MAX_RESULTS, ids, key=key)
+
+    def put(self, movie_id, title, year, popularity):
+        with self._lock:
+            self._remove(movie_id)
+            self.movies[movie_id] = (title, year, popularity)
+            for term in terms_for(title):
+                insort(self.terms, (term, movie_id))
+            self.wide.clear()
+
+    def remove(self, movie_id):
+        with self._lock:
+            self._remove(movie_id)
+            self.wide.clear()
+
+    def _remove(self, movie_id):
+        entry = self.movies.pop(movie_id, None)
+        if entry is None:
+            return
+        for term in terms_for(entry[0]):
+            position = bisect_left(self.terms, (term, movie_id))
+            if position < len(self.terms) and self.terms[position] == (term, movie_id):
+                del self.terms[position]
+
+
+_index = None
+_index_lock = threading.Lock()
+_building = None  # the thread building the next index, if any
+_building_pid = None  # the process that started it; a forked child inherits the object but not the thread
+_pending = []  # writes made while it builds, replayed onto the new index before the swap
+_warmed_pid = None
+
+
+def _current_build():
+    """The build running in this process; forgets one inherited across ``fork``. Call with ``_index_lock`` held."""
+    global _building
+    if _building is not None and _building_pid != os.getpid():
+        _building = None
+        _pending.clear()
+    return _building
+
+
+def get_index():
+    """The process-wide index; starts a background rebuild once it is older than ``MAX_AGE``."""
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            building = _current_build()
+        if building is not None:
+            building.join()
+        with _index_lock:
+            if _index is None:
+                _index = TitleIndex.load()
+            return _index
+    if time.monotonic() - index.built_at > MAX_AGE:
+        rebuild()
+    return index
+
+
+def warm(**kwargs):
+    """
+    Start building the index in the background the first time this process
+    serves a request (connected to ``request_started``); returns the thread, if any.
+    """
+    global _warmed_pid
+    if _warmed_pid == os.getpid() or not settings.AUTOCOMPLETE_WARMUP:
+        return None
+    _warmed_pid = os.getpid()
+    if _index is None:
+        return rebuild()
+    return None
+
+
+def rebuild():
+    """Start building a fresh index in a background thread unless one is already building; returns the thread."""
+    global _building, _building_pid
+    with _index_lock:
+        if _current_build() is None:
+            _pending.clear()
+            _building = threading.Thread(target=_build, name="autocomplete-rebuild", daemon=True)
+            _building_pid = os.getpid()
+            _building.start()
+        return _building
+
+
+def _build():
+    global _index, _building
+    index = None
+    try:
+        index = TitleIndex.load()
+    except Exception:
+        logger.exception("Could not rebuild the autocomplete index.")
+    finally:
+        connection.close()
+    with _index_lock:
+        if index is not None:
+            for args in _pending:
+                _apply(index, *args)
+            _index = index
+        elif _index is not None:
+            _index.built_at = time.monotonic()  # retry after another MAX_AGE rather than on every request
+        _pending.clear()
+        _building = None
+
+
+def _apply(index, movie_id, entry):
+    if entry is None:
+        index.remove(movie_id)
+    else:
+        index.put(movie_id, *entry)
+
+
+def _record(movie_id, entry):
+    with _index_lock:
+        if _current_build() is not None:
+            _pending.append((movie_id, entry))
+        index = _index
+    if index is not None:
+        _apply(index, movie_id, entry)
+
+
+def movie_saved(movie):
+    _record(movie.pk, None if movie.hidden else (movie.title, movie.release_year, movie.rating_count))
+
+
+def movie_deleted(movie_id):
+    _record(movie_id, None)
+
+
+def invalidate():
+    """Rebuild the index now; for writes that bypass the ``Movie`` signals, such as bulk imports."""
+    if _index is not None:
+        rebuild()
+
+
+def reset():
+    global _index, _warmed_pid
+    _index = None
+    _warmed_pid = None
@@ -0,0 +1,37 @@
+"""
+Deleting movies without Django's cascade.
+
+``delete_movie`` removes a movie's reviews and reactions with the batched,
+set-based deletes of ``reviews.deletion`` before deleting the movie itself,
+so no transaction holds the write lock for longer than one batch.
+
+``destroy`` is the API's delete path: movies with many reviews are hidden at
+once (``Movie.objects`` no longer returns them) and deleted by a background
+task, so the request returns without waiting for the batches.
+"""
+from reviews.deletion import BATCH_SIZE, PAUSE, delete_reviews
+from reviews.models import Review
+from tasks.queue import enqueue
+from .models import Movie
+
+ASYNC_MIN_REVIEWS = 1000
+
+
+def destroy(movie):
+    """Delete ``movie`` now, or hide it and queue its deletion if it has many reviews."""
+    if movie.rating_count < ASYNC_MIN_REVIEWS:
+        delete_movie(movie.pk, pause=0)
+        return
+    movie.hidden = True
+    movie.save(update_fields=["hidden"])
+    enqueue("movies.tasks.delete_movie", {"movie_id": movie.pk}, key=f"movie-delete:{movie.pk}")
+
+
+def delete_movie(movie_id, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Delete a movie with its reviews and reactions in bounded batches; returns the row counts."""
+    reviews, reactions = delete_reviews(Review.objects.filter(movie_id=movie_id), batch_size, pause)
+    movie = Movie.all_objects.filter(pk=movie_id).first()
+    if movie is not None:
+        # Nothing large is left to cascade; this fires the movie's own signals.
+        movie.delete()
+    return {"reactions": reactions, "reviews": reviews}
@@ -0,0 +1,84 @@
+"""
+Facet counts for the movie list.
+
+``?facets=genre,release_year`` adds the number of movies per value of each
+requested field, over the same filtered and searched queryset as the list,
+computed with a single GROUP BY across all requested fields. Counts for
+requests without ``search`` (the unfiltered list and the ``genre`` /
+``release_year`` filters) are cached under a generation number that every
+``Movie`` write bumps, so a write invalidates them all at once. The number is
+kept in the database (``CatalogGeneration``) rather than the cache, which may
+be per process, so every worker sees the bump.
+"""
+import hashlib
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .models import CatalogGeneration
+
+FIELDS = ("genre", "release_year")
+CACHED_FILTERS = ("genre", "release_year")
+CACHE_TIMEOUT = 60 * 60
+
+
+class FacetError(ValueError):
+    pass
+
+
+def requested(request):
+    """The facet fields asked for in ``?facets=``, in canonical order, or ``()``."""
+    raw = request.query_params.get("facets")
+    if not raw:
+        return ()
+    names = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = names - set(FIELDS)
+    if unknown:
+        raise FacetError(f"Unknown facet(s): {', '.join(sorted(unknown))}. Choose from {', '.join(FIELDS)}.")
+    return tuple(field for field in FIELDS if field in names)
+
+
+def compute(queryset, fields):
+    """``{field: [{"value", "count"}, ...]}``, most common value first."""
+    counters = {field: Counter() for field in fields}
+    for row in queryset.order_by().values(*fields).annotate(n=Count("id")):
+        for field in fields:
+            counters[field][row[field]] += row["n"]
+    return {
+        field: [{"value": value, "count": n}
+                for value, n in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))]
+        for field, counter in counters.items()
+    }
+
+
+def _cache_key(request, fields):
+    params = request.query_params
+    if set(params) - {"facets", "page", "ordering", *CACHED_FILTERS} or any(
+            len(params.getlist(name)) > 1 for name in CACHED_FILTERS):
+        return None
+    filters = "\x1f".join(params.get(name, "") for name in CACHED_FILTERS)
+    digest = hashlib.blake2b(filters.encode(), digest_size=8).hexdigest()
+    return f"facets:{_generation()}:{','.join(fields)}:{digest}"
+
+
+def _generation():
+    return CatalogGeneration.objects.filter(pk=1).values_list("generation", flat=True).first() or 0
+
+
+def counts(request, queryset, fields):
+    """Facet counts for ``queryset``, served from the cache for the common filter combinations."""
+    key = _cache_key(request, fields)
+    result = cache.get(key) if key else None
+    if result is None:
+        result = compute(queryset, fields)
+        if key:
+            cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def invalidate():
+    if not CatalogGeneration.objects.filter(pk=1).update(generation=F("generation") + 1):
+        # Seeded from the clock so a recreated row never revives entries cached under an old number.
+        CatalogGeneration.objects.get_or_create(pk=1, defaults={"generation": time.time_ns()})
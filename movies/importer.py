@@ -0,0 +1,234 @@
+"""
+Streaming catalog import.
+
+Input (CSV with a header row, or JSON lines) is read as raw records tagged
+with the byte offset just past them, so an interrupted import can resume by
+seeking to the last committed offset. Records are parsed into a 64-bit key
+(hash of the normalised title and release year) plus a digest of the mutable
+fields, optionally across a process pool, and matched against an in-memory
+index of the catalog: two sorted NumPy arrays of ~24 bytes per movie, plus a
+small overlay for movies created during the run. New movies go in with
+``bulk_create`` and changed ones with ``bulk_update``, one transaction per
+batch. Re-importing the same file is a no-op.
+
+Bulk writes send no ``post_save`` signals, so each batch that writes anything
+refreshes the derived state those signals would have (the catalog snapshot,
+facet counts and the autocomplete index) when it commits.
+"""
+import csv
+import hashlib
+import io
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import transaction
+
+from . import autocomplete, facets, snapshot
+from .models import Movie
+from .text import normalize_title
+
+
+def _hash64(*parts):
+    digest = hashlib.blake2b("\x1f".join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def movie_key(title, release_year):
+    return _hash64(normalize_title(title), "" if release_year is None else str(release_year))
+
+
+def content_digest(description, genre):
+    return _hash64(description, genre)
+
+
+def read_header(fh):
+    """Return the CSV header line and the offset where records start."""
+    fh.seek(0)
+    header = fh.readline().decode("utf-8-sig")
+    return header, fh.tell()
+
+
+def read_records(fh, fmt, offset=0):
+    """
+    Yield ``(end_offset, record)`` from a binary file positioned anywhere at or
+    after the first record. CSV records may span lines inside quotes.
+    """
+    fh.seek(offset)
+    pending = []
+    quotes = 0
+    for line in iter(fh.readline, b""):
+        offset += len(line)
+        if fmt == "csv":
+            # A record ends on a line that leaves an even number of quotes open.
+            pending.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2:
+                continue
+            line, pending, quotes = b"".join(pending), [], 0
+        if line.strip():
+            yield offset, line.decode("utf-8")
+    if pending:
+        yield offset, b"".join(pending).decode("utf-8")
+
+
+def parse_batch(fmt, header, records):
+    """Parse raw records into ``(key, digest, fields)`` tuples, or ``None`` for invalid rows."""
+    if fmt == "csv":
+        names = next(csv.reader([header]))
+        rows = (dict(zip(names, values)) for values in csv.reader(io.StringIO("".join(records))))
+    else:
+        rows = (_json_or_none(record) for record in records)
+    return [_parse_row(row) for row in rows]
+
+
+def _json_or_none(record):
+    try:
+        row = json.loads(record)
+    except ValueError:
+        return None
+    return row if isinstance(row, dict) else None
+
+
+def _parse_row(row):
+    if row is None:
+        return None
+    title = str(row.get("title") or "").strip()
+    year = row.get("release_year")
+    if year in (None, ""):
+        year = None
+    else:
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            return None
+        if year <= 0:
+            return None
+    if not title or len(title) > Movie._meta.get_field("title").max_length:
+        return None
+    description = str(row.get("description") or "")
+    genre = str(row.get("genre") or "").strip()[:Movie._meta.get_field("genre").max_length]
+    return movie_key(title, year), content_digest(description, genre), (title, description, year, genre)
+
+
+class CatalogIndex:
+    """Key -> (pk, digest) over the existing catalog, held in sorted NumPy arrays."""
+
+    def __init__(self, chunk_size=100_000):
+        keys, pks, digests = [], [], []
+        rows = Movie.objects.order_by("pk").values_list("pk", "title", "release_year", "description", "genre")
+        for pk, title, year, description, genre in rows.iterator(chunk_size=chunk_size):
+            keys.append(movie_key(title, year))
+            pks.append(pk)
+            digests.append(content_digest(description, genre))
+        keys = np.array(keys, dtype=np.int64)
+        # Keep the oldest movie when the catalog already holds duplicates.
+        keys, first = np.unique(keys, return_index=True)
+        self.keys = keys
+        self.pks = np.array(pks, dtype=np.int64)[first]
+        self.digests = np.array(digests, dtype=np.int64)[first]
+        self.added = {}
+
+    def __len__(self):
+        return len(self.keys) + len(self.added)
+
+    def lookup(self, keys):
+        """Return ``[(pk, digest) or None]`` for ``keys``."""
+        keys = np.asarray(keys, dtype=np.int64)
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == len(self.keys)] = 0
+        found = (self.keys[pos] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        out = []
+        for key, p, hit in zip(keys.tolist(), pos.tolist(), found.tolist()):
+            if hit:
+                out.append((int(self.pks[p]), int(self.digests[p])))
+            else:
+                out.append(self.added.get(key))
+        return out
+
+    def set(self, key, pk, digest):
+        pos = np.searchsorted(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            self.digests[pos] = digest
+        else:
+            self.added[key] = (pk, digest)
+
+
+def apply_batch(index, parsed, stats):
+    """Write one parsed batch; ``stats`` is a Counter updated in place."""
+    latest = {}
+    for item in parsed:
+        if item is None:
+            stats["invalid"] += 1
+        else:
+            latest[item[0]] = item  # the last occurrence of a key in the batch wins
+    stats["duplicate"] += sum(1 for item in parsed if item is not None) - len(latest)
+
+    keys = list(latest)
+    creates, updates = [], []
+    for key, current in zip(keys, index.lookup(keys)):
+        _, digest, (title, description, year, genre) = latest[key]
+        if current is None:
+            creates.append((key, digest, Movie(title=title, description=description, release_year=year, genre=genre)))
+        elif current[1] != digest:
+            updates.append((key, digest, Movie(pk=current[0], description=description, genre=genre)))
+        else:
+            stats["unchanged"] += 1
+
+    with transaction.atomic():
+        created = Movie.objects.bulk_create([movie for _, _, movie in creates])
+        Movie.objects.bulk_update([movie for _, _, movie in updates], ["description", "genre"])
+        if creates or updates:
+            refresh_derived_state()
+    for (key, digest, _), movie in zip(creates, created):
+        index.set(key, movie.pk, digest)
+    for key, digest, movie in updates:
+        index.set(key, movie.pk, digest)
+    stats["created"] += len(creates)
+    stats["updated"] += len(updates)
+
+
+def refresh_derived_state():
+    """Queue the refreshes the ``Movie`` signals would have made, for after the current transaction commits."""
+    transaction.on_commit(snapshot.mark_stale)
+    transaction.on_commit(facets.invalidate)
+    transaction.on_commit(autocomplete.invalidate)
+
+
+def parsed_batches(fh, fmt, offset, batch_size, workers):
+    """Yield ``(end_offset, parsed_rows)`` per batch, parsing in ``workers`` processes if > 1."""
+    header = None
+    if fmt == "csv":
+        header, data_start = read_header(fh)
+        offset = max(offset, data_start)
+    records = read_records(fh, fmt, offset)
+
+    def raw_batches():
+        batch, end = [], offset
+        for end, record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield end, batch
+                batch = []
+        if batch:
+            yield end, batch
+
+    if workers <= 1:
+        for end, batch in raw_batches():
+            yield end, parse_batch(fmt, header, batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for end, batch in raw_batches():
+            pending.append((end, pool.submit(parse_batch, fmt, header, batch)))
+            # Bound read-ahead so memory does not grow with the input size.
+            if len(pending) >= workers * 2:
+                end, future = pending.pop(0)
+                yield end, future.result()
+        for end, future in pending:
+            yield end, future.result()
+
+
+def new_stats():
+    return Counter(created=0, updated=0, unchanged=0, duplicate=0, invalid=0)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the first pages of the anonymous movie list (overall and for the most common genres) "
+        "into the memory-mapped snapshot served by /api/movies/. Later movie/review writes rebuild it "
+        "in the background with the same options."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=5, help="Pages rendered per list.")
+        parser.add_argument("--genres", type=int, default=10, help="Most common genres to render.")
+
+    def handle(self, *args, **options):
+        if not snapshot.snapshot_path():
+            raise CommandError("CATALOG_SNAPSHOT_PATH is not set.")
+        started = time.perf_counter()
+        index = snapshot.build(pages=options["pages"], genres=options["genres"])
+        pages = sum(len(entry["pages"]) for entry in index["lists"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {pages} pages for {len(index['lists'])} lists into {snapshot.snapshot_path()} "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a movie catalog (CSV with a header row, or JSON lines) into the database. "
+        "Rows are matched on normalised title + release year, so re-running is safe; "
+        "an interrupted import resumes from its last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file with title, description, release_year, genre columns.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--workers", type=int, default=1, help="Processes used for parsing.")
+        parser.add_argument("--state", help="Checkpoint file (default: var/imports/<file name>.json).")
+        parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the top.")
+        parser.add_argument("--progress-every", type=int, default=20, help="Report every N batches.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+        state_path = options["state"] or os.path.join(
+            settings.BASE_DIR, "var", "imports", os.path.basename(path) + ".json"
+        )
+        stat = os.stat(path)
+        source = {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+        offset, stats = 0, importer.new_stats()
+        state = self.load_state(state_path)
+        if state and not options["restart"]:
+            if state["source"] == source:
+                offset = state["offset"]
+                stats.update(state["stats"])
+                self.stdout.write(f"Resuming at byte {offset} of {stat.st_size}.")
+            else:
+                self.stdout.write(self.style.WARNING("Input changed since the checkpoint; starting over."))
+
+        started = time.perf_counter()
+        index = importer.CatalogIndex()
+        self.stdout.write(f"Indexed {len(index)} existing movies in {time.perf_counter() - started:.1f}s.")
+
+        rows = 0
+        started = time.perf_counter()
+        with open(path, "rb") as fh:
+            batches = importer.parsed_batches(fh, fmt, offset, options["batch_size"], options["workers"])
+            for number, (end, parsed) in enumerate(batches, 1):
+                importer.apply_batch(index, parsed, stats)
+                rows += len(parsed)
+                self.save_state(state_path, {"source": source, "offset": end, "stats": dict(stats)})
+                if number % options["progress_every"] == 0:
+                    self.report(rows, started, stats, end, stat.st_size)
+
+        self.report(rows, started, stats, stat.st_size, stat.st_size)
+        os.remove(state_path)
+        self.stdout.write(self.style.SUCCESS("Import complete."))
+
+    def report(self, rows, started, stats, offset, size):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        counts = ", ".join(f"{count} {name}" for name, count in stats.items())
+        percent = 100 * offset / size if size else 100
+        self.stdout.write(f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s, {percent:.0f}%): {counts}")
+
+    @staticmethod
+    def load_state(state_path):
+        try:
+            with open(state_path) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def save_state(state_path, state):
+        # Written after each batch commits; replaced atomically so a crash never leaves half a file.
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp = state_path + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, state_path)
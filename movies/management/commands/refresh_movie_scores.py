@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from movies.ratings import refresh_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount stored movie rating aggregates from reviews, recompute the global prior "
+        "and rescore every movie's weighted rating. Run periodically (e.g. hourly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-votes", type=int, default=None,
+                            help="Reviews a movie needs before its own average dominates the prior.")
+
+    def handle(self, *args, **options):
+        prior = refresh_scores(min_votes=options["min_votes"])
+        self.stdout.write(self.style.SUCCESS(f"Rescored movies with prior {prior}."))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['genre', 'release_year'], name='movies_movi_genre_b1c865_idx'),
+        ),
+    ]
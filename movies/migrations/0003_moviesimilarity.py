@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_movie_genre_year_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSimilarity',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity', serialize=False, to='movies.movie')),
+                ('neighbors', models.BinaryField()),
+                ('computed_at', models.DateTimeField()),
+                ('stale', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
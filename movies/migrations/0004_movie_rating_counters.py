@@ -0,0 +1,66 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:12
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_counters(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    RatingPrior = apps.get_model('movies', 'RatingPrior')
+    Review = apps.get_model('reviews', 'Review')
+
+    per_movie = Review.objects.filter(movie=OuterRef('pk')).order_by().values('movie')
+    Movie.objects.update(
+        rating_count=Coalesce(Subquery(per_movie.annotate(n=Count('id')).values('n')), 0),
+        rating_sum=Coalesce(Subquery(per_movie.annotate(s=Sum('rating')).values('s')), 0),
+    )
+    prior = RatingPrior.objects.create(pk=1, mean=Review.objects.aggregate(mean=Avg('rating'))['mean'] or 3.0)
+    Movie.objects.update(weighted_rating=ExpressionWrapper(
+        (F('rating_sum') + prior.min_votes * prior.mean) / (F('rating_count') + prior.min_votes),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_moviesimilarity'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingPrior',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean', models.FloatField(default=3.0)),
+                ('min_votes', models.PositiveIntegerField(default=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='weighted_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-weighted_rating', '-rating_count'], name='movies_movi_weighte_3c2844_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['genre', '-weighted_rating', '-rating_count'], name='movies_movi_genre_0da8a3_idx'),
+        ),
+        migrations.RunPython(backfill_rating_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:22
+
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_rating_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='movie',
+            options={'base_manager_name': 'all_objects', 'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelManagers(
+            name='movie',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_weighte_3c2844_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_genre_0da8a3_idx',
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='hidden',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('hidden', False)), fields=['-weighted_rating', '-rating_count'], name='movie_visible_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('hidden', False)), fields=['genre', '-weighted_rating', '-rating_count'], name='movie_visible_genre_rating_idx'),
+        ),
+    ]
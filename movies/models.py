@@ -1,4 +1,11 @@
 from django.db import models
+from django.db.models import Q
+
+class MovieManager(models.Manager):
+    """Excludes movies hidden while ``movies.deletion`` removes them in the background."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(hidden=False)
 
 class Movie(models.Model):
     title = models.CharField(max_length=255)
@@ -6,12 +13,62 @@ class Movie(models.Model):
     release_year = models.PositiveIntegerField(null=True, blank=True)
     genre = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained from review writes by movies.ratings; never set these directly.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    weighted_rating = models.FloatField(null=True, blank=True, editable=False)
+    hidden = models.BooleanField(default=False, editable=False)
+
+    objects = MovieManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created_at"]
-        indexes = [models.Index(fields=["title"])]
+        base_manager_name = "all_objects"
+        indexes = [
+            models.Index(fields=["title"]),
+            models.Index(fields=["genre", "release_year"]),
+            # Partial, so top-rated queries (which exclude hidden movies) can be answered from them alone.
+            models.Index(fields=["-weighted_rating", "-rating_count"], condition=Q(hidden=False),
+                         name="movie_visible_rating_idx"),
+            models.Index(fields=["genre", "-weighted_rating", "-rating_count"], condition=Q(hidden=False),
+                         name="movie_visible_genre_rating_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+class RatingPrior(models.Model):
+    """
+    Global prior for the Bayesian weighted rating (single row, pk=1):
+    ``(rating_sum + min_votes * mean) / (rating_count + min_votes)``.
+    """
+    mean = models.FloatField(default=3.0)
+    min_votes = models.PositiveIntegerField(default=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"mean={self.mean:.3f}, min_votes={self.min_votes}"
+
+
+class CatalogGeneration(models.Model):
+    """
+    Bumped on every ``Movie`` write (single row, pk=1). Facet counts are cached
+    per generation, so a write in any process invalidates them in all of them.
+    """
+    generation = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"generation {self.generation}"
+
+class MovieSimilarity(models.Model):
+    """Precomputed top-K similar movies, packed by ``movies.similarity.pack_neighbors``."""
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name="similarity")
+    neighbors = models.BinaryField()
+    computed_at = models.DateTimeField()
+    stale = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Similar movies for {self.movie_id}"
+
 # Create your models here.
@@ -0,0 +1,113 @@
+"""
+Stored rating aggregates and the Bayesian ("IMDb-style") weighted rating.
+
+Every review write adjusts ``Movie.rating_count``/``rating_sum`` and recomputes
+``weighted_rating`` in a single UPDATE that reads the prior from ``RatingPrior``
+via a subquery. The prior row is created by the migration that added it; without
+it every weighted rating would silently become NULL, so its absence is an error.
+``refresh_scores`` resynchronises the counters from the review table and
+recomputes the global prior; run it periodically. API responses read
+``average_rating``/``review_count`` from the same counters (``stored_aggregates``).
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Movie, RatingPrior
+
+PRIOR_PK = 1
+_prior_checked = False
+
+
+def weighted_rating(count, total):
+    global _prior_checked
+    if not _prior_checked:
+        # Checked once per process: the row is never deleted by the application.
+        if not RatingPrior.objects.filter(pk=PRIOR_PK).exists():
+            raise ImproperlyConfigured(
+                "The RatingPrior row is missing; run `manage.py migrate` or `manage.py refresh_movie_scores`."
+            )
+        _prior_checked = True
+    prior = RatingPrior.objects.filter(pk=PRIOR_PK)
+    min_votes = Subquery(prior.values("min_votes")[:1])
+    mean = Subquery(prior.values("mean")[:1])
+    return ExpressionWrapper((total + min_votes * mean) / (count + min_votes), output_field=FloatField())
+
+
+def average_rating():
+    """Per-movie average from the stored counters (the movie must have ratings)."""
+    return ExpressionWrapper(F("rating_sum") * Value(1.0) / F("rating_count"), output_field=FloatField())
+
+
+def stored_aggregates():
+    """``average_rating`` (``None`` without ratings) and ``review_count`` annotations from the stored counters."""
+    return {
+        "average_rating": Case(When(rating_count=0, then=None), default=average_rating(), output_field=FloatField()),
+        "review_count": F("rating_count"),
+    }
+
+
+def rating_distribution(movie_id):
+    """``{1: n, ..., 5: n}``: how many of the movie's reviews gave each rating, in one GROUP BY."""
+    from reviews.models import Review
+
+    counts = dict(Review.objects.filter(movie_id=movie_id).order_by().values_list("rating").annotate(n=Count("id")))
+    return {rating: counts.get(rating, 0) for rating in range(1, 6)}
+
+
+def apply_rating_change(movie_id, count_delta, sum_delta):
+    count = F("rating_count") + count_delta
+    total = F("rating_sum") + sum_delta
+    Movie.objects.filter(pk=movie_id).update(
+        rating_count=count, rating_sum=total, weighted_rating=weighted_rating(count, total)
+    )
+
+
+def apply_rating_changes(deltas):
+    """Apply ``{movie_id: (count_delta, sum_delta)}`` to many movies in one UPDATE."""
+    if not deltas:
+        return
+
+    def per_movie(position):
+        whens = [When(pk=movie_id, then=Value(delta[position])) for movie_id, delta in deltas.items()]
+        return Case(*whens, default=Value(0), output_field=IntegerField())
+
+    count = F("rating_count") + per_movie(0)
+    total = F("rating_sum") + per_movie(1)
+    Movie.objects.filter(pk__in=list(deltas)).update(
+        rating_count=count, rating_sum=total, weighted_rating=weighted_rating(count, total)
+    )
+
+
+def resync_movie(movie_id):
+    """Recount one movie from its reviews, for writes whose previous values are unknown."""
+    from reviews.models import Review
+
+    stats = Review.objects.filter(movie_id=movie_id).aggregate(n=Count("id"), s=Sum("rating"))
+    Movie.objects.filter(pk=movie_id).update(
+        rating_count=stats["n"],
+        rating_sum=stats["s"] or 0,
+        weighted_rating=weighted_rating(Value(stats["n"]), Value(stats["s"] or 0)),
+    )
+
+
+def refresh_scores(min_votes=None):
+    """Recount every movie from its reviews, recompute the global mean and rescore the catalog."""
+    from reviews.models import Review
+
+    per_movie = Review.objects.filter(movie=OuterRef("pk")).order_by().values("movie")
+    with transaction.atomic():
+        Movie.objects.update(
+            rating_count=Coalesce(Subquery(per_movie.annotate(n=Count("id")).values("n")), 0),
+            rating_sum=Coalesce(Subquery(per_movie.annotate(s=Sum("rating")).values("s")), 0),
+        )
+        prior, _ = RatingPrior.objects.get_or_create(pk=PRIOR_PK)
+        prior.mean = Review.objects.aggregate(mean=Avg("rating"))["mean"] or prior.mean
+        if min_votes is not None:
+            prior.min_votes = min_votes
+        prior.save()
+        Movie.objects.update(weighted_rating=weighted_rating(F("rating_count"), F("rating_sum")))
+    return prior
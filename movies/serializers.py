@@ -7,5 +7,15 @@ class MovieSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Movie
-        fields = ("id", "title", "description", "release_year", "genre", "created_at", "average_rating", "review_count")
+        fields = ("id", "title", "description", "release_year", "genre", "created_at", "average_rating", "review_count",
+                  "weighted_rating")
+        read_only_fields = ("weighted_rating",)
+
+    def update(self, instance, validated_data):
+        # Only write the edited columns so concurrent review writes to the
+        # rating counters are not overwritten with stale values.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
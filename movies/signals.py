@@ -0,0 +1,34 @@
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete, facets, snapshot
+from .models import Movie
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def refresh_catalog_snapshot(sender, instance, **kwargs):
+    transaction.on_commit(snapshot.mark_stale)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_facets(sender, instance, **kwargs):
+    transaction.on_commit(facets.invalidate)
+
+
+@receiver(post_save, sender=Movie)
+def index_title(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.movie_saved(instance))
+
+
+@receiver(post_delete, sender=Movie)
+def unindex_title(sender, instance, **kwargs):
+    movie_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.movie_deleted(movie_id))
+
+
+# Each worker builds its title index in the background once it starts serving (see movies.autocomplete).
+request_started.connect(autocomplete.warm, dispatch_uid="movies.autocomplete.warm")
@@ -0,0 +1,189 @@
+"""
+Item-item "similar movies" built from co-ratings.
+
+Ratings are loaded into flat NumPy arrays sorted by movie (a CSC-style layout
+with an ``indptr`` per movie). Similarities for a block of target movies are
+computed by scattering the targets into a dense ``users x block`` matrix and
+reducing every other movie's ratings against it, so peak memory is bounded by
+the block size rather than by ``movies x movies``. Only the top-K neighbours of
+each movie are kept, packed as little-endian (int64 id, float32 score) pairs.
+"""
+import itertools
+
+import numpy as np
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from reviews.models import Review
+from .models import MovieSimilarity
+
+NEIGHBOR_DTYPE = np.dtype([("id", "<i8"), ("score", "<f4")])
+
+
+def pack_neighbors(ids, scores):
+    packed = np.empty(len(ids), dtype=NEIGHBOR_DTYPE)
+    packed["id"] = ids
+    packed["score"] = scores
+    return packed.tobytes()
+
+
+def unpack_neighbors(blob):
+    return np.frombuffer(bytes(blob), dtype=NEIGHBOR_DTYPE)
+
+
+class RatingMatrix:
+    """Sparse user x movie rating matrix stored column-wise in NumPy arrays."""
+
+    def __init__(self, user_ids, movie_ids, ratings, adjusted=True):
+        order = np.argsort(movie_ids, kind="stable")
+        user_ids, movie_ids, ratings = user_ids[order], movie_ids[order], ratings[order].astype(np.float32)
+
+        self.user_ids, self.user_index = np.unique(user_ids, return_inverse=True)
+        self.movie_ids, movie_index, counts = np.unique(movie_ids, return_inverse=True, return_counts=True)
+        self.indptr = np.concatenate(([0], np.cumsum(counts)))
+        self.user_index = self.user_index.astype(np.int32)
+
+        if adjusted:
+            # Adjusted cosine: remove each user's rating bias before comparing movies.
+            sums = np.bincount(self.user_index, weights=ratings)
+            totals = np.bincount(self.user_index)
+            ratings = ratings - (sums / totals).astype(np.float32)[self.user_index]
+        self.values = ratings
+        self.norms = np.sqrt(np.bincount(movie_index, weights=ratings.astype(np.float64) ** 2)).astype(np.float32)
+
+    @classmethod
+    def from_reviews(cls, queryset, chunk_size=100_000, adjusted=True):
+        """Stream ``(user_id, movie_id, rating)`` rows from the database into arrays."""
+        rows = queryset.values_list("user_id", "movie_id", "rating").order_by().iterator(chunk_size=chunk_size)
+        chunks = []
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            chunks.append(np.array(chunk, dtype=np.int64))
+        data = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+        return cls(data[:, 0], data[:, 1], data[:, 2], adjusted=adjusted)
+
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    @property
+    def n_users(self):
+        return len(self.user_ids)
+
+    @property
+    def n_movies(self):
+        return len(self.movie_ids)
+
+    def positions(self, movie_ids):
+        """Column positions of ``movie_ids`` (ids without ratings are dropped)."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        pos = np.searchsorted(self.movie_ids, movie_ids)
+        pos = np.clip(pos, 0, max(self.n_movies - 1, 0))
+        return pos[self.movie_ids[pos] == movie_ids] if self.n_movies else pos[:0]
+
+
+def top_k_neighbors(matrix, k=20, targets=None, memory_bytes=256 * 2**20, shrinkage=10.0, entries_per_step=32_768):
+    """
+    Yield ``(movie_id, neighbor_ids, scores)`` for each target movie.
+
+    ``targets`` are movie ids (default: every rated movie). Scores are cosine
+    similarities damped by ``n / (n + shrinkage)`` where ``n`` is the number of
+    co-raters, so pairs supported by a single shared user do not dominate.
+    """
+    if matrix.n_movies == 0:
+        return
+    target_pos = np.arange(matrix.n_movies) if targets is None else matrix.positions(targets)
+    # Bytes per target column: the dense user block and per-step gather (2 x float32),
+    # plus the reduced sums, scores and argpartition indices over all movies.
+    per_column = 8 * (matrix.n_users + entries_per_step) + 20 * matrix.n_movies
+    block = int(max(1, min(len(target_pos), memory_bytes // per_column)))
+    bounds = _entry_steps(matrix.indptr, entries_per_step)
+
+    for start in range(0, len(target_pos), block):
+        cols = target_pos[start:start + block]
+        width = len(cols)
+        # Left half holds the targets' ratings, right half marks who rated them,
+        # so one gather per step yields both dot products and co-rater counts.
+        dense = np.zeros((matrix.n_users, 2 * width), dtype=np.float32)
+        for c, pos in enumerate(cols):
+            lo, hi = matrix.indptr[pos], matrix.indptr[pos + 1]
+            dense[matrix.user_index[lo:hi], c] = matrix.values[lo:hi]
+            dense[matrix.user_index[lo:hi], width + c] = 1.0
+
+        reduced = np.empty((matrix.n_movies, 2 * width), dtype=np.float32)
+        for m0, m1 in bounds:
+            lo, hi = matrix.indptr[m0], matrix.indptr[m1]
+            gathered = dense[matrix.user_index[lo:hi]]
+            gathered[:, :width] *= matrix.values[lo:hi, None]
+            reduced[m0:m1] = np.add.reduceat(gathered, matrix.indptr[m0:m1] - lo, axis=0)
+        dots, overlap = reduced[:, :width], reduced[:, width:]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = dots / (matrix.norms[:, None] * matrix.norms[cols][None, :])
+            scores *= overlap / (overlap + shrinkage)
+        scores[~np.isfinite(scores) | (overlap == 0)] = -np.inf
+        scores[cols, np.arange(len(cols))] = -np.inf
+
+        kk = min(k, matrix.n_movies - 1)
+        if kk <= 0:
+            for pos in cols:
+                yield int(matrix.movie_ids[pos]), matrix.movie_ids[:0], scores[:0, 0]
+            continue
+        best = np.argpartition(-scores, kk - 1, axis=0)[:kk]
+        for c, pos in enumerate(cols):
+            idx = best[:, c]
+            col_scores = scores[idx, c]
+            keep = col_scores > 0
+            idx, col_scores = idx[keep], col_scores[keep]
+            order = np.argsort(-col_scores, kind="stable")
+            yield int(matrix.movie_ids[pos]), matrix.movie_ids[idx[order]], col_scores[order]
+
+
+def _entry_steps(indptr, entries_per_step):
+    """Split movies into consecutive ranges holding roughly ``entries_per_step`` ratings."""
+    steps = []
+    m0 = 0
+    n = len(indptr) - 1
+    while m0 < n:
+        m1 = int(np.searchsorted(indptr, indptr[m0] + entries_per_step, side="right")) - 1
+        m1 = min(max(m1, m0 + 1), n)
+        steps.append((m0, m1))
+        m0 = m1
+    return steps
+
+
+def rebuild(k=20, incremental=False, memory_bytes=256 * 2**20, shrinkage=10.0, adjusted=True):
+    """
+    Recompute and store neighbour lists. With ``incremental`` only movies whose
+    stored list is stale (or missing) are recomputed; the rating matrix is still
+    loaded in full because every neighbour score depends on it.
+    """
+    matrix = RatingMatrix.from_reviews(Review.objects.all(), adjusted=adjusted)
+    targets = None
+    if incremental:
+        fresh = MovieSimilarity.objects.filter(stale=False).values_list("movie_id", flat=True)
+        targets = np.setdiff1d(matrix.movie_ids, np.fromiter(fresh.iterator(), dtype=np.int64))
+
+    now = timezone.now()
+    batch = []
+    written = 0
+    for movie_id, ids, scores in top_k_neighbors(matrix, k=k, targets=targets, memory_bytes=memory_bytes, shrinkage=shrinkage):
+        batch.append(MovieSimilarity(movie_id=movie_id, neighbors=pack_neighbors(ids, scores), computed_at=now, stale=False))
+        if len(batch) >= 1000:
+            written += _upsert(batch)
+            batch = []
+    written += _upsert(batch)
+
+    # Movies that lost all their ratings keep no neighbours.
+    MovieSimilarity.objects.filter(~Exists(Review.objects.filter(movie_id=OuterRef("movie_id")))).delete()
+    return matrix, written
+
+
+def _upsert(rows):
+    if rows:
+        MovieSimilarity.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["movie"], update_fields=["neighbors", "computed_at", "stale"]
+        )
+    return len(rows)
@@ -0,0 +1,183 @@
+"""
+Precomputed anonymous catalog pages.
+
+``build`` renders the first pages of ``/api/movies/`` in its default order,
+overall and for the most common genres, into one file: a magic line, an 8-byte
+index length, a JSON index of ``(offset, length)`` per page (relative to the
+end of the index), then each page's rendered ``results`` array. ``serve``
+answers matching anonymous requests straight from a memory-mapped copy, only
+building the pagination envelope, so the hot path runs no query and no
+serializer.
+
+Movie and review writes call ``mark_stale``, which queues a rebuild for
+``manage.py run_workers`` to run after ``REBUILD_DELAY`` seconds (bursts of
+writes coalesce into one rebuild). Anonymous readers may see data that is a
+few seconds old.
+"""
+import json
+import mmap
+import os
+import struct
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGIC = b"MVSNAP1\n"
+REBUILD_DELAY = 5.0
+
+
+def snapshot_path():
+    return os.fspath(settings.CATALOG_SNAPSHOT_PATH) if settings.CATALOG_SNAPSHOT_PATH else None
+
+
+def build(pages=5, genres=10, path=None):
+    """Render the snapshot and atomically replace the file; returns the index."""
+    from rest_framework.renderers import JSONRenderer
+
+    from .serializers import MovieSerializer
+    from .views import MovieViewSet
+
+    path = path or snapshot_path()
+    page_size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+    queryset = MovieViewSet().get_queryset()
+    common = (
+        queryset.model.objects.exclude(genre="").order_by().values("genre").annotate(n=Count("id"))
+        .order_by("-n", "genre").values_list("genre", flat=True)[:genres]
+    )
+    renderer = JSONRenderer()
+
+    blobs = []
+    lists = {}
+    offset = 0
+    for genre in [None, *common]:
+        filtered = queryset if genre is None else queryset.filter(genre=genre)
+        entry = {"count": filtered.count(), "pages": []}
+        for number in range(pages):
+            movies = list(filtered[number * page_size:(number + 1) * page_size])
+            if not movies and number:
+                break
+            blob = renderer.render(MovieSerializer(movies, many=True).data)
+            entry["pages"].append([offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        lists["" if genre is None else genre] = entry
+
+    index = {"built_at": timezone.now().isoformat(), "page_size": page_size, "pages": pages, "genres": genres,
+             "lists": lists}
+    header = json.dumps(index).encode()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack("<Q", len(header)))
+        fh.write(header)
+        for blob in blobs:
+            fh.write(blob)
+    os.replace(tmp, path)
+    return index
+
+
+class Snapshot:
+    """A memory-mapped snapshot file; reopened when the file is replaced."""
+
+    _open = {}
+
+    def __init__(self, path, stat):
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with open(path, "rb") as fh:
+            self.buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (length,) = struct.unpack_from("<Q", self.buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.index = json.loads(self.buffer[start:start + length])
+        self.data_start = start + length
+
+    @classmethod
+    def current(cls):
+        path = snapshot_path()
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        snapshot = cls._open.get(path)
+        if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            snapshot = cls._open[path] = cls(path, stat)
+        return snapshot
+
+    def page(self, genre, number):
+        """Return ``(count, last_page, results_bytes)`` or ``None`` if not in the snapshot."""
+        entry = self.index["lists"].get(genre)
+        if entry is None or not 1 <= number <= len(entry["pages"]):
+            return None
+        offset, length = entry["pages"][number - 1]
+        offset += self.data_start
+        last_page = max(1, -(-entry["count"] // self.index["page_size"]))
+        return entry["count"], last_page, self.buffer[offset:offset + length]
+
+
+def serve(request):
+    """Answer an anonymous default-order movie list request from the snapshot, or return ``None``."""
+    if request.user.is_authenticated or request.accepted_renderer.format != "json":
+        return None
+    params = request.query_params
+    if set(params) - {"page", "genre"} or any(len(params.getlist(key)) > 1 for key in params):
+        return None
+    page = params.get("page", "1")
+    if not page.isdigit():
+        return None
+    snapshot = Snapshot.current()
+    found = snapshot and snapshot.page(params.get("genre", ""), int(page))
+    if not found:
+        return None
+
+    count, last_page, results = found
+    number = int(page)
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, "page", number + 1) if number < last_page else None
+    if number <= 1:
+        previous_url = None
+    elif number == 2:
+        previous_url = remove_query_param(url, "page")
+    else:
+        previous_url = replace_query_param(url, "page", number - 1)
+    head = b'{"count":%d,"next":%s,"previous":%s,"results":' % (
+        count, json.dumps(next_url).encode(), json.dumps(previous_url).encode(),
+    )
+    response = HttpResponse(head + results + b"}", content_type="application/json")
+    response["X-Catalog-Snapshot"] = snapshot.index["built_at"]
+    return response
+
+
+def mark_stale():
+    """Queue a rebuild if a snapshot is in use; bursts of writes share one rebuild."""
+    from tasks.queue import enqueue
+
+    path = snapshot_path()
+    if not path or not os.path.exists(path):
+        return
+    enqueue("movies.tasks.rebuild_catalog_snapshot", key="catalog-snapshot", delay=REBUILD_DELAY)
+
+
+def rebuild():
+    """Rebuild the snapshot with the options it was built with; does nothing if there is none."""
+    snapshot = Snapshot.current()
+    if snapshot is None:
+        return
+    path = snapshot_path()
+    options = {"pages": snapshot.index["pages"], "genres": snapshot.index["genres"]}
+    with open(f"{path}.lock", "w") as lock:
+        if fcntl:
+            # One process rebuilds at a time; the others wait and rebuild with fresher data.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        build(path=path, **options)
@@ -0,0 +1,19 @@
+from tasks.queue import task
+
+from . import deletion, snapshot
+from .ratings import resync_movie
+
+
+@task
+def rebuild_catalog_snapshot():
+    snapshot.rebuild()
+
+
+@task
+def resync_movie_rating(movie_id):
+    resync_movie(movie_id)
+
+
+@task
+def delete_movie(movie_id):
+    deletion.delete_movie(movie_id)
@@ -1,4 +1,10 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APITestCase
@@ -281,3 +287,706 @@ class MovieAPITestCase(APITestCase):
         # Should be ordered by review count ascending (lowest first)
         self.assertEqual(response.data['results'][0]['title'], 'Movie 2')
         self.assertEqual(response.data['results'][1]['title'], 'Movie 1')
+
+
+class SimilarMoviesTestCase(APITestCase):
+    def setUp(self):
+        from reviews.models import Review
+
+        self.users = [
+            User.objects.create_user(username=f'rater{i}', email=f'rater{i}@example.com', password='testpass123')
+            for i in range(4)
+        ]
+        self.movies = [Movie.objects.create(title=f'Movie {i}', genre='Action', release_year=2020) for i in range(4)]
+        # Movies 0 and 1 are rated alike by everyone; movie 2 is rated the opposite way.
+        ratings = [(5, 5, 1), (4, 4, 2), (1, 1, 5), (2, 2, 4)]
+        for user, row in zip(self.users, ratings):
+            for movie, rating in zip(self.movies, row):
+                Review.objects.create(user=user, movie=movie, rating=rating, content='Review')
+
+    def test_top_k_matches_dense_computation(self):
+        """Test that chunked neighbour computation matches a dense cosine similarity"""
+        import numpy as np
+        from movies.similarity import RatingMatrix, top_k_neighbors
+
+        rng = np.random.default_rng(0)
+        users, movies = np.nonzero(rng.random((40, 30)) < 0.3)
+        ratings = rng.integers(1, 6, size=len(users))
+        matrix = RatingMatrix(users.astype(np.int64), movies.astype(np.int64) + 1, ratings, adjusted=False)
+
+        dense = np.zeros((40, 30))
+        dense[users, movies] = ratings
+        norms = np.linalg.norm(dense, axis=0)
+        overlap = (dense > 0).T.astype(float) @ (dense > 0).astype(float)
+        expected = (dense.T @ dense) / np.outer(norms, norms) * overlap / (overlap + 2.0)
+
+        results = top_k_neighbors(matrix, k=5, memory_bytes=4096, shrinkage=2.0, entries_per_step=16)
+        for movie_id, ids, scores in results:
+            column = expected[movie_id - 1].copy()
+            column[movie_id - 1] = -np.inf
+            np.testing.assert_allclose(scores, np.sort(column)[::-1][:len(scores)], rtol=1e-4)
+            np.testing.assert_allclose(column[ids - 1], scores, rtol=1e-4)
+
+    def test_similar_movies_endpoint(self):
+        """Test that /similar/ serves the precomputed neighbours in score order"""
+        call_command('build_similar_movies', shrinkage=0, stdout=StringIO())
+
+        url = reverse('movie-similar', kwargs={'pk': self.movies[0].pk})
+        response = self.client.get(url, {'limit': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.movies[1].pk)
+        self.assertAlmostEqual(response.data['results'][0]['similarity'], 1.0, places=3)
+
+    def test_similar_movies_before_build_and_missing_movie(self):
+        """Test that /similar/ is empty before a build and 404s for unknown movies"""
+        response = self.client.get(reverse('movie-similar', kwargs={'pk': self.movies[0].pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get(reverse('movie-similar', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_similar_movies_skip_hidden_movies(self):
+        """Test that /similar/ 404s for a hidden movie and leaves hidden movies out of the neighbours"""
+        call_command('build_similar_movies', shrinkage=0, stdout=StringIO())
+        Movie.all_objects.filter(pk=self.movies[1].pk).update(hidden=True)
+
+        response = self.client.get(reverse('movie-similar', kwargs={'pk': self.movies[0].pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.movies[1].pk, [movie['id'] for movie in response.data['results']])
+
+        response = self.client.get(reverse('movie-similar', kwargs={'pk': self.movies[1].pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_incremental_refresh_only_recomputes_stale_movies(self):
+        """Test that review writes mark similarities stale for the incremental build"""
+        from reviews.models import Review
+        from .models import MovieSimilarity
+
+        call_command('build_similar_movies', stdout=StringIO())
+        self.assertFalse(MovieSimilarity.objects.filter(stale=True).exists())
+
+        Review.objects.filter(user=self.users[0], movie=self.movies[2]).update(rating=5)
+        Review.objects.get(user=self.users[0], movie=self.movies[2]).save()
+        self.assertEqual(list(MovieSimilarity.objects.filter(stale=True).values_list('movie_id', flat=True)), [self.movies[2].pk])
+
+        out = StringIO()
+        call_command('build_similar_movies', incremental=True, stdout=out)
+        self.assertIn('Stored neighbours for 1 movies', out.getvalue())
+        self.assertFalse(MovieSimilarity.objects.filter(stale=True).exists())
+
+
+class TopRatedMoviesTestCase(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'voter{i}', email=f'voter{i}@example.com', password='testpass123')
+            for i in range(12)
+        ]
+
+    def review(self, user, movie, rating):
+        from reviews.models import Review
+        return Review.objects.create(user=user, movie=movie, rating=rating, content='Review')
+
+    def test_counters_follow_review_writes(self):
+        """Test that stored rating counters track review create, update and delete"""
+        movie = Movie.objects.create(title='Counted', genre='Drama', release_year=2020)
+        other = Movie.objects.create(title='Other', genre='Drama', release_year=2020)
+        first = self.review(self.users[0], movie, 5)
+        self.review(self.users[1], movie, 3)
+
+        movie.refresh_from_db()
+        self.assertEqual((movie.rating_count, movie.rating_sum), (2, 8))
+
+        first.rating = 1
+        first.save()
+        movie.refresh_from_db()
+        self.assertEqual((movie.rating_count, movie.rating_sum), (2, 4))
+
+        first.movie = other
+        first.save()
+        first.delete()
+        movie.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((movie.rating_count, movie.rating_sum), (1, 3))
+        self.assertEqual((other.rating_count, other.rating_sum), (0, 0))
+
+    def test_top_rated_prefers_well_supported_ratings(self):
+        """Test that a single 5-star review does not outrank many strong reviews"""
+        lucky = Movie.objects.create(title='One Hit', genre='Drama', release_year=2020)
+        solid = Movie.objects.create(title='Crowd Favourite', genre='Drama', release_year=2020)
+        filler = Movie.objects.create(title='Filler', genre='Drama', release_year=2020)
+        Movie.objects.create(title='Unreviewed', genre='Drama', release_year=2020)
+        self.review(self.users[0], lucky, 5)
+        for user in self.users:
+            self.review(user, solid, 5 if user.pk % 2 else 4)
+            self.review(user, filler, 2)
+        call_command('refresh_movie_scores', stdout=StringIO())
+
+        response = self.client.get(reverse('movie-top-rated'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [movie['title'] for movie in response.data['results']]
+        self.assertEqual(titles, ['Crowd Favourite', 'One Hit', 'Filler'])
+        self.assertEqual(response.data['results'][1]['average_rating'], 5.0)
+        self.assertEqual(response.data['results'][0]['review_count'], 12)
+
+    def test_top_rated_filters(self):
+        """Test that top-rated can be filtered by genre and release year"""
+        drama = Movie.objects.create(title='Drama', genre='Drama', release_year=2020)
+        comedy = Movie.objects.create(title='Comedy', genre='Comedy', release_year=2021)
+        self.review(self.users[0], drama, 4)
+        self.review(self.users[0], comedy, 4)
+
+        response = self.client.get(reverse('movie-top-rated'), {'genre': 'Comedy'})
+        self.assertEqual([m['title'] for m in response.data['results']], ['Comedy'])
+
+        response = self.client.get(reverse('movie-top-rated'), {'release_year': 2020})
+        self.assertEqual([m['title'] for m in response.data['results']], ['Drama'])
+
+    def test_refresh_movie_scores_resyncs_counters(self):
+        """Test that the periodic refresh repairs counters changed behind the signals' back"""
+        from reviews.models import Review
+
+        movie = Movie.objects.create(title='Drifted', genre='Drama', release_year=2020)
+        self.review(self.users[0], movie, 2)
+        Review.objects.filter(movie=movie).update(rating=4)
+
+        call_command('refresh_movie_scores', min_votes=1, stdout=StringIO())
+
+        movie.refresh_from_db()
+        self.assertEqual((movie.rating_count, movie.rating_sum), (1, 4))
+        # Prior mean is 4.0 with min_votes=1, so the weighted score is (4 + 4) / 2.
+        self.assertAlmostEqual(movie.weighted_rating, 4.0)
+
+
+    def test_list_and_detail_read_stored_aggregates(self):
+        """Test that list and detail serve average rating and review count without joining reviews"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        movie = Movie.objects.create(title='Stored', genre='Drama', release_year=2020)
+        Movie.objects.create(title='Unrated', genre='Drama', release_year=2020)
+        self.review(self.users[0], movie, 5)
+        self.review(self.users[1], movie, 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            listed = self.client.get(reverse('movie-list'), {'ordering': '-average_rating'})
+            detail = self.client.get(reverse('movie-detail', kwargs={'pk': movie.pk}))
+
+        self.assertFalse([query for query in queries.captured_queries if 'reviews_review' in query['sql']])
+        self.assertEqual([(m['title'], m['average_rating'], m['review_count']) for m in listed.data['results']],
+                         [('Stored', 3.5, 2), ('Unrated', None, 0)])
+        self.assertEqual((detail.data['average_rating'], detail.data['review_count']), (3.5, 2))
+
+    def test_missing_prior_fails_loudly(self):
+        """Test that review writes refuse to run without the RatingPrior row instead of storing NULL scores"""
+        from unittest import mock
+        from django.core.exceptions import ImproperlyConfigured
+        from movies.models import RatingPrior
+
+        RatingPrior.objects.all().delete()
+        movie = Movie.objects.create(title='Unscored', genre='Drama', release_year=2020)
+
+        with mock.patch('movies.ratings._prior_checked', False), self.assertRaises(ImproperlyConfigured):
+            self.review(self.users[0], movie, 4)
+
+
+class ImportMoviesTestCase(TestCase):
+    CSV = (
+        'title,description,release_year,genre\n'
+        'Inception,"A dream\nwithin a ""dream""",2010,Sci-Fi\n'
+        'Heat,Crime saga,1995,Crime\n'
+        ',No title,2000,Drama\n'
+        'Alien,In space,not-a-year,Horror\n'
+        'heat,Crime saga (remastered),1995,Crime\n'
+    )
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+        self.state = os.path.join(self.dir, 'state.json')
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', newline='') as fh:
+            fh.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_movies', path, '--state', self.state, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_csv_with_quoted_newlines_and_invalid_rows(self):
+        """Test that multi-line quoted fields parse and invalid rows are counted, not imported"""
+        output = self.run_import(self.write('catalog.csv', self.CSV))
+
+        self.assertEqual(Movie.objects.count(), 2)
+        self.assertEqual(Movie.objects.get(title='Inception').description, 'A dream\nwithin a "dream"')
+        # The later "heat" row wins within the batch.
+        self.assertEqual(Movie.objects.get(title__iexact='heat').description, 'Crime saga (remastered)')
+        self.assertIn('2 invalid', output)
+        self.assertIn('1 duplicate', output)
+        self.assertIn('rows/s', output)
+        self.assertFalse(os.path.exists(self.state))
+
+    def test_reimport_matches_normalized_title_and_year(self):
+        """Test that existing movies are matched on normalised title + year and only changes are written"""
+        existing = Movie.objects.create(title='The  Matrix', release_year=1999, genre='Sci-Fi', description='Old')
+        Movie.objects.create(title='The Matrix', release_year=2021, genre='Sci-Fi', description='Reboot')
+        rows = [
+            {'title': 'the matrix', 'release_year': 1999, 'genre': 'Sci-Fi', 'description': 'New'},
+            {'title': 'THE MATRIX', 'release_year': 2021, 'genre': 'Sci-Fi', 'description': 'Reboot'},
+        ]
+        path = self.write('catalog.jsonl', ''.join(json.dumps(row) + '\n' for row in rows))
+
+        output = self.run_import(path)
+
+        self.assertEqual(Movie.objects.count(), 2)
+        existing.refresh_from_db()
+        self.assertEqual((existing.title, existing.description), ('The  Matrix', 'New'))
+        self.assertIn('0 created, 1 updated, 1 unchanged', output)
+
+    def test_resume_from_checkpoint(self):
+        """Test that an interrupted import resumes after the last committed batch"""
+        path = self.write('catalog.jsonl', ''.join(
+            json.dumps({'title': f'Film {i}', 'release_year': 2000 + i}) + '\n' for i in range(10)
+        ))
+        first_batch = sum(len(json.dumps({'title': f'Film {i}', 'release_year': 2000 + i})) + 1 for i in range(4))
+        stat = os.stat(path)
+        with open(self.state, 'w') as fh:
+            json.dump({
+                'source': {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime},
+                'offset': first_batch,
+                'stats': {'created': 4},
+            }, fh)
+
+        output = self.run_import(path, '--batch-size', '3')
+
+        self.assertIn(f'Resuming at byte {first_batch}', output)
+        self.assertEqual(sorted(Movie.objects.values_list('release_year', flat=True)), list(range(2004, 2010)))
+        self.assertIn('10 created', output)
+
+    def test_import_refreshes_derived_state(self):
+        """Test that a batch that writes movies refreshes the snapshot, facets and autocomplete on commit"""
+        from movies import autocomplete, facets, snapshot
+
+        path = self.write('catalog.csv', self.CSV)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.run_import(path)
+        self.assertEqual(callbacks, [snapshot.mark_stale, facets.invalidate, autocomplete.invalidate])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.run_import(path, '--restart')
+        self.assertEqual(callbacks, [])
+
+    def test_parallel_parsing_matches_serial(self):
+        """Test that parsing across worker processes imports the same rows"""
+        path = self.write('catalog.csv', self.CSV)
+
+        self.run_import(path, '--workers', '2', '--batch-size', '2')
+
+        # "heat" lands in a later batch than "Heat", so it updates the existing movie.
+        self.assertEqual(sorted(Movie.objects.values_list('title', flat=True)), ['Heat', 'Inception'])
+        self.assertEqual(Movie.objects.get(title='Heat').description, 'Crime saga (remastered)')
+
+
+class CatalogSnapshotTestCase(APITestCase):
+    def setUp(self):
+        from django.test import override_settings
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, 'catalog.snapshot')
+        override = override_settings(CATALOG_SNAPSHOT_PATH=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+        for i in range(25):
+            Movie.objects.create(title=f'Movie {i}', genre='Drama' if i % 2 else 'Comedy', release_year=2000 + i)
+
+    def live(self, url):
+        from django.test import override_settings
+
+        with override_settings(CATALOG_SNAPSHOT_PATH=''):
+            return self.client.get(url)
+
+    def test_snapshot_matches_live_response(self):
+        """Test that anonymous pages served from the snapshot are identical to the live list"""
+        from movies import snapshot
+
+        snapshot.build(pages=2, genres=1)
+        for url in ['/api/movies/', '/api/movies/?page=2', '/api/movies/?genre=Comedy']:
+            response = self.client.get(url)
+            self.assertIn('X-Catalog-Snapshot', response)
+            self.assertEqual(response.content, self.live(url).content)
+
+    def test_requests_outside_snapshot_use_live_path(self):
+        """Test that other pages, genres, parameters and authenticated users are not served from the snapshot"""
+        from movies import snapshot
+
+        snapshot.build(pages=2, genres=1)
+        user = User.objects.create_user(username='viewer', email='viewer@example.com', password='testpass123')
+        for url in ['/api/movies/?page=3', '/api/movies/?genre=Drama', '/api/movies/?search=Movie']:
+            self.assertNotIn('X-Catalog-Snapshot', self.client.get(url))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.assertNotIn('X-Catalog-Snapshot', self.client.get('/api/movies/'))
+
+    def test_rebuild_picks_up_changes(self):
+        """Test that a rebuild after a write serves the new data and is scheduled on commit"""
+        from movies import snapshot
+
+        snapshot.build(pages=1, genres=0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Movie.objects.create(title='Brand New', genre='Drama')
+        self.assertIn(snapshot.mark_stale, callbacks)
+
+        snapshot.build(pages=1, genres=0)
+        response = self.client.get('/api/movies/')
+        self.assertIn('X-Catalog-Snapshot', response)
+        body = json.loads(response.content)
+        self.assertEqual(body['count'], 26)
+        self.assertEqual(body['results'][0]['title'], 'Brand New')
+
+
+class AutocompleteTestCase(APITestCase):
+    def setUp(self):
+        from movies import autocomplete
+
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.url = reverse('movie-autocomplete')
+        self.knight = Movie.objects.create(title='The Dark Knight', release_year=2008, rating_count=50)
+        self.rises = Movie.objects.create(title='The Dark Knight Rises', release_year=2012, rating_count=30)
+        self.city = Movie.objects.create(title='Dark City', release_year=1998, rating_count=80)
+        Movie.objects.create(title='Spider-Man', release_year=2002, rating_count=10)
+
+    def titles(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [movie['title'] for movie in response.data['results']]
+
+    def test_matches_title_and_word_prefixes_by_popularity(self):
+        """Test that autocomplete matches title and word prefixes, most reviewed first"""
+        self.assertEqual(self.titles('dark'), ['Dark City', 'The Dark Knight', 'The Dark Knight Rises'])
+        self.assertEqual(self.titles('  KNIGHT r'), ['The Dark Knight Rises'])
+        self.assertEqual(self.titles('spider m'), ['Spider-Man'])
+        self.assertEqual(self.titles('the', limit=1), ['The Dark Knight'])
+        self.assertEqual(self.titles('zzz'), [])
+        self.assertEqual(self.titles(''), [])
+
+    def test_returns_only_id_title_and_year(self):
+        """Test that autocomplete results carry only id, title and release year"""
+        response = self.client.get(self.url, {'q': 'dark c'})
+        self.assertEqual(response.data['results'], [{'id': self.city.id, 'title': 'Dark City', 'release_year': 1998}])
+
+    def test_index_follows_movie_writes(self):
+        """Test that saved, renamed and deleted movies are reflected without reloading the index"""
+        from movies import autocomplete
+
+        self.assertEqual(self.titles('dark c'), ['Dark City'])
+        index = autocomplete.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(title='Darkest Hour', release_year=2017, rating_count=5)
+            self.city.title = 'Metropolis'
+            self.city.save()
+            self.knight.delete()
+        self.assertIs(autocomplete.get_index(), index)
+        self.assertEqual(self.titles('dark'), ['The Dark Knight Rises', 'Darkest Hour'])
+        self.assertEqual(self.titles('metro'), ['Metropolis'])
+
+
+class AutocompleteRebuildTestCase(TransactionTestCase):
+    def setUp(self):
+        from movies import autocomplete
+
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        Movie.objects.create(title='The Dark Knight', release_year=2008)
+
+    def titles(self, query):
+        from movies import autocomplete
+
+        return [title for _, title, _ in autocomplete.get_index().search(query)]
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        """Test that a stale index keeps answering while a background rebuild runs, then is swapped out"""
+        from unittest import mock
+
+        from movies import autocomplete
+
+        index = autocomplete.get_index()
+        Movie.objects.bulk_create([Movie(title='Dark City', release_year=1998)])
+        index.built_at -= autocomplete.MAX_AGE + 1
+        load = autocomplete.TitleIndex.load
+
+        def slow_load():
+            fresh = load()
+            # A write made while the rebuild runs is applied to the index that replaces the old one.
+            Movie.objects.create(title='Darkman', release_year=1990)
+            return fresh
+
+        with mock.patch.object(autocomplete.TitleIndex, 'load', slow_load):
+            self.assertIs(autocomplete.get_index(), index)
+            autocomplete.rebuild().join()
+        self.assertIsNot(autocomplete.get_index(), index)
+        self.assertEqual(sorted(self.titles('dark')), ['Dark City', 'Darkman', 'The Dark Knight'])
+
+    @override_settings(AUTOCOMPLETE_WARMUP=True)
+    def test_first_request_warms_the_index_once(self):
+        """Test that a process's first request starts the background build and later requests do not"""
+        from unittest import mock
+
+        from movies import autocomplete
+
+        with mock.patch.object(autocomplete, 'rebuild', wraps=autocomplete.rebuild) as rebuild:
+            self.client.get(reverse('api-root'))
+            self.client.get(reverse('api-root'))
+        self.assertEqual(rebuild.call_count, 1)
+        building = autocomplete._building
+        if building is not None:
+            building.join()
+        self.assertEqual(self.titles('knight'), ['The Dark Knight'])
+
+    def test_build_inherited_across_fork_is_dropped(self):
+        """Test that a build started by a parent process does not block rebuilds or queue writes in a child"""
+        import threading
+
+        from movies import autocomplete
+
+        index = autocomplete.get_index()
+        index.built_at -= autocomplete.MAX_AGE + 1
+        with autocomplete._index_lock:
+            # What a preforked worker sees: the parent's thread object, which never runs in the child.
+            autocomplete._building, autocomplete._building_pid = threading.Thread(target=None), -1
+        Movie.objects.bulk_create([Movie(title='Dark City', release_year=1998)])
+
+        autocomplete.movie_saved(Movie(pk=10 ** 6, title='Darkman', release_year=1990))
+        self.assertEqual(autocomplete._pending, [])
+        autocomplete.rebuild().join()
+        self.assertEqual(sorted(self.titles('dark')), ['Dark City', 'The Dark Knight'])
+
+
+class MovieFacetsTestCase(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.url = reverse('movie-list')
+        for title, genre, year in [
+            ('Alpha', 'Drama', 2001), ('Beta', 'Drama', 2002), ('Gamma', 'Drama', 2002),
+            ('Delta', 'Comedy', 2002), ('Epsilon', 'Comedy', None), ('Zeta', 'Horror', 2001),
+        ]:
+            Movie.objects.create(title=title, genre=genre, release_year=year)
+
+    def test_facet_counts_over_filtered_list(self):
+        """Test that facets count movies per genre and year for the current filters and search"""
+        response = self.client.get(self.url, {'facets': 'genre,release_year'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['facets']['genre'], [
+            {'value': 'Drama', 'count': 3}, {'value': 'Comedy', 'count': 2}, {'value': 'Horror', 'count': 1},
+        ])
+        self.assertEqual(response.data['facets']['release_year'], [
+            {'value': 2002, 'count': 3}, {'value': 2001, 'count': 2}, {'value': None, 'count': 1},
+        ])
+
+        response = self.client.get(self.url, {'facets': 'release_year', 'genre': 'Drama', 'search': 'a'})
+        self.assertEqual(list(response.data['facets']), ['release_year'])
+        self.assertEqual(response.data['facets']['release_year'], [
+            {'value': 2002, 'count': 2}, {'value': 2001, 'count': 1},
+        ])
+        self.assertNotIn('facets', self.client.get(self.url).data)
+
+    def test_facets_use_one_query_and_cache(self):
+        """Test that facets cost one grouped query, are cached, and are invalidated by movie writes"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        params = {'facets': 'genre,release_year', 'genre': 'Comedy'}
+        with CaptureQueriesContext(connection) as uncached:
+            self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as cached:
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(uncached) - len(cached), 1)
+        self.assertEqual(response.data['facets']['genre'], [{'value': 'Comedy', 'count': 2}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(title='Eta', genre='Comedy', release_year=2003)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.data['facets']['genre'], [{'value': 'Comedy', 'count': 3}])
+
+    def test_facet_cache_follows_generation_bumped_elsewhere(self):
+        """Test that a generation bump made by another process, seen only in the database, misses the cache"""
+        from .models import CatalogGeneration
+
+        params = {'facets': 'genre', 'genre': 'Horror'}
+        self.assertEqual(self.client.get(self.url, params).data['facets']['genre'], [{'value': 'Horror', 'count': 1}])
+        Movie.objects.bulk_create([Movie(title='Theta', genre='Horror', release_year=2004)])
+        CatalogGeneration.objects.update_or_create(pk=1, defaults={'generation': 42})
+
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.data['facets']['genre'], [{'value': 'Horror', 'count': 2}])
+
+    def test_unknown_facet_rejected(self):
+        """Test that an unknown facet name returns 400"""
+        response = self.client.get(self.url, {'facets': 'genre,title'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MovieDeletionTestCase(APITestCase):
+    def setUp(self):
+        from reviews.models import Reaction, Review
+
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(6)
+        ]
+        self.movie = Movie.objects.create(title='Doomed', genre='Drama')
+        self.other = Movie.objects.create(title='Kept', genre='Drama')
+        for movie in (self.movie, self.other):
+            for author in self.users[:3]:
+                review = Review.objects.create(user=author, movie=movie, rating=author.pk % 5 + 1, content='Fine')
+                for fan in self.users[2:]:
+                    Reaction.objects.create(user=fan, review=review, is_like=fan.pk % 2 == 0)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.users[0]).access_token}')
+
+    def user_stats(self):
+        from accounts.models import UserStats
+
+        return list(UserStats.objects.order_by('user_id').values_list(
+            'review_count', 'rating_sum', 'likes_received', 'dislikes_received', 'reactions_given'))
+
+    def test_batched_delete_matches_cascade(self):
+        """Test that batched deletion removes the same rows and leaves user stats as a full recount would"""
+        from accounts import stats
+        from reviews.models import Reaction, Review
+        from .deletion import delete_movie
+
+        deleted = delete_movie(self.movie.pk, batch_size=4)
+
+        self.assertEqual(deleted, {'reactions': 12, 'reviews': 3})
+        self.assertFalse(Movie.all_objects.filter(pk=self.movie.pk).exists())
+        self.assertEqual(Review.objects.count(), 3)
+        self.assertEqual(Reaction.objects.count(), 12)
+        remaining = self.user_stats()
+        stats.refresh()
+        self.assertEqual(remaining, self.user_stats())
+
+    def test_destroy_hides_popular_movie_and_queues_deletion(self):
+        """Test that deleting a movie with many reviews hides it at once and leaves the rows to a worker"""
+        from unittest import mock
+        from django.test import override_settings
+        from reviews.models import Review
+        from tasks import queue
+        from tasks.models import Task
+
+        url = reverse('movie-detail', kwargs={'pk': self.movie.pk})
+        with override_settings(TASKS_EAGER=False), mock.patch('movies.deletion.ASYNC_MIN_REVIEWS', 2):
+            response = self.client.delete(url)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual([movie['title'] for movie in self.client.get('/api/movies/').data['results']], ['Kept'])
+            self.assertEqual(Review.objects.filter(movie_id=self.movie.pk).count(), 3)
+
+            self.assertTrue(queue.run(queue.claim()))
+        self.assertFalse(Movie.all_objects.filter(pk=self.movie.pk).exists())
+        self.assertFalse(Review.objects.filter(movie_id=self.movie.pk).exists())
+        self.assertFalse(Task.objects.exists())
+
+
+class MovieBatchTestCase(APITestCase):
+    def setUp(self):
+        from reviews.models import Review
+
+        self.url = reverse('movie-batch')
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(2)
+        ]
+        self.movies = [Movie.objects.create(title=f'Movie {i}') for i in range(3)]
+        for user, rating in zip(self.users, (4, 1)):
+            Review.objects.create(user=user, movie=self.movies[1], rating=rating, content='Seen it.')
+
+    def test_batch_keeps_request_order_and_reports_missing(self):
+        """Test that batch returns movies in the order asked for, with the same aggregates as the detail view"""
+        first, second, third = self.movies
+        ids = f'{second.id},999,{first.id},{second.id}'
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'ids': ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie['id'] for movie in response.data['results']], [second.id, first.id])
+        self.assertEqual(response.data['missing'], [999])
+        for movie in response.data['results']:
+            detail = self.client.get(reverse('movie-detail', args=[movie['id']])).data
+            self.assertEqual(movie, detail)
+        self.assertEqual(response.data['results'][0]['average_rating'], 2.5)
+        self.assertIsNone(response.data['results'][1]['average_rating'])
+
+    def test_batch_rejects_bad_id_lists(self):
+        """Test that batch needs integer ids and refuses more than BATCH_FETCH_LIMIT"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,two'}).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(BATCH_FETCH_LIMIT=2):
+            response = self.client.get(self.url, {'ids': '1,2,3'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.client.get(self.url, {'ids': '1,2,2,1'}).status_code, status.HTTP_200_OK)
+
+
+class MoviePageTestCase(APITestCase):
+    def setUp(self):
+        from reviews.models import Reaction
+
+        self.movie = Movie.objects.create(title='Heat', genre='Crime')
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(14)
+        ]
+        self.viewer = self.users[0]
+        self.reviews = self.add_reviews(self.users[1:4])
+        Reaction.objects.create(user=self.viewer, review=self.reviews[0], is_like=True)
+        Reaction.objects.create(user=self.users[5], review=self.reviews[0], is_like=False)
+        self.client.force_authenticate(self.viewer)
+        self.url = reverse('movie-page', args=[self.movie.id])
+
+    def add_reviews(self, authors):
+        from reviews.models import Review
+
+        return [Review.objects.create(user=author, movie=self.movie, rating=author.pk % 5 + 1, content='Tense.')
+                for author in authors]
+
+    def test_page_assembles_movie_distribution_and_reviews(self):
+        """Test that the page carries the movie detail, the rating histogram and its first reviews with reactions"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['movie'], self.client.get(reverse('movie-detail', args=[self.movie.id])).data)
+        distribution = {rating: 0 for rating in range(1, 6)}
+        for review in self.reviews:
+            distribution[review.rating] += 1
+        self.assertEqual(response.data['rating_distribution'], distribution)
+
+        reviews = response.data['reviews']
+        self.assertEqual((reviews['count'], reviews['next']), (3, None))
+        listed = self.client.get(reverse('review-list'), {'movie': self.movie.id}).data['results']
+        self.assertEqual(reviews['results'], listed)
+        first = next(review for review in reviews['results'] if review['id'] == self.reviews[0].id)
+        self.assertEqual((first['likes_count'], first['dislikes_count'], first['user_reaction']), (1, 1, 'like'))
+
+    def test_query_count_does_not_grow_with_reviews(self):
+        """Test that a full page of reviews takes as many queries as a short one"""
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        self.add_reviews(self.users[4:])
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['reviews']['results']), 10)
+        self.assertEqual(response.data['reviews']['count'], 13)
+        self.assertIn(f'movie={self.movie.id}&page=2', response.data['reviews']['next'])
+
+    def test_hidden_movie_has_no_page(self):
+        """Test that a movie awaiting deletion has no page"""
+        Movie.objects.filter(pk=self.movie.pk).update(hidden=True)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
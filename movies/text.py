@@ -0,0 +1,9 @@
+import re
+import unicodedata
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_title(title):
+    """NFKC-normalised, casefolded title with runs of whitespace collapsed."""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", title)).strip().casefold()
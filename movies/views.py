@@ -1,26 +1,165 @@
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count
-from .models import Movie
+from django.db.models import F
+from django.http import Http404
+from django.urls import reverse
+from rest_framework.settings import api_settings
+from core import batch as batch_fetch
+from reviews import history
+from reviews.models import Review
+from reviews.serializers import ReviewSerializer
+from . import autocomplete, deletion, facets, snapshot
+from .models import Movie, MovieSimilarity
+from .ratings import average_rating, rating_distribution, stored_aggregates
 from .serializers import MovieSerializer
 
 class MovieViewSet(viewsets.ModelViewSet):
-    queryset = Movie.objects.annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews')
-    )
+    queryset = Movie.objects.annotate(**stored_aggregates())
     serializer_class = MovieSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_scope = None  # set per action; `list` falls back to the "list" scope
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["genre", "release_year"]
     search_fields = ["title", "genre"]
-    ordering_fields = ["release_year", "created_at", "title", "average_rating", "review_count"]
+    ordering_fields = ["release_year", "created_at", "title", "average_rating", "review_count", "weighted_rating"]
 
     def get_queryset(self):
-        return Movie.objects.annotate(
-            average_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
+        # Aggregates come from the stored counters (movies.ratings), not a join over every review.
+        return Movie.objects.annotate(**stored_aggregates()).order_by("-created_at")
+
+    def list(self, request, *args, **kwargs):
+        # Anonymous browsing of the default order is served from the prebuilt snapshot.
+        response = snapshot.serve(request)
+        if response is not None:
+            return response
+        try:
+            fields = facets.requested(request)
+        except facets.FacetError as exc:
+            return Response({"facets": [str(exc)]}, status=400)
+        response = super().list(request, *args, **kwargs)
+        if fields:
+            # Count over the plain filtered movies, without the per-row review annotations.
+            queryset = Movie.objects.all()
+            for backend in (DjangoFilterBackend, SearchFilter):
+                queryset = backend().filter_queryset(request, queryset, self)
+            response.data["facets"] = facets.counts(request, queryset, fields)
+        return response
+
+    def perform_destroy(self, instance):
+        # Django's cascade would load every review and reaction; see movies.deletion.
+        deletion.destroy(instance)
+
+    @action(detail=False, methods=["get"], url_path="top-rated", throttle_scope="list")
+    def top_rated(self, request):
+        """
+        GET /api/movies/top-rated/?genre=Drama&release_year=2010 - Movies ranked by
+        their stored Bayesian weighted rating, so a single 5-star review does not
+        outrank a film with hundreds of good ones.
+        """
+        qs = Movie.objects.filter(rating_count__gt=0).annotate(
+            average_rating=average_rating(),
+            review_count=F("rating_count"),
+        ).order_by("-weighted_rating", "-rating_count")
+        qs = DjangoFilterBackend().filter_queryset(request, qs, self)
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(qs, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["get"], throttle_scope="list")
+    def batch(self, request):
+        """
+        GET /api/movies/batch/?ids=3,1,2 - Several movies in one query, in the order
+        asked for, with the ids that do not exist listed under `missing`.
+        """
+        ids = batch_fetch.requested_ids(request)
+        movies = Movie.objects.annotate(**stored_aggregates()).in_bulk(ids)
+        return batch_fetch.ordered_response(ids, movies, lambda found: self.get_serializer(found, many=True).data)
+
+    @action(detail=False, methods=["get"], throttle_scope="autocomplete")
+    def autocomplete(self, request):
+        """
+        GET /api/movies/autocomplete/?q=dark+kn&limit=10 - The most reviewed movies
+        whose title, or a word in it, starts with `q`, from the in-process index.
+        """
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=400)
+        query = request.query_params.get("q", "")
+        matches = autocomplete.get_index().search(query, max(limit, 0))
+        results = [{"id": movie_id, "title": title, "release_year": year} for movie_id, title, year in matches]
+        return Response({"query": query, "results": results})
+
+    @action(detail=True, methods=["get"])
+    def page(self, request, pk=None):
+        """
+        GET /api/movies/{id}/page/ - Everything the movie screen shows: the movie with
+        its aggregates, how many reviews gave each rating, and the first page of
+        `/api/reviews/?movie={id}` with reaction counts and the caller's reactions.
+        Takes the same few queries however many reviews are on the page.
+        """
+        movie = self.get_object()
+        page_size = api_settings.PAGE_SIZE
+        reviews = history.attach_reactions(
+            Review.objects.filter(movie=movie).select_related("user", "movie").order_by("-created_at")[:page_size],
+            request.user,
         )
+        next_page = None
+        if movie.review_count > page_size:
+            next_page = request.build_absolute_uri(f"{reverse('review-list')}?movie={movie.pk}&page=2")
+        return Response({
+            "movie": self.get_serializer(movie).data,
+            "rating_distribution": rating_distribution(movie.pk),
+            "reviews": {
+                "count": movie.review_count,
+                "next": next_page,
+                "results": ReviewSerializer(reviews, many=True, context=self.get_serializer_context()).data,
+            },
+        })
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """
+        GET /api/movies/{id}/similar/?limit=10 - Movies most often co-rated alike,
+        served from the lists precomputed by `manage.py build_similar_movies`.
+        """
+        from .similarity import unpack_neighbors  # NumPy is only loaded once this is used
+
+        try:
+            movie_id = int(pk)
+        except ValueError:
+            raise Http404
+        # Only visible movies: a hidden one is being deleted (movies.deletion).
+        entry = MovieSimilarity.objects.filter(movie_id=movie_id, movie__hidden=False).only("neighbors").first()
+        if entry is None:
+            if not Movie.objects.filter(pk=movie_id).exists():
+                raise Http404
+            return Response({"movie_id": movie_id, "results": []})
+
+        neighbors = unpack_neighbors(entry.neighbors)
+        try:
+            limit = max(int(request.query_params.get("limit", len(neighbors))), 0)
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=400)
+
+        movies = Movie.objects.only("id", "title", "release_year", "genre").in_bulk(neighbors["id"].tolist())
+        results = [
+            {
+                "id": movie.id,
+                "title": movie.title,
+                "release_year": movie.release_year,
+                "genre": movie.genre,
+                "similarity": round(float(score), 4),
+            }
+            for neighbor_id, score in neighbors.tolist()
+            if (movie := movies.get(neighbor_id)) is not None
+        ]
+        return Response({"movie_id": movie_id, "results": results[:limit]})
 
 # Create your views here.
@@ -1,15 +1,20 @@
+from django.conf import settings
 from django.contrib import admin
 from .models import Review, Reaction
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ("id", "movie", "user", "rating", "created_at")
+    list_display = ("id", "movie", "user", "rating", "likes_count", "dislikes_count", "created_at")
     search_fields = ("movie__title", "user__username")
+    readonly_fields = ("likes_count", "dislikes_count")
 
-@admin.register(Reaction)
 class ReactionAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "review", "is_like", "created_at")
     search_fields = ("user__username", "review__movie__title")
     list_filter = ("is_like", "created_at")
 
+# The changelist joins reactions to reviews and users, which sharded reactions cannot do (see reviews.shards).
+if not settings.REACTION_SHARDS:
+    admin.site.register(Reaction, ReactionAdmin)
+
 # Register your models here.
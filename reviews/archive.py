@@ -0,0 +1,322 @@
+"""
+Cold storage for old reactions.
+
+Months-old reactions are hardly ever read one by one, yet each is a row in
+``reviews_reaction`` plus four index entries. ``archive`` moves the reactions
+older than ``settings.REACTION_ARCHIVE_DAYS`` into two packed structures on
+the same shard (``reviews.shards``): a ``ReviewReactionArchive`` row per
+review, with its like/dislike counts and the sorted ids of the users behind
+them at eight bytes each, and a ``UserReactionArchive`` row per user, with the
+reviews they liked and disliked. A user's reaction to a review is either a
+``Reaction`` row or archived, never both; reviews' stored counts
+(``reviews.counters``) and user stats include archived reactions.
+
+Reads that need individual reactions combine both: ``viewer_reactions`` for
+the viewer's reaction on a page of reviews, ``reactions_on`` for who reacted
+to a review. Like/dislike first ``restore`` an archived reaction as a row, so
+toggling works as before. Archived reactions keep no timestamp of their own
+and are not listed in reaction history.
+
+Every rewrite runs in one transaction on its shard that writes before it
+reads, so SQLite holds the write lock while the packed rows are merged.
+"""
+import bisect
+import sys
+from array import array
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import shards
+from .models import Reaction, ReviewReactionArchive, UserReactionArchive
+
+BATCH_SIZE = 5000
+# Ids are packed as little-endian unsigned 64-bit ints on every platform, wide enough for any
+# BigAutoField id; DTYPE is the same layout for NumPy readers.
+TYPECODE = "Q"
+DTYPE = "<u8"
+ITEM_SIZE = 8
+_SWAP = sys.byteorder == "big"
+
+
+def pack(ids):
+    ids = array(TYPECODE, sorted(ids))
+    if _SWAP:
+        ids.byteswap()
+    return ids.tobytes()
+
+
+def unpack(blob):
+    ids = array(TYPECODE)
+    ids.frombytes(blob)
+    if _SWAP:
+        ids.byteswap()
+    return ids
+
+
+def _contains(ids, value):
+    position = bisect.bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+def _user_row(alias, user_id):
+    return next(iter(UserReactionArchive.objects.using(alias).filter(user_id=user_id)[:1]), None)
+
+
+def _review_row(alias, review_id):
+    return next(iter(ReviewReactionArchive.objects.using(alias).filter(review_id=review_id)[:1]), None)
+
+
+def viewer_reactions(user_id, review_ids):
+    """``{review_id: is_like}`` for the archived reactions of ``user_id`` on ``review_ids``; one query per shard."""
+    found = {}
+    for alias, ids in shards.group(review_ids):
+        row = _user_row(alias, user_id)
+        if row is None:
+            continue
+        liked, disliked = unpack(row.liked), unpack(row.disliked)
+        for review_id in ids:
+            if _contains(liked, review_id):
+                found[review_id] = True
+            elif _contains(disliked, review_id):
+                found[review_id] = False
+    return found
+
+
+def reactions_on(review_id):
+    """``(likers, dislikers)``: the ids of the users whose reactions on ``review_id`` are archived."""
+    row = _review_row(shards.alias_for(review_id), review_id)
+    if row is None:
+        return [], []
+    return list(unpack(row.likers)), list(unpack(row.dislikers))
+
+
+def archived(review_ids=None, user_id=None):
+    """``{alias: [(user_id, review_id, is_like), ...]}``: the archived reactions on ``review_ids`` or by ``user_id``."""
+    found = defaultdict(list)
+    if user_id is not None:
+        for alias in shards.aliases():
+            if (row := _user_row(alias, user_id)) is not None:
+                found[alias] += [(user_id, review_id, True) for review_id in unpack(row.liked)]
+                found[alias] += [(user_id, review_id, False) for review_id in unpack(row.disliked)]
+        return found
+    for alias, ids in shards.group(review_ids):
+        for row in ReviewReactionArchive.objects.using(alias).filter(review_id__in=ids):
+            found[alias] += [(user_id, row.review_id, True) for user_id in unpack(row.likers)]
+            found[alias] += [(user_id, row.review_id, False) for user_id in unpack(row.dislikers)]
+    return found
+
+
+def counts(review_ids=None):
+    """``{review_id: (likes, dislikes)}`` archived on ``review_ids`` (default: every review)."""
+    if review_ids is None:
+        querysets = shards.scatter(ReviewReactionArchive.objects.all())
+    else:
+        querysets = [ReviewReactionArchive.objects.using(alias).filter(review_id__in=ids)
+                     for alias, ids in shards.group(review_ids)]
+    found = {}
+    for queryset in querysets:
+        rows = queryset.order_by().values_list("review_id", "likes", "dislikes").iterator()
+        found.update((review_id, (likes, dislikes)) for review_id, likes, dislikes in rows)
+    return found
+
+
+def given(user_ids=None):
+    """``Counter`` of archived reactions per user in ``user_ids`` (default: every user), over every shard."""
+    rows = UserReactionArchive.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=list(user_ids))
+    found = Counter()
+    for queryset in shards.scatter(rows):
+        for user_id, liked, disliked in queryset.order_by().values_list("user_id", "liked", "disliked").iterator():
+            found[user_id] += (len(liked) + len(disliked)) // ITEM_SIZE
+    return found
+
+
+def archive(before=None, batch_size=BATCH_SIZE):
+    """
+    Move the reactions created before ``before`` (default:
+    ``REACTION_ARCHIVE_DAYS`` ago) into the archive; returns how many moved.
+    """
+    before = before or timezone.now() - timedelta(days=settings.REACTION_ARCHIVE_DAYS)
+    moved = 0
+    for alias in shards.aliases():
+        old = Reaction.objects.using(alias).filter(created_at__lt=before).order_by("pk")
+        last = 0
+        while batch := list(old.filter(pk__gt=last).values_list("pk", "user_id", "review_id", "is_like",
+                                                                 "created_at")[:batch_size]):
+            last = batch[-1][0]
+            moved += _archive_batch(alias, batch)
+    return moved
+
+
+def _archive_batch(alias, rows):
+    likes = [pk for pk, _, _, is_like, _ in rows if is_like]
+    dislikes = [pk for pk, _, _, is_like, _ in rows if not is_like]
+    newest = {}
+    for _, _, review_id, _, created_at in rows:
+        newest[review_id] = max(created_at, newest.get(review_id, created_at))
+    with transaction.atomic(using=alias):
+        hot = Reaction.objects.using(alias).filter(Q(pk__in=likes, is_like=True) | Q(pk__in=dislikes, is_like=False))
+        if hot._raw_delete(alias) != len(rows):
+            # Some were withdrawn or toggled since the batch was read; a later run archives the rest.
+            transaction.set_rollback(True, using=alias)
+            return 0
+        _edit(alias, [row[1:4] for row in rows], add=True, newest=newest)
+    return len(rows)
+
+
+def restore(review_id, user_id):
+    """
+    Turn the archived reaction of ``user_id`` on ``review_id`` back into a
+    ``Reaction`` row, without signals since it was counted all along; returns
+    whether there was one.
+    """
+    if not viewer_reactions(user_id, [review_id]):
+        return False
+    alias = shards.alias_for(review_id)
+    with transaction.atomic(using=alias):
+        _lock(alias)
+        review = _review_row(alias, review_id)
+        restored = _present(alias, [(user_id, review_id, True), (user_id, review_id, False)])
+        if not restored:
+            return False
+        _edit(alias, restored, add=False)
+        created_at = review.archived_until if review is not None else timezone.now()
+        shards.insert(alias, [Reaction(user_id=user_id, review_id=review_id, is_like=restored[0][2],
+                                       created_at=created_at)])
+    return True
+
+
+def remove(alias, reactions):
+    """
+    Delete the archived ``(user_id, review_id, is_like)`` reactions from
+    ``alias``; returns the ones that were still there. Callers settle the counters.
+    """
+    with transaction.atomic(using=alias):
+        _lock(alias)
+        present = _present(alias, reactions)
+        _edit(alias, present, add=False)
+    return present
+
+
+def reshard(source, batch_size=BATCH_SIZE):
+    """
+    Move the per-review rows in ``source`` that the current layout puts on
+    another shard, merging them into any row there; returns how many moved.
+    Per-user rows are stale until ``rebuild_user_rows`` runs on every shard.
+    """
+    moved = 0
+    last = 0
+    while batch := list(ReviewReactionArchive.objects.using(source).filter(pk__gt=last).order_by("pk")[:batch_size]):
+        last = batch[-1].pk
+        outgoing = defaultdict(list)
+        for row in batch:
+            if (target := shards.alias_for(row.review_id)) != source:
+                outgoing[target].append(row)
+        for target, rows in outgoing.items():
+            reactions = [(user_id, row.review_id, True) for row in rows for user_id in unpack(row.likers)]
+            reactions += [(user_id, row.review_id, False) for row in rows for user_id in unpack(row.dislikers)]
+            with transaction.atomic(using=target):
+                _lock(target)
+                _edit(target, reactions, add=True, newest={row.review_id: row.archived_until for row in rows},
+                      users=False)
+            ReviewReactionArchive.objects.using(source).filter(pk__in=[row.pk for row in rows])._raw_delete(source)
+            moved += len(rows)
+    return moved
+
+
+def rebuild_user_rows(alias):
+    """Recreate the per-user rows on ``alias`` from its per-review rows; returns how many there are."""
+    users = defaultdict(lambda: (set(), set()))
+    rows = ReviewReactionArchive.objects.using(alias).values_list("review_id", "likers", "dislikers")
+    for review_id, likers, dislikers in rows.iterator():
+        for user_id in unpack(likers):
+            users[user_id][0].add(review_id)
+        for user_id in unpack(dislikers):
+            users[user_id][1].add(review_id)
+    with transaction.atomic(using=alias):
+        UserReactionArchive.objects.using(alias).all()._raw_delete(alias)
+        UserReactionArchive.objects.using(alias).bulk_create(
+            [UserReactionArchive(user_id=user_id, liked=pack(liked), disliked=pack(disliked))
+             for user_id, (liked, disliked) in users.items()],
+            batch_size=BATCH_SIZE,
+        )
+    return len(users)
+
+
+def _lock(alias):
+    # A write that matches nothing: the transaction now holds SQLite's write lock, so the rows read
+    # next cannot change before they are rewritten.
+    UserReactionArchive.objects.using(alias).filter(pk=0).update(user_id=F("user_id"))
+
+
+def _present(alias, reactions):
+    """The ``(user_id, review_id, is_like)`` reactions that are archived on ``alias``."""
+    rows = UserReactionArchive.objects.using(alias).filter(user_id__in={user_id for user_id, _, _ in reactions})
+    packed = {row.user_id: (unpack(row.liked), unpack(row.disliked)) for row in rows}
+    return [(user_id, review_id, is_like) for user_id, review_id, is_like in reactions
+            if user_id in packed and _contains(packed[user_id][0 if is_like else 1], review_id)]
+
+
+def _edit(alias, reactions, add, newest=None, users=True):
+    """Add or remove ``(user_id, review_id, is_like)`` reactions on both sides of the archive on ``alias``."""
+    by_review = defaultdict(lambda: (set(), set()))
+    by_user = defaultdict(lambda: (set(), set()))
+    for user_id, review_id, is_like in reactions:
+        by_review[review_id][0 if is_like else 1].add(user_id)
+        by_user[user_id][0 if is_like else 1].add(review_id)
+    rows = _rewrite(alias, ReviewReactionArchive, "review_id", ("likers", "dislikers"), by_review, add)
+    for row in rows:
+        row.likes, row.dislikes = len(row.likers) // ITEM_SIZE, len(row.dislikers) // ITEM_SIZE
+        if newest and (row.archived_until is None or newest[row.review_id] > row.archived_until):
+            row.archived_until = newest[row.review_id]
+    _save(alias, ReviewReactionArchive, rows, ("likers", "dislikers"), ("likes", "dislikes", "archived_until"))
+    if users:
+        rows = _rewrite(alias, UserReactionArchive, "user_id", ("liked", "disliked"), by_user, add)
+        _save(alias, UserReactionArchive, rows, ("liked", "disliked"))
+
+
+def _rewrite(alias, model, key, fields, changes, add):
+    """The ``model`` rows for the keys of ``changes`` (new ones unsaved), with ids added to or removed from ``fields``."""
+    rows = {getattr(row, key): row for row in model.objects.using(alias).filter(**{f"{key}__in": list(changes)})}
+    for pk, values in changes.items():
+        row = rows.setdefault(pk, model(**{key: pk}))
+        for field, ids in zip(fields, values):
+            current = set(unpack(getattr(row, field)))
+            setattr(row, field, pack(current | ids if add else current - ids))
+    return list(rows.values())
+
+
+def _save(alias, model, rows, packed, fields=()):
+    """Write ``rows`` back: new ones are inserted, changed ones updated and those left empty deleted."""
+    created, changed, emptied = [], [], []
+    for row in rows:
+        if not any(getattr(row, field) for field in packed):
+            if row.pk:
+                emptied.append(row.pk)
+        else:
+            (changed if row.pk else created).append(row)
+    queryset = model.objects.using(alias)
+    if emptied:
+        queryset.filter(pk__in=emptied)._raw_delete(alias)
+    if changed:
+        # One UPDATE per row through executemany; bulk_update's CASE expressions cost far more to build.
+        connection = connections[alias]
+        quote = connection.ops.quote_name
+        columns = [model._meta.get_field(name) for name in (*packed, *fields)]
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            quote(model._meta.db_table),
+            ", ".join(f"{quote(field.column)} = %s" for field in columns),
+            quote(model._meta.pk.column),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                [*(field.get_db_prep_save(getattr(row, field.attname), connection) for field in columns), row.pk]
+                for row in changed
+            ])
+    queryset.bulk_create(created, batch_size=BATCH_SIZE)
@@ -0,0 +1,96 @@
+"""
+Batched review creation for partner feeds.
+
+A batch is validated in process, then checked against the database with one
+query for unknown movies and one for reviews the user already has
+(``unique_review_per_user_movie``). The valid rows go in with a single
+``bulk_create`` inside one transaction, together with the aggregate updates
+that the per-row signals would otherwise make: one UPDATE for all affected
+movies and one for the author's stats.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from accounts import stats
+from movies import snapshot
+from movies.models import Movie, MovieSimilarity
+from movies.ratings import apply_rating_changes
+from .models import Review
+from .serializers import BulkReviewItemSerializer
+
+MAX_BATCH = 500
+
+
+def create_reviews(user, items, attempts=3):
+    """
+    Create reviews for ``user`` from a list of ``{"movie", "rating", "content"}``
+    dicts and return one result per item, in input order.
+    """
+    results = [None] * len(items)
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = BulkReviewItemSerializer(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            results[index] = _error(index, serializer.errors)
+
+    known = set(Movie.objects.filter(pk__in={data["movie"] for data in valid.values()}).values_list("pk", flat=True))
+    for index, data in list(valid.items()):
+        if data["movie"] not in known:
+            results[index] = _error(index, {"movie": ["Movie does not exist."]})
+            del valid[index]
+
+    for attempt in range(attempts):
+        pending = _drop_duplicates(user, valid, results)
+        try:
+            with transaction.atomic():
+                created = Review.objects.bulk_create(
+                    [Review(user=user, movie_id=data["movie"], rating=data["rating"], content=data["content"])
+                     for data in pending.values()]
+                )
+                _update_aggregates(user, created)
+            break
+        except IntegrityError:
+            # A concurrent request reviewed one of these movies; re-check and retry.
+            if attempt == attempts - 1:
+                raise
+    for index, review in zip(pending, created):
+        results[index] = {"index": index, "status": "created", "id": review.pk}
+    return results
+
+
+def _drop_duplicates(user, valid, results):
+    existing = set(
+        Review.objects.filter(user=user, movie_id__in={data["movie"] for data in valid.values()})
+        .values_list("movie_id", flat=True)
+    )
+    pending = {}
+    for index, data in valid.items():
+        if data["movie"] in existing:
+            results[index] = _error(index, {"movie": ["You have already reviewed this movie."]})
+        else:
+            existing.add(data["movie"])
+            pending[index] = data
+    return pending
+
+
+def _update_aggregates(user, created):
+    from . import fulltext
+
+    if not created:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    for review in created:
+        deltas[review.movie_id][0] += 1
+        deltas[review.movie_id][1] += review.rating
+    apply_rating_changes(deltas)
+    stats.adjust(user.pk, review_count=len(created), rating_sum=sum(review.rating for review in created))
+    MovieSimilarity.objects.filter(movie_id__in=list(deltas), stale=False).update(stale=True)
+    transaction.on_commit(snapshot.mark_stale)
+    transaction.on_commit(lambda: fulltext.record(reviews=created))
+
+
+def _error(index, errors):
+    return {"index": index, "status": "error", "errors": errors}
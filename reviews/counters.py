@@ -0,0 +1,73 @@
+"""
+Stored like/dislike counts on reviews.
+
+Reaction signals call ``adjust`` with deltas, each a single UPDATE, and
+set-based deletes apply their combined deltas with ``adjust_many``. Review
+lists and orderings read the columns instead of grouping the reaction table,
+which may live in other databases (``reviews.shards``). ``refresh``
+recounts from the reactions on every shard, archived ones included
+(``reviews.archive``), and is the safety net for writes that bypass signals
+(``bulk_create``, ``QuerySet.update``).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from . import archive, shards
+from .models import Reaction, Review
+
+CHUNK_SIZE = 5000
+
+
+def adjust(review_id, likes=0, dislikes=0):
+    Review.objects.filter(pk=review_id).update(
+        likes_count=F("likes_count") + likes, dislikes_count=F("dislikes_count") + dislikes
+    )
+
+
+def _update_groups(groups, values, chunk_size):
+    for key, review_ids in groups.items():
+        for start in range(0, len(review_ids), chunk_size):
+            Review.objects.filter(pk__in=review_ids[start:start + chunk_size]).update(**values(*key))
+
+
+def adjust_many(deltas, chunk_size=CHUNK_SIZE):
+    """Apply ``{review_id: (likes, dislikes)}`` with one UPDATE per distinct pair of deltas."""
+    groups = defaultdict(list)
+    for review_id, delta in deltas.items():
+        if any(delta):
+            groups[tuple(delta)].append(review_id)
+    _update_groups(groups, lambda likes, dislikes: {
+        "likes_count": F("likes_count") + likes, "dislikes_count": F("dislikes_count") + dislikes,
+    }, chunk_size)
+
+
+def refresh(review_ids=None, chunk_size=CHUNK_SIZE):
+    """Recount ``review_ids`` (default: every review) from the reactions; returns how many changed."""
+    if review_ids is None:
+        reviews = [Review.objects.all()]
+        reactions = shards.scatter(Reaction.objects.all())
+    else:
+        review_ids = list(review_ids)
+        reviews = [Review.objects.filter(pk__in=review_ids[start:start + chunk_size])
+                   for start in range(0, len(review_ids), chunk_size)]
+        reactions = shards.for_reviews(review_ids, chunk_size)
+    totals = {}
+    for queryset in reactions:
+        rows = queryset.order_by().values("review_id").annotate(
+            likes=Count("id", filter=Q(is_like=True)), dislikes=Count("id", filter=Q(is_like=False)),
+        )
+        totals.update((row["review_id"], (row["likes"], row["dislikes"])) for row in rows.iterator())
+    for review_id, (likes, dislikes) in archive.counts(review_ids).items():
+        hot = totals.get(review_id, (0, 0))
+        totals[review_id] = (hot[0] + likes, hot[1] + dislikes)
+    groups = defaultdict(list)
+    for queryset in reviews:
+        for pk, likes, dislikes in queryset.order_by().values_list("pk", "likes_count", "dislikes_count").iterator():
+            counts = totals.get(pk, (0, 0))
+            if counts != (likes, dislikes):
+                groups[counts].append(pk)
+    with transaction.atomic():
+        _update_groups(groups, lambda likes, dislikes: {"likes_count": likes, "dislikes_count": dislikes}, chunk_size)
+    return sum(len(review_ids) for review_ids in groups.values())
@@ -0,0 +1,160 @@
+"""
+Batched, set-based deletion of reviews and reactions.
+
+Deleting a movie or an account through Django's collector loads every
+dependent review and reaction and deletes them row by row (so their signals
+fire), all in one transaction that holds SQLite's write lock until it
+finishes. ``delete_reactions`` and ``delete_reviews`` instead issue
+``DELETE ... WHERE id IN (...)`` statements of at most ``BATCH_SIZE`` rows,
+each batch in its own short transaction, and apply what the skipped signals
+would have done once per batch: counter deltas are summed in Python and
+applied with one UPDATE per distinct delta, and the catalog snapshot, review
+search index and recommendation caches are told about removed reviews.
+
+After each batch they idle for ``pause`` times as long as the batch held the
+write lock: SQLite hands the lock to whichever connection polls first, so
+without a gap, writers waiting on it could starve.
+
+Reactions may live on other databases than reviews (``reviews.shards``):
+each reaction batch is deleted in a transaction on its own shard, and the
+reactions on a batch of reviews are deleted shard by shard before the
+reviews themselves. ``delete_archived`` does the same for reactions moved
+into the archive (``reviews.archive``).
+"""
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from accounts import stats
+from movies import snapshot
+from movies.models import MovieSimilarity
+from movies.ratings import apply_rating_changes
+from . import archive, counters, shards
+from .models import Reaction, ReactionBucket, Review
+
+BATCH_SIZE = 5000
+PAUSE = 1.0
+REACTION_FIELDS = ("user_id", "review_id", "is_like")
+REVIEW_FIELDS = ("user_id", "movie_id", "rating")
+
+
+def delete_reactions(reactions, batch_size=BATCH_SIZE, pause=PAUSE, progress=None):
+    """
+    Delete the ``reactions`` queryset (on one shard); returns how many were
+    deleted. ``progress`` is called with each batch's count.
+    """
+    deleted = 0
+    # Batches are read before their transaction: on SQLite, a transaction that reads first and then
+    # writes fails with "database is locked" if another connection started writing in between.
+    while batch := _next_batch(reactions, batch_size, REACTION_FIELDS):
+        with _write_batch(pause, reactions.db):
+            count = _delete_reactions(batch, reactions.db)
+        if progress:
+            progress(reactions=count)
+        deleted += count
+    return deleted
+
+
+def delete_archived(review_ids=None, user_id=None, batch_size=BATCH_SIZE, pause=PAUSE, progress=None):
+    """
+    Delete the archived reactions on ``review_ids`` or by ``user_id``; returns
+    how many were deleted. ``progress`` is called with each batch's count.
+    """
+    deleted = 0
+    for alias, reactions in archive.archived(review_ids, user_id).items():
+        for start in range(0, len(reactions), batch_size):
+            with _write_batch(pause, alias):
+                removed = archive.remove(alias, reactions[start:start + batch_size])
+                _settle(removed)
+            if progress:
+                progress(reactions=len(removed))
+            deleted += len(removed)
+    return deleted
+
+
+def delete_reviews(reviews, batch_size=BATCH_SIZE, pause=PAUSE, progress=None):
+    """
+    Delete the ``reviews`` queryset and every reaction on those reviews; returns
+    ``(reviews, reactions)`` deleted. ``progress`` is called with keyword counts.
+    """
+    deleted = reactions = 0
+    while batch := _next_batch(reviews, batch_size, REVIEW_FIELDS):
+        review_ids = [row[0] for row in batch]
+        for queryset in shards.for_reviews(review_ids, batch_size):
+            reactions += delete_reactions(queryset, batch_size, pause, progress)
+        reactions += delete_archived(review_ids, batch_size=batch_size, pause=pause, progress=progress)
+        with _write_batch(pause):
+            count = _delete_reviews(batch)
+        if progress:
+            progress(reviews=count)
+        deleted += count
+    return deleted, reactions
+
+
+@contextmanager
+def _write_batch(pause, using=None):
+    started = time.monotonic()
+    with transaction.atomic(using=using):
+        yield
+    time.sleep((time.monotonic() - started) * pause)
+
+
+def _next_batch(queryset, batch_size, fields):
+    rows = queryset.order_by().values_list("pk", *fields)
+    return list(rows[:batch_size] if batch_size else rows)
+
+
+def _raw_delete(queryset):
+    # Deletes with a single statement, skipping the collector and the per-row signals.
+    return queryset._raw_delete(queryset.db)
+
+
+def _delete_reactions(rows, using):
+    """Delete ``(id, user_id, review_id, is_like)`` reaction rows from ``using`` and settle the counters they fed."""
+    _settle([row[1:] for row in rows])
+    return _raw_delete(Reaction.objects.using(using).filter(pk__in=[row[0] for row in rows]))
+
+
+def _settle(reactions):
+    """Take deleted ``(user_id, review_id, is_like)`` reactions off the user stats and review counts."""
+    deltas = defaultdict(Counter)
+    per_review = defaultdict(lambda: [0, 0])
+    for user_id, review_id, is_like in reactions:
+        deltas[user_id]["reactions_given"] -= 1
+        per_review[review_id][0 if is_like else 1] -= 1
+    # Review authors are looked up separately: the reactions may be on another database.
+    authors = dict(Review.objects.filter(pk__in=list(per_review)).values_list("pk", "user_id"))
+    for review_id, (likes, dislikes) in per_review.items():
+        if review_id in authors:
+            deltas[authors[review_id]]["likes_received"] += likes
+            deltas[authors[review_id]]["dislikes_received"] += dislikes
+    stats.adjust_many(deltas)
+    counters.adjust_many(per_review)
+
+
+def _delete_reviews(rows):
+    """Delete ``(id, user_id, movie_id, rating)`` review rows, whose reactions are already gone."""
+    from . import fulltext
+
+    authors = defaultdict(Counter)
+    movies = defaultdict(lambda: [0, 0])
+    for _, user_id, movie_id, rating in rows:
+        authors[user_id]["review_count"] -= 1
+        authors[user_id]["rating_sum"] -= rating
+        movies[movie_id][0] -= 1
+        movies[movie_id][1] -= rating
+    stats.adjust_many(authors)
+    apply_rating_changes(movies)
+    MovieSimilarity.objects.filter(movie_id__in=list(movies), stale=False).update(stale=True)
+    review_ids = [row[0] for row in rows]
+    _raw_delete(ReactionBucket.objects.filter(review_id__in=review_ids))
+    count = _raw_delete(Review.objects.filter(pk__in=review_ids))
+
+    def notify():
+        fulltext.record(deleted=review_ids)
+        snapshot.mark_stale()
+
+    transaction.on_commit(notify)
+    return count
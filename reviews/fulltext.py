@@ -0,0 +1,448 @@
+"""
+Full-text search over review content.
+
+Content is tokenised into NFKC-casefolded words of 2-32 characters (minus a
+short stopword list), and each term is identified by a 64-bit hash. ``build``
+streams reviews in primary-key order and writes an immutable index directory
+under ``settings.REVIEW_SEARCH_DIR``:
+
+* ``terms`` - sorted term hashes, with ``term_bytes`` / ``term_postings``
+  offsets into
+* ``postings`` - per term, the ids of the reviews using it as varint-encoded
+  gaps, and ``tfs``, the matching term frequencies (one byte each);
+* ``doc_*`` - id, length, movie and rating of every review, by id.
+
+Postings are gathered into runs that fit ``memory_bytes``, sorted and spilled
+to disk, then merged through a cursor per run, a bounded number of postings
+at a time (a term with more postings than that is copied through in chunks),
+so building over tens of millions of reviews needs a bounded amount of memory.
+Queries memory-map the files and rank with BM25.
+
+Review writes after a build are appended to a journal in the index directory.
+Before each query a process replays new journal entries, shadowing the indexed
+copy of changed or deleted reviews; document frequencies only account for
+those changes after the next ``manage.py build_review_index``.
+"""
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .models import Review
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+K1 = 1.2
+B = 0.75
+MIN_TOKEN, MAX_TOKEN = 2, 32
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i if in is it its me my not of on or our "
+    "she so than that the their them then there they this to too was we were what when which who will with "
+    "you your".split()
+)
+FILES = {
+    "terms": "<u8", "term_bytes": "<i8", "term_postings": "<i8", "postings": "u1", "tfs": "u1",
+    "doc_ids": "<i8", "doc_lengths": "<u4", "doc_movies": "<i8", "doc_ratings": "u1",
+}
+# Bytes held per posting (term hash, review id, tf) while a run is gathered.
+POSTING_BYTES = 17
+
+_WORDS = re.compile(r"\w+")
+_hashes = {}
+
+
+def index_dir():
+    return os.fspath(settings.REVIEW_SEARCH_DIR) if settings.REVIEW_SEARCH_DIR else None
+
+
+def tokenize(text):
+    words = _WORDS.findall(unicodedata.normalize("NFKC", text).casefold())
+    return [word for word in words if MIN_TOKEN <= len(word) <= MAX_TOKEN and word not in STOPWORDS]
+
+
+def term_hash(term):
+    value = _hashes.get(term)
+    if value is None:
+        if len(_hashes) >= 1_000_000:
+            _hashes.clear()
+        value = _hashes[term] = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little")
+    return value
+
+
+def analyze(text):
+    """``(length, {term_hash: tf})`` for a review's content."""
+    tokens = tokenize(text)
+    return len(tokens), {term_hash(term): n for term, n in Counter(tokens).items()}
+
+
+def encode_varints(values):
+    """Base-128 encode unsigned ints (low bits first); return the bytes and the byte count per value."""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    position = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    shifted = np.repeat(values, sizes) >> (np.uint64(7) * position.astype(np.uint64))
+    more = position < np.repeat(sizes, sizes) - 1
+    return (shifted & np.uint64(0x7F)).astype(np.uint8) | (more.astype(np.uint8) << 7), sizes
+
+
+def decode_varints(data):
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (np.uint64(7) * position.astype(np.uint64))
+    return np.add.reduceat(parts, starts)
+
+
+def _map(directory, name):
+    path = os.path.join(directory, name)
+    if not os.path.getsize(path):
+        return np.empty(0, dtype=FILES[name])
+    return np.memmap(path, dtype=FILES[name], mode="r")
+
+
+@contextlib.contextmanager
+def _locked(base):
+    with open(os.path.join(base, "lock"), "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _current_name(base):
+    try:
+        with open(os.path.join(base, "CURRENT")) as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _journal_size(base, name):
+    if name is None:
+        return 0
+    try:
+        return os.path.getsize(os.path.join(base, name, "journal"))
+    except FileNotFoundError:
+        return 0
+
+
+# Building
+
+def build(memory_bytes=256 * 2**20, chunk_size=10_000, base=None):
+    """Index every review into a new directory and make it current; returns the index metadata."""
+    base = base or index_dir()
+    os.makedirs(base, exist_ok=True)
+    previous = _current_name(base)
+    journal_start = _journal_size(base, previous)
+    name = f"index-{time.time_ns()}"
+    target = os.path.join(base, name)
+    os.makedirs(target)
+    with tempfile.TemporaryDirectory(dir=base) as tmp:
+        runs, docs, total_length = _write_runs(target, tmp, memory_bytes, chunk_size)
+        terms = _merge_runs(target, runs, memory_bytes)
+    meta = {"docs": docs, "total_length": total_length, "terms": terms, "runs": len(runs),
+            "built_at": time.time()}
+    with open(os.path.join(target, "meta.json"), "w") as fh:
+        json.dump(meta, fh)
+    _activate(base, name, previous, journal_start)
+    return meta
+
+
+def _write_runs(target, tmp, memory_bytes, chunk_size):
+    budget = max(1, memory_bytes // (2 * POSTING_BYTES))  # sorting a run needs a second copy
+    rows = Review.objects.order_by("pk").values_list("pk", "movie_id", "rating", "content")
+    rows = rows.iterator(chunk_size=chunk_size)
+    runs, pending, pending_postings = [], [], 0
+    docs = total_length = 0
+    columns = {name: open(os.path.join(target, name), "wb") for name in FILES if name.startswith("doc_")}
+    try:
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            hashes, ids, tfs, lengths = [], [], [], []
+            for pk, _, _, content in chunk:
+                length, terms = analyze(content)
+                lengths.append(length)
+                hashes.extend(terms)
+                ids.extend(itertools.repeat(pk, len(terms)))
+                tfs.extend(min(tf, 255) for tf in terms.values())
+            values = {"doc_ids": [row[0] for row in chunk], "doc_lengths": lengths,
+                      "doc_movies": [row[1] for row in chunk], "doc_ratings": [row[2] for row in chunk]}
+            for name, fh in columns.items():
+                np.asarray(values[name], dtype=FILES[name]).tofile(fh)
+            pending.append((np.array(hashes, dtype=np.uint64), np.array(ids, dtype=np.int64),
+                            np.array(tfs, dtype=np.uint8)))
+            pending_postings += len(hashes)
+            docs += len(chunk)
+            total_length += sum(lengths)
+            if pending_postings >= budget:
+                runs.append(_spill(tmp, len(runs), pending))
+                pending, pending_postings = [], 0
+        if pending_postings:
+            runs.append(_spill(tmp, len(runs), pending))
+    finally:
+        for fh in columns.values():
+            fh.close()
+    return runs, docs, total_length
+
+
+def _spill(tmp, number, pending):
+    hashes, ids, tfs = (np.concatenate(parts) for parts in zip(*pending))
+    # Runs cover increasing review ids, so a stable sort keeps each term's ids ascending.
+    order = np.argsort(hashes, kind="stable")
+    run = {}
+    for label, values in (("terms", hashes), ("doc_ids", ids), ("tfs", tfs)):
+        run[label] = os.path.join(tmp, f"run{number}-{label}")
+        values[order].astype(FILES[label]).tofile(run[label])
+    return run
+
+
+def _read(run, label, lo, hi):
+    itemsize = np.dtype(FILES[label]).itemsize
+    return np.fromfile(run[label], dtype=FILES[label], count=hi - lo, offset=lo * itemsize)
+
+
+def _merge_runs(target, runs, memory_bytes):
+    # Runs are sorted by term and cover increasing review ids, so a term's postings are its postings
+    # in the first run, then the second, and so on. Each pass reads at most `step` postings per run
+    # from a cursor into it, up to the smallest term that does not fit; that term is copied through
+    # run by run in chunks, so one very common term cannot outgrow the budget.
+    keys = [np.memmap(run["terms"], dtype=FILES["terms"], mode="r") for run in runs]
+    step = max(1, memory_bytes // (4 * POSTING_BYTES) // max(len(runs), 1))
+    cursors = [0] * len(runs)
+    term_bytes, term_postings = [np.zeros(1, dtype=np.int64)], [np.zeros(1, dtype=np.int64)]
+    with open(os.path.join(target, "terms"), "wb") as terms_fh, \
+            open(os.path.join(target, "postings"), "wb") as postings_fh, \
+            open(os.path.join(target, "tfs"), "wb") as tfs_fh:
+        while any(cursor < len(run_terms) for cursor, run_terms in zip(cursors, keys)):
+            tails = [run_terms[cursor + step - 1] for cursor, run_terms in zip(cursors, keys)
+                     if cursor + step < len(run_terms)]
+            bound = min(tails) if tails else None
+            parts = []
+            for r, (run, run_terms) in enumerate(zip(runs, keys)):
+                hi = len(run_terms) if bound is None else int(np.searchsorted(run_terms, bound))
+                parts.append(tuple(_read(run, label, cursors[r], hi) for label in ("terms", "doc_ids", "tfs")))
+                cursors[r] = hi
+            hashes, ids, tfs = (np.concatenate(column) for column in zip(*parts))
+            if len(hashes):
+                order = np.argsort(hashes, kind="stable")
+                hashes, ids, tfs = hashes[order], ids[order], tfs[order]
+                terms, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+                gaps = np.diff(ids, prepend=0)
+                gaps[first] = ids[first]
+                data, sizes = encode_varints(gaps)
+                terms.astype(FILES["terms"]).tofile(terms_fh)
+                data.tofile(postings_fh)
+                tfs.astype(FILES["tfs"]).tofile(tfs_fh)
+                term_bytes.append(np.add.reduceat(sizes, first))
+                term_postings.append(counts)
+            if bound is None:
+                continue
+            written = count = last = 0
+            for r, (run, run_terms) in enumerate(zip(runs, keys)):
+                end = int(np.searchsorted(run_terms, bound, side="right"))
+                for lo in range(cursors[r], end, step * len(runs)):
+                    hi = min(lo + step * len(runs), end)
+                    ids = _read(run, "doc_ids", lo, hi)
+                    data, _ = encode_varints(np.diff(ids, prepend=last))
+                    data.tofile(postings_fh)
+                    _read(run, "tfs", lo, hi).tofile(tfs_fh)
+                    written, count, last = written + len(data), count + len(ids), int(ids[-1])
+                cursors[r] = end
+            np.array([bound], dtype=FILES["terms"]).tofile(terms_fh)
+            term_bytes.append(np.array([written], dtype=np.int64))
+            term_postings.append(np.array([count], dtype=np.int64))
+    for name, values in (("term_bytes", term_bytes), ("term_postings", term_postings)):
+        np.cumsum(np.concatenate(values)).astype(FILES[name]).tofile(os.path.join(target, name))
+    return sum(len(values) for values in term_postings) - 1
+
+
+def _activate(base, name, previous, journal_start):
+    with _locked(base):
+        current = _current_name(base)
+        if current:
+            # Carry over writes journaled while this build was reading the table.
+            start = journal_start if current == previous else 0
+            with open(os.path.join(base, current, "journal"), "ab+") as old, \
+                    open(os.path.join(base, name, "journal"), "wb") as new:
+                old.seek(start)
+                shutil.copyfileobj(old, new)
+        tmp = os.path.join(base, "CURRENT.tmp")
+        with open(tmp, "w") as fh:
+            fh.write(name)
+        os.replace(tmp, os.path.join(base, "CURRENT"))
+    for entry in os.listdir(base):
+        if entry.startswith("index-") and entry != name:
+            # Processes still reading an old index keep their open maps.
+            shutil.rmtree(os.path.join(base, entry), ignore_errors=True)
+
+
+# Incremental updates
+
+def record(reviews=(), deleted=()):
+    """Journal created/updated ``reviews`` and ``deleted`` review ids, if an index exists."""
+    base = index_dir()
+    if not base or not _current_name(base):
+        return
+    lines = []
+    for review in reviews:
+        length, terms = analyze(review.content)
+        lines.append({"op": "put", "id": review.pk, "movie": review.movie_id, "rating": review.rating,
+                      "length": length, "terms": [[h, min(tf, 255)] for h, tf in terms.items()]})
+    lines.extend({"op": "delete", "id": review_id} for review_id in deleted)
+    if not lines:
+        return
+    payload = "".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines)
+    with _locked(base):
+        with open(os.path.join(base, _current_name(base), "journal"), "a") as fh:
+            fh.write(payload)
+
+
+# Querying
+
+class ReviewIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as fh:
+            meta = json.load(fh)
+        self.indexed_docs = meta["docs"]
+        self.indexed_length = meta["total_length"]
+        for name in FILES:
+            setattr(self, name, _map(directory, name))
+        self.journal_offset = 0
+        self.added = {}  # review id -> (movie, rating, length, {term: tf})
+        self.added_postings = {}  # term -> {review ids}
+        self.hidden = {}  # indexed review id -> indexed length, for reviews changed since the build
+        self._hidden_ids = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Apply journal entries written since the last call."""
+        try:
+            size = os.path.getsize(os.path.join(self.directory, "journal"))
+        except FileNotFoundError:
+            return
+        if size <= self.journal_offset:
+            return
+        with open(os.path.join(self.directory, "journal"), "rb") as fh:
+            fh.seek(self.journal_offset)
+            data = fh.read(size - self.journal_offset)
+        data = data[:data.rfind(b"\n") + 1]  # a line still being written is read next time
+        for line in data.splitlines():
+            entry = json.loads(line)
+            self._discard(entry["id"])
+            if entry["op"] == "put":
+                terms = {h: tf for h, tf in entry["terms"]}
+                self.added[entry["id"]] = (entry["movie"], entry["rating"], entry["length"], terms)
+                for h in terms:
+                    self.added_postings.setdefault(h, set()).add(entry["id"])
+        self.journal_offset += len(data)
+        self._hidden_ids = np.fromiter(self.hidden, dtype=np.int64, count=len(self.hidden))
+
+    def _discard(self, review_id):
+        entry = self.added.pop(review_id, None)
+        if entry is not None:
+            for h in entry[3]:
+                self.added_postings[h].discard(review_id)
+        if review_id not in self.hidden:
+            pos = np.searchsorted(self.doc_ids, review_id)
+            if pos < len(self.doc_ids) and self.doc_ids[pos] == review_id:
+                self.hidden[review_id] = int(self.doc_lengths[pos])
+
+    def search(self, query, movie=None, rating=None, limit=20, offset=0):
+        """Return ``(total_matches, [(review_id, score), ...])`` ranked by BM25."""
+        terms = {term_hash(term) for term in tokenize(query)}
+        with self._lock:
+            self.refresh()
+            docs = self.indexed_docs - len(self.hidden) + len(self.added)
+            total_length = (self.indexed_length - sum(self.hidden.values())
+                            + sum(entry[2] for entry in self.added.values()))
+            average_length = total_length / docs if docs else 1.0
+            ids, scores = [], []
+            for h in terms:
+                found = self._postings(h, movie, rating)
+                if found is None:
+                    continue
+                term_ids, tfs, lengths, df = found
+                idf = np.log(1 + (docs - df + 0.5) / (df + 0.5))
+                norm = K1 * (1 - B + B * lengths / max(average_length, 1e-9))
+                ids.append(term_ids)
+                scores.append(idf * tfs * (K1 + 1) / (tfs + norm))
+        if not ids:
+            return 0, []
+        matched, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        order = np.lexsort((matched, -totals))[offset:offset + limit]
+        return len(matched), [(int(matched[i]), float(totals[i])) for i in order]
+
+    def _postings(self, h, movie, rating):
+        pos = np.searchsorted(self.terms, h)
+        if pos < len(self.terms) and self.terms[pos] == h:
+            b0, b1 = self.term_bytes[pos:pos + 2]
+            p0, p1 = self.term_postings[pos:pos + 2]
+            ids = np.cumsum(decode_varints(self.postings[b0:b1])).astype(np.int64)
+            tfs = self.tfs[p0:p1].astype(np.float64)
+            docs = np.searchsorted(self.doc_ids, ids)
+            keep = ~np.isin(ids, self._hidden_ids)
+            if movie is not None:
+                keep &= self.doc_movies[docs] == movie
+            if rating is not None:
+                keep &= self.doc_ratings[docs] == rating
+            ids, tfs, lengths = ids[keep], tfs[keep], self.doc_lengths[docs][keep].astype(np.float64)
+            df = int(p1 - p0)
+        else:
+            ids = np.empty(0, dtype=np.int64)
+            tfs = lengths = np.empty(0)
+            df = 0
+        extra = []
+        for review_id in self.added_postings.get(h, ()):
+            entry_movie, entry_rating, length, entry_terms = self.added[review_id]
+            if (movie is None or entry_movie == movie) and (rating is None or entry_rating == rating):
+                extra.append((review_id, entry_terms[h], length))
+        df += len(self.added_postings.get(h, ()))
+        if not df:
+            return None
+        if extra:
+            extra_ids, extra_tfs, extra_lengths = (np.array(column) for column in zip(*extra))
+            ids = np.concatenate((ids, extra_ids.astype(np.int64)))
+            tfs = np.concatenate((tfs, extra_tfs.astype(np.float64)))
+            lengths = np.concatenate((lengths, extra_lengths.astype(np.float64)))
+        return ids, tfs, lengths, df
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def current_index():
+    """The current index for this process, or ``None`` if none has been built."""
+    base = index_dir()
+    name = base and _current_name(base)
+    if not name:
+        return None
+    directory = os.path.join(base, name)
+    index = _indexes.get(base)
+    if index is None or index.directory != directory:
+        with _indexes_lock:
+            index = _indexes.get(base)
+            if index is None or index.directory != directory:
+                index = _indexes[base] = ReviewIndex(directory)
+    return index
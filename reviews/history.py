@@ -0,0 +1,59 @@
+"""
+Per-user review and reaction history.
+
+Pages are cut with cursor (keyset) pagination over ``(user, -created_at)`` so
+deep pages cost the same as the first one. Reactions are read from every
+shard and merged (``reviews.shards``); their reviews and the viewer's own
+reactions are loaded for the rows of the page only. Archived reactions
+(``reviews.archive``) count as the viewer's reaction but are not listed.
+"""
+from rest_framework.pagination import CursorPagination
+
+from . import archive, shards
+from .models import Review, Reaction
+
+
+class HistoryPagination(CursorPagination):
+    ordering = "-created_at"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+def user_reviews(user_id):
+    return Review.objects.filter(user_id=user_id).select_related("user", "movie")
+
+
+def user_reactions(user_id):
+    """The user's reactions from every shard; pass a page to ``attach_reviews``."""
+    return shards.merged(Reaction.objects.filter(user_id=user_id))
+
+
+def attach_reviews(reactions):
+    """Load the reviews of a page of ``reactions`` in one query; returns them in the same order."""
+    reactions = list(reactions)
+    reviews = Review.objects.select_related("user", "movie").order_by().in_bulk(
+        [reaction.review_id for reaction in reactions]
+    )
+    for reaction in reactions:
+        if reaction.review_id in reviews:
+            reaction.review = reviews[reaction.review_id]
+    return [reviews[reaction.review_id] for reaction in reactions if reaction.review_id in reviews]
+
+
+def attach_reactions(reviews, user=None):
+    """
+    Set the viewer's reaction on ``reviews`` with two queries per shard, one for
+    reaction rows and one for archived reactions (counts are stored on reviews).
+    """
+    reviews = list(reviews)
+    own = {}
+    if user is not None and user.is_authenticated:
+        for reactions in shards.for_reviews([review.pk for review in reviews]):
+            own.update(reactions.filter(user=user).values_list("review_id", "is_like"))
+        rest = [review.pk for review in reviews if review.pk not in own]
+        if rest:
+            own.update(archive.viewer_reactions(user.pk, rest))
+    for review in reviews:
+        is_like = own.get(review.pk)
+        review.viewer_reaction = None if is_like is None else ("like" if is_like else "dislike")
+    return reviews
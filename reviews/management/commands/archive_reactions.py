@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reviews import archive, trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Pack reactions older than REACTION_ARCHIVE_DAYS into per-review and per-user archive rows, "
+        "keeping their counts, toggles and the viewer's reaction intact. Run periodically (e.g. nightly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.REACTION_ARCHIVE_DAYS,
+                            help="Archive reactions older than this many days; at least the trending window.")
+        parser.add_argument("--batch-size", type=int, default=archive.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        window_days = trending.WINDOW_HOURS // 24
+        if options["days"] < window_days:
+            # Archived reactions keep no timestamp, so withdrawing one could not be taken back from
+            # the trending bucket it was counted in.
+            raise CommandError(f"--days must be at least {window_days}, the trending window.")
+        before = timezone.now() - timedelta(days=options["days"])
+        moved = archive.archive(before, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} reactions created before {before:%Y-%m-%d}."))
@@ -0,0 +1,199 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, F
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from movies.models import Movie
+from reviews.models import Review
+
+User = get_user_model()
+
+SCAN = re.compile(r"^SCAN (\w+)$")
+SEARCH = re.compile(r"^SEARCH (\w+) USING (?:COVERING )?INDEX \w+ \((.+)\)$")
+TEMP_BTREE = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+ORDER_BY = re.compile(r" ORDER BY (.+?)(?: LIMIT \d+| OFFSET \d+)*$")
+ORDER_TERM = re.compile(r'"(\w+)"\."(\w+)" (ASC|DESC)')
+
+# (name, url name, url kwargs, query params, authenticated, allowed issues)
+# Placeholders {movie}, {review} and {title} are filled from the current dataset.
+# Allowed issues are inherent to the endpoint and would not be fixed by an index:
+# COUNT(*) for pagination over an unfiltered table, ordering by an aggregate, or
+# the sort after GROUP BY that the likes/dislikes annotations force.
+LIST_SORT = {"temp-btree ORDER BY"}
+FULL_MOVIES = {"scan movies_movie", "temp-btree ORDER BY"}
+FULL_REVIEWS = {"scan reviews_review", "temp-btree ORDER BY"}
+
+SHAPES = [
+    ("movie-list", "movie-list", {}, {}, False, FULL_MOVIES),
+    ("movie-list-genre", "movie-list", {}, {"genre": "Drama"}, False, LIST_SORT | {"temp-btree GROUP BY"}),
+    ("movie-list-year", "movie-list", {}, {"release_year": 2010}, False, FULL_MOVIES),
+    ("movie-list-genre-year", "movie-list", {}, {"genre": "Drama", "release_year": 2010}, False, LIST_SORT),
+    ("movie-list-search", "movie-list", {}, {"search": "Movie 1"}, False, FULL_MOVIES),
+    ("movie-list-order-title", "movie-list", {}, {"ordering": "title"}, False, FULL_MOVIES),
+    ("movie-list-order-year", "movie-list", {}, {"ordering": "-release_year"}, False, FULL_MOVIES),
+    ("movie-list-order-rating", "movie-list", {}, {"ordering": "-average_rating"}, False, FULL_MOVIES),
+    ("movie-list-order-reviews", "movie-list", {}, {"ordering": "-review_count"}, False, FULL_MOVIES),
+    ("movie-detail", "movie-detail", {"pk": "{movie}"}, {}, False, set()),
+    ("movie-top-rated", "movie-top-rated", {}, {}, False, set()),
+    ("movie-top-rated-genre", "movie-top-rated", {}, {"genre": "Drama"}, False, set()),
+    ("movie-page", "movie-page", {"pk": "{movie}"}, {}, True, {"temp-btree GROUP BY"}),
+    ("movie-batch", "movie-batch", {}, {"ids": "{movie}"}, False, set()),
+    ("review-list", "review-list", {}, {}, False, FULL_REVIEWS),
+    ("review-list-auth", "review-list", {}, {}, True, FULL_REVIEWS),
+    ("review-list-movie", "review-list", {}, {"movie": "{movie}"}, False, LIST_SORT),
+    ("review-list-movie-auth", "review-list", {}, {"movie": "{movie}"}, True, LIST_SORT),
+    ("review-list-rating", "review-list", {}, {"rating": 5}, False, FULL_REVIEWS),
+    ("review-list-search", "review-list", {}, {"search": "Movie 1"}, False, FULL_REVIEWS),
+    ("review-list-order-likes", "review-list", {}, {"ordering": "-likes_count"}, False, FULL_REVIEWS),
+    ("review-detail", "review-detail", {"pk": "{review}"}, {}, True, set()),
+    ("review-batch", "review-batch", {}, {"ids": "{review}"}, True, set()),
+    ("review-by-movie", "review-by-movie", {}, {"title": "{title}"}, False, FULL_REVIEWS),
+    ("review-top-liked", "review-top-liked", {}, {}, False, FULL_REVIEWS),
+    ("review-reactions", "review-reactions", {"pk": "{review}"}, {}, False, set()),
+    ("review-trending", "review-trending", {}, {}, False, {"temp-btree ORDER BY"}),
+    ("review-trending-movie", "review-trending", {}, {"movie": "{movie}"}, False, LIST_SORT | {"temp-btree GROUP BY"}),
+    ("user-detail", "user-detail", {"pk": "{user}"}, {}, False, set()),
+    ("me", "me", {}, {}, True, set()),
+    ("me-reviews", "me-reviews", {}, {}, True, set()),
+    ("me-reactions", "me-reactions", {}, {}, True, set()),
+    ("user-reviews", "user-reviews", {"pk": "{user}"}, {}, False, set()),
+]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [c["columns"] for c in constraints.values() if c["index"] or c["unique"] or c["primary_key"]]
+
+
+def plan_issues(details, tables):
+    issues = set()
+    for detail in details:
+        match = SCAN.match(detail)
+        if match and match.group(1) in tables:
+            issues.add(f"scan {match.group(1)}")
+        match = TEMP_BTREE.search(detail)
+        if match:
+            issues.add(f"temp-btree {match.group(1)}")
+    return issues
+
+
+def recommend(sql, details):
+    """
+    Suggest a composite index when a table is searched on equality columns and
+    the result is then sorted by columns of the same table. Sorts that follow a
+    GROUP BY cannot be served by index order, so grouped queries are skipped.
+    """
+    if " GROUP BY " in sql or not any(TEMP_BTREE.search(d) for d in details):
+        return []
+    order = ORDER_BY.search(sql)
+    if not order:
+        return []
+    terms = ORDER_TERM.findall(order.group(1))
+    suggestions = []
+    for detail in details:
+        match = SEARCH.match(detail)
+        if not match:
+            continue
+        table = match.group(1)
+        columns = [part.split("=")[0] for part in match.group(2).split(" AND ") if part.endswith("=?")]
+        sort = [(col, direction) for tbl, col, direction in terms if tbl == table]
+        if not columns or not sort or len(sort) != len(terms):
+            continue
+        wanted = columns + [col for col, _ in sort]
+        if any(index[:len(wanted)] == wanted for index in existing_indexes(table)):
+            continue
+        fields = columns + [f"{col} {direction}" for col, direction in sort]
+        suggestions.append(f"{table}({', '.join(fields)})")
+    return suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the queries issued by each movie/review endpoint and run EXPLAIN QUERY PLAN on them, "
+        "flagging full table scans and temporary B-tree sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--strict", action="store_true", help="Exit non-zero if any unexpected issue is found.")
+        parser.add_argument("--json", action="store_true", help="Emit a machine-readable report.")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print the full plan of every query.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("audit_query_plans only understands SQLite query plans.")
+
+        movie = Movie.objects.annotate(n=Count("reviews")).order_by("-n").first()
+        review = Review.objects.order_by((F("likes_count") + F("dislikes_count")).desc()).first()
+        user = User.objects.first()
+        if movie is None or review is None or user is None:
+            raise CommandError("No data to audit. Run `manage.py seed_data` first.")
+        placeholders = {"movie": movie.pk, "review": review.pk, "title": movie.title, "user": user.pk}
+        tables = set(connection.introspection.table_names())
+
+        report = []
+        unexpected = 0
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for name, url_name, kwargs, params, authenticated, allowed in SHAPES:
+                client = APIClient()
+                if authenticated:
+                    client.force_authenticate(user)
+                path = reverse(url_name, kwargs={key: value.format(**placeholders) for key, value in kwargs.items()})
+                params = {key: str(value).format(**placeholders) for key, value in params.items()}
+                with CaptureQueriesContext(connection) as ctx:
+                    response = client.get(path, params)
+                if response.status_code != 200:
+                    raise CommandError(f"{name}: {path} returned {response.status_code}")
+
+                queries = []
+                issues = set()
+                suggestions = []
+                for sql in dict.fromkeys(q["sql"] for q in ctx.captured_queries):
+                    if not sql.lstrip().upper().startswith("SELECT"):
+                        continue
+                    details = explain(sql)
+                    found = plan_issues(details, tables)
+                    issues |= found
+                    suggestions += recommend(sql, details)
+                    queries.append({"sql": sql, "plan": details, "issues": sorted(found)})
+                extra = sorted(issues - allowed)
+                unexpected += len(extra)
+                report.append({
+                    "shape": name,
+                    "path": path,
+                    "params": params,
+                    "queries": len(ctx.captured_queries),
+                    "issues": sorted(issues),
+                    "unexpected": extra,
+                    "recommended_indexes": sorted(set(suggestions)),
+                    "plans": queries,
+                })
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for entry in report:
+                status = self.style.ERROR("REGRESSION") if entry["unexpected"] else self.style.SUCCESS("ok")
+                self.stdout.write(f"{entry['shape']:<28} {entry['queries']:>3} queries  {status}  {', '.join(entry['issues'])}")
+                for suggestion in entry["recommended_indexes"]:
+                    self.stdout.write(f"    recommend index on {suggestion}")
+                if options["verbose_plans"] or entry["unexpected"]:
+                    for query in entry["plans"]:
+                        self.stdout.write(f"    {query['sql'][:160]}")
+                        for detail in query["plan"]:
+                            self.stdout.write(f"        {detail}")
+
+        if unexpected and options["strict"]:
+            raise CommandError(f"{unexpected} unexpected query plan issue(s) found.")
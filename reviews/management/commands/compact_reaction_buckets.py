@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from reviews import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold hourly reaction buckets older than a day into daily buckets and drop buckets "
+        "outside the trending window. Run periodically (e.g. hourly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Recreate all buckets in the window from the reaction table first.")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            created = trending.rebuild()
+            self.stdout.write(f"Rebuilt {created} buckets from reactions.")
+        expired, merged = trending.compact()
+        self.stdout.write(self.style.SUCCESS(f"Dropped {expired} expired and merged {merged} hourly buckets."))
@@ -0,0 +1,38 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from reviews import archive, shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Move reactions, archived ones included, to the shard the current REACTION_SHARDS layout assigns "
+        "them, after shards were added or removed (or sharding was switched on or off). Migrates the shard "
+        "databases first. "
+        "Pause reaction writes while it runs; it can be rerun safely if interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="sources", nargs="+", metavar="DATABASE",
+                            help="Databases to move reactions out of (default: every configured database).")
+        parser.add_argument("--batch-size", type=int, default=shards.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        sources = options["sources"] or list(connections)
+        unknown = sorted(set(sources) - set(connections))
+        if unknown:
+            raise CommandError(f"Unknown databases: {', '.join(unknown)}.")
+        for alias in dict.fromkeys([*shards.aliases(), *sources]):
+            if alias != DEFAULT_DB_ALIAS:
+                call_command("migrate", database=alias, verbosity=0)
+        total = 0
+        for alias in sources:
+            moved = shards.reshard(alias, options["batch_size"])
+            archives = archive.reshard(alias, options["batch_size"])
+            self.stdout.write(f"{alias}: moved {moved} reactions and the archived reactions of {archives} reviews.")
+            total += moved
+        # The per-user archive rows are an index of the per-review ones on the same shard.
+        for alias in dict.fromkeys([*shards.aliases(), *sources]):
+            archive.rebuild_user_rows(alias)
+        self.stdout.write(self.style.SUCCESS(f"Moved {total} reactions to {', '.join(shards.aliases())}."))
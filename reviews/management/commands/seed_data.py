@@ -0,0 +1,130 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts import stats
+from movies.models import Movie
+from movies.ratings import refresh_scores
+from reviews import shards
+from reviews.models import Review, Reaction, ReviewReactionArchive, UserReactionArchive
+
+User = get_user_model()
+
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Romance", "Thriller", "Animation", "Documentary", "Fantasy"]
+WORDS = ("great plot acting boring slow brilliant twist ending score visuals cast script "
+         "pacing funny dark moving epic weak strong classic forgettable charming").split()
+
+
+class Command(BaseCommand):
+    help = "Seed the database with a deterministic synthetic dataset of users, movies, reviews and reactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--movies", type=int, default=500)
+        parser.add_argument("--reviews-per-user", type=int, default=20)
+        parser.add_argument("--reactions-per-user", type=int, default=50)
+        parser.add_argument("--days", type=int, default=365, help="Spread created_at timestamps over this many days.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--flush", action="store_true", help="Delete existing movies, reviews and reactions first.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        span = timedelta(days=options["days"]).total_seconds()
+
+        def stamp():
+            return now - timedelta(seconds=rng.random() * span)
+
+        with transaction.atomic():
+            if options["flush"]:
+                for reactions in shards.scatter(Reaction.objects.all()):
+                    reactions.delete()
+                for model in (ReviewReactionArchive, UserReactionArchive):
+                    for rows in shards.scatter(model.objects.all()):
+                        rows.delete()
+                Review.objects.all().delete()
+                Movie.objects.all().delete()
+                User.objects.filter(username__startswith="synthetic_").delete()
+
+            start = User.objects.count()
+            password = make_password(None)
+            users = User.objects.bulk_create(
+                [
+                    User(username=f"synthetic_{start + i}", email=f"synthetic_{start + i}@example.com", password=password)
+                    for i in range(options["users"])
+                ],
+                batch_size=batch_size,
+            )
+            movies = Movie.objects.bulk_create(
+                [
+                    Movie(
+                        title=f"Synthetic Movie {i}",
+                        description=" ".join(rng.choices(WORDS, k=12)),
+                        release_year=rng.randint(1960, 2025),
+                        genre=rng.choice(GENRES),
+                    )
+                    for i in range(options["movies"])
+                ],
+                batch_size=batch_size,
+            )
+            self._spread(Movie, movies, stamp, batch_size)
+
+            # Popularity follows a Zipf-like curve so a few titles collect most of the reviews.
+            movie_weights = [1.0 / (rank + 1) for rank in range(len(movies))]
+            reviews = []
+            for user in users:
+                for movie in self._sample(rng, movies, movie_weights, options["reviews_per_user"]):
+                    reviews.append(Review(
+                        user=user,
+                        movie=movie,
+                        rating=rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 6, 4])[0],
+                        content=" ".join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    ))
+            reviews = Review.objects.bulk_create(reviews, batch_size=batch_size)
+            self._spread(Review, reviews, stamp, batch_size)
+
+            review_weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(reviews))]
+            per_shard = defaultdict(list)
+            for user in users:
+                for review in self._sample(rng, reviews, review_weights, options["reactions_per_user"]):
+                    per_shard[shards.alias_for(review.pk)].append(
+                        Reaction(user=user, review=review, is_like=rng.random() < 0.8)
+                    )
+            reactions = []
+            for alias, rows in per_shard.items():
+                rows = Reaction.objects.using(alias).bulk_create(rows, batch_size=batch_size)
+                self._spread(Reaction, rows, stamp, batch_size, using=alias)
+                reactions += rows
+
+            # bulk_create bypasses the signals that maintain the stored aggregates.
+            refresh_scores()
+            stats.refresh()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(movies)} movies, {len(reviews)} reviews, {len(reactions)} reactions."
+        ))
+
+    @staticmethod
+    def _sample(rng, population, weights, k):
+        """Weighted sample of up to ``k`` distinct items."""
+        k = min(k, len(population))
+        picked = {}
+        while len(picked) < k:
+            for item in rng.choices(population, weights=weights, k=k - len(picked)):
+                picked[item.pk] = item
+        return list(picked.values())
+
+    @staticmethod
+    def _spread(model, objs, stamp, batch_size, using=None):
+        # auto_now_add overwrites created_at on insert, so backdate in a second pass.
+        for obj in objs:
+            obj.created_at = stamp()
+        model.objects.using(using).bulk_update(objs, ["created_at"], batch_size=batch_size)
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_movie_genre_year_index'),
+        ('reviews', '0003_reaction_delete_like'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['review', 'is_like'], name='reviews_rea_review__5d6fbf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['review', '-created_at'], name='reviews_rea_review__dfb1c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', '-created_at'], name='reviews_rev_movie_i_79ac9e_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_rating_counters'),
+        ('reviews', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.PositiveIntegerField()),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reaction_buckets', to='reviews.review')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='reviews_rea_hour_92f305_idx'), models.Index(fields=['movie', 'hour'], name='reviews_rea_movie_i_a9f453_idx')],
+                'constraints': [models.UniqueConstraint(fields=('review', 'hour'), name='unique_reaction_bucket_per_review_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_rating_counters'),
+        ('reviews', '0005_reactionbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['user', '-created_at'], name='reviews_rea_user_id_7bc831_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-created_at'], name='reviews_rev_user_id_eeecea_idx'),
+        ),
+    ]
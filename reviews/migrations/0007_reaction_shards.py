@@ -0,0 +1,51 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_reaction_counts(apps, schema_editor):
+    # Reactions are still in the default database when this runs; shards are filled later.
+    Review = apps.get_model('reviews', 'Review')
+    Reaction = apps.get_model('reviews', 'Reaction')
+
+    per_review = Reaction.objects.filter(review=OuterRef('pk')).order_by().values('review')
+    Review.objects.update(
+        likes_count=Coalesce(Subquery(per_review.filter(is_like=True).annotate(n=Count('id')).values('n')), 0),
+        dislikes_count=Coalesce(Subquery(per_review.filter(is_like=False).annotate(n=Count('id')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_user_history_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='review',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reactions', to='reviews.review'),
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reactions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_reaction_counts, migrations.RunPython.noop),
+    ]
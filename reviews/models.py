@@ -10,6 +10,11 @@ class Review(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained from reaction writes (reviews.counters), so lists need not group reactions.
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    dislikes_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ("likes_count", "dislikes_count")
 
     class Meta:
         ordering = ["-created_at"]
@@ -17,22 +22,106 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user", "movie"], name="unique_review_per_user_movie")
         ]
+        indexes = [
+            models.Index(fields=["movie", "-created_at"]),
+            models.Index(fields=["user", "-created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.user} → {self.movie} ({self.rating})"
 
+    def save(self, **kwargs):
+        # Only reviews.counters writes the counters; saving an instance loaded earlier must not reset them.
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            skipped = {*self.COUNTER_FIELDS, *self.get_deferred_fields()}
+            kwargs["update_fields"] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.attname not in skipped]
+        super().save(**kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so signal handlers can adjust aggregates when these change.
+        instance._loaded_values = {
+            name: instance.__dict__.get(name) for name in ("movie_id", "rating", "user_id")
+        }
+        return instance
+
 class Reaction(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reactions")
-    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name="reactions")
+    # Reactions may live in another database than their review and user (reviews.shards), so there are
+    # no constraints; signals delete them along with the review or user (reviews.signals).
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name="reactions")
+    review = models.ForeignKey(Review, on_delete=models.DO_NOTHING, db_constraint=False, related_name="reactions")
     is_like = models.BooleanField(default=True)  # True for like, False for dislike
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['user', 'review']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['review', 'is_like']),
+            models.Index(fields=['review', '-created_at']),
+            models.Index(fields=['user', '-created_at']),
+        ]
 
     def __str__(self):
         action = "likes" if self.is_like else "dislikes"
         return f"{self.user} {action} {self.review}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {"is_like": instance.__dict__.get("is_like")}
+        return instance
+
+class ReviewReactionArchive(models.Model):
+    """
+    Archived reactions on one review (``reviews.archive``): how many liked and
+    disliked it, and the packed, sorted ids of those users.
+    """
+    review = models.OneToOneField(Review, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    likes = models.PositiveIntegerField(default=0)
+    dislikes = models.PositiveIntegerField(default=0)
+    likers = models.BinaryField(default=b"")
+    dislikers = models.BinaryField(default=b"")
+    # The newest archived reaction; a reaction restored from the archive gets this timestamp.
+    archived_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.review_id}: +{self.likes}/-{self.dislikes} archived"
+
+class UserReactionArchive(models.Model):
+    """The packed, sorted ids of the reviews a user liked and disliked, for archived reactions on one shard."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name="+")
+    liked = models.BinaryField(default=b"")
+    disliked = models.BinaryField(default=b"")
+
+    def __str__(self):
+        return f"{self.user_id}: archived reactions"
+
+class ReactionBucket(models.Model):
+    """
+    Net reaction activity for a review within one hour (or one day, once
+    compacted), keyed by hours since the Unix epoch. Feeds /reviews/trending/.
+    """
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name="reaction_buckets")
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    hour = models.PositiveIntegerField()
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["review", "hour"], name="unique_reaction_bucket_per_review_hour")
+        ]
+        indexes = [
+            models.Index(fields=["hour"]),
+            models.Index(fields=["movie", "hour"]),
+        ]
+
+    def __str__(self):
+        return f"{self.review_id}@{self.hour}: +{self.likes}/-{self.dislikes}"
+
 # Create your models here.
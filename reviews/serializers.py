@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from . import history
 from .models import Review, Reaction
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -28,10 +29,30 @@ class ReviewSerializer(serializers.ModelSerializer):
         return attrs
 
     def get_user_reaction(self, obj):
+        if hasattr(obj, "viewer_reaction"):
+            # Already loaded for the whole page by reviews.history.attach_reactions.
+            return obj.viewer_reaction
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            reaction = obj.reactions.filter(user=request.user).first()
-            if reaction:
-                return "like" if reaction.is_like else "dislike"
-        return None
+        if request is None:
+            return None
+        # A single review (detail, create, update): the same lookup, across shards and the archive.
+        return history.attach_reactions([obj], request.user)[0].viewer_reaction
 
+
+class BulkReviewItemSerializer(serializers.Serializer):
+    """One item of a bulk create; the movie is checked for the whole batch at once (reviews.bulk)."""
+    movie = serializers.IntegerField(min_value=1)
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    content = serializers.CharField()
+
+class ReactionHistorySerializer(serializers.ModelSerializer):
+    reaction = serializers.SerializerMethodField()
+    reacted_at = serializers.DateTimeField(source="created_at", read_only=True)
+    review = ReviewSerializer(read_only=True)
+
+    class Meta:
+        model = Reaction
+        fields = ("reaction", "reacted_at", "review")
+
+    def get_reaction(self, obj):
+        return "like" if obj.is_like else "dislike"
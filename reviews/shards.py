@@ -0,0 +1,202 @@
+"""
+Reactions spread over several databases.
+
+With ``settings.REACTION_SHARDS`` listing database aliases, ``Reaction`` rows
+live there instead of in the default database: every reaction on a review
+goes to ``alias_for(review_id)`` (the review id modulo the number of
+shards), so likes on different reviews take different SQLite write locks,
+and everything about one review (who reacted, the one-reaction-per-user
+rule) stays on one shard. All other tables stay in the default database.
+Reactions reference reviews and users without foreign key constraints, and
+like/dislike counts are stored on ``Review`` (see ``reviews.counters``) so no
+query joins across databases.
+
+``for_review``/``for_reviews`` return querysets on the right shard; per-user
+questions go to every shard (``scatter``, ``merged``) and are combined in
+Python. With no shards configured every helper uses the default database, so
+callers are written once for both layouts. ``ReactionRouter`` sends
+reactions reached through a review or a reaction to their shard and refuses
+unrouted reaction queries instead of reading the default database's empty
+table. Writes to a shard and to the default database are separate
+transactions.
+
+Archived reactions (``reviews.archive``) live on the same shard as the
+reactions they replaced. After changing ``REACTION_SHARDS``,
+``manage.py reshard_reactions`` moves both to where the new layout puts them.
+Reaction ids are unique per shard.
+"""
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+CHUNK_SIZE = 5000
+# Reactions and their archive (reviews.archive) live on the shards.
+SHARDED_MODELS = {"reviews.Reaction", "reviews.ReviewReactionArchive", "reviews.UserReactionArchive"}
+
+
+def aliases():
+    """The databases holding reactions."""
+    return list(settings.REACTION_SHARDS) or [DEFAULT_DB_ALIAS]
+
+
+def alias_for(review_id):
+    shards = aliases()
+    return shards[review_id % len(shards)]
+
+
+def for_review(review_id):
+    """The reactions on one review, on its shard."""
+    from .models import Reaction
+
+    return Reaction.objects.using(alias_for(review_id)).filter(review_id=review_id)
+
+
+def group(review_ids, chunk_size=CHUNK_SIZE):
+    """``(alias, ids)`` pairs covering ``review_ids``: one per shard and chunk of ids."""
+    groups = defaultdict(list)
+    for review_id in review_ids:
+        groups[alias_for(review_id)].append(review_id)
+    return [(alias, ids[start:start + chunk_size]) for alias, ids in groups.items()
+            for start in range(0, len(ids), chunk_size)]
+
+
+def for_reviews(review_ids, chunk_size=CHUNK_SIZE):
+    """Querysets covering the reactions on ``review_ids``: one per shard and chunk of ids."""
+    from .models import Reaction
+
+    return [Reaction.objects.using(alias).filter(review_id__in=ids) for alias, ids in group(review_ids, chunk_size)]
+
+
+def scatter(queryset):
+    """``queryset`` (of reactions) on every shard."""
+    return [queryset.using(alias) for alias in aliases()]
+
+
+def merged(queryset):
+    """``queryset`` over every shard, as far as ordering, filtering and slicing go (enough to paginate)."""
+    querysets = scatter(queryset)
+    return querysets[0] if len(querysets) == 1 else MergedQuerySet(querysets)
+
+
+class MergedQuerySet:
+    """
+    The same reaction queryset on several shards. ``filter`` and ``order_by``
+    apply to each; a slice reads the first ``stop`` rows of every shard and
+    merges them in order. Every ordering field must sort in the same direction.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self.model = querysets[0].model
+
+    def filter(self, *args, **kwargs):
+        return MergedQuerySet([queryset.filter(*args, **kwargs) for queryset in self.querysets])
+
+    def order_by(self, *fields):
+        return MergedQuerySet([queryset.order_by(*fields) for queryset in self.querysets])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.stop is None:
+            raise TypeError("Merged reaction querysets only support slices with an end.")
+        ordering = self.querysets[0].query.order_by
+        descending = {field.startswith("-") for field in ordering}
+        if len(descending) != 1:
+            raise TypeError("Merged reaction querysets need an ordering in a single direction.")
+        fields = [field.lstrip("-") for field in ordering]
+        runs = [list(queryset[:index.stop]) for queryset in self.querysets]
+        rows = heapq.merge(*runs, key=lambda obj: [getattr(obj, field) for field in fields],
+                           reverse=descending.pop())
+        return list(itertools.islice(rows, index.start, index.stop))
+
+
+def insert(alias, reactions):
+    """
+    Write ``reactions`` to ``alias`` as they are, timestamps included, skipping
+    any whose user already reacted to that review there. Sends no signals.
+    """
+    from .models import Reaction
+
+    # Raw INSERT: bulk_create would overwrite created_at (auto_now_add).
+    fields = [Reaction._meta.get_field(name) for name in ("user", "review", "is_like", "created_at")]
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING".format(
+        quote(Reaction._meta.db_table),
+        ", ".join(quote(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    rows = [[field.get_db_prep_save(getattr(reaction, field.attname), connection) for field in fields]
+            for reaction in reactions]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def reshard(source, batch_size=CHUNK_SIZE):
+    """
+    Move the reactions in database ``source`` that the current layout puts on
+    another shard; returns how many moved. Each batch is copied (keeping its
+    timestamps, skipping rows already copied by an interrupted run) before it
+    is deleted from ``source``, so the command can simply be run again.
+    """
+    from .models import Reaction
+
+    moved = 0
+    last = 0
+    while batch := list(Reaction.objects.using(source).filter(pk__gt=last).order_by("pk")[:batch_size]):
+        last = batch[-1].pk
+        outgoing = defaultdict(list)
+        for reaction in batch:
+            if (target := alias_for(reaction.review_id)) != source:
+                outgoing[target].append(reaction)
+        for target, reactions in outgoing.items():
+            with transaction.atomic(using=target):
+                insert(target, reactions)
+            # Without signals: the reactions still exist, so no counter changes.
+            copied = Reaction.objects.using(source).filter(pk__in=[reaction.pk for reaction in reactions])
+            copied._raw_delete(source)
+            moved += len(reactions)
+    return moved
+
+
+class ReactionRouter:
+    """Routes reactions to their shard and everything else to the default database."""
+
+    def _reaction_alias(self, hints):
+        from .models import Reaction, Review, ReviewReactionArchive
+
+        instance = hints.get("instance")
+        if isinstance(instance, (Reaction, ReviewReactionArchive)):
+            # A reaction still being built (its review not yet set) gets routed when it is saved.
+            return alias_for(instance.review_id) if instance.review_id is not None else None
+        if isinstance(instance, Review) and instance.pk is not None:
+            return alias_for(instance.pk)
+        if instance is not None:
+            # A user assigned to a new reaction, or a user's archive row (one per shard): the queryset
+            # or save picks the database.
+            return None
+        if settings.REACTION_SHARDS:
+            raise ImproperlyConfigured("Reactions are sharded; query them through reviews.shards.")
+        return DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label in SHARDED_MODELS:
+            return self._reaction_alias(hints)
+        return DEFAULT_DB_ALIAS
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Reactions point across databases at their review and user.
+        if SHARDED_MODELS.intersection({obj1._meta.label, obj2._meta.label}):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            return None
+        # The default database keeps (unused) reaction tables, so switching layouts needs no migration.
+        return f"{app_label}.{model_name}" in {label.lower() for label in SHARDED_MODELS}
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts import stats
+from accounts.tasks import refresh_user_stats
+from movies import snapshot
+from movies.models import MovieSimilarity
+from movies.ratings import apply_rating_change
+from movies.tasks import resync_movie_rating
+from tasks.queue import enqueue
+from . import counters, shards
+from .deletion import delete_archived, delete_reactions
+from .models import Reaction, Review
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def mark_movie_similarity_stale(sender, instance, **kwargs):
+    # Picked up by `build_similar_movies --incremental`.
+    MovieSimilarity.objects.filter(movie_id=instance.movie_id, stale=False).update(stale=True)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_catalog_snapshot(sender, instance, **kwargs):
+    # Listed movies show their average rating and review count.
+    transaction.on_commit(snapshot.mark_stale)
+
+
+@receiver(post_save, sender=Review)
+def index_review_content(sender, instance, **kwargs):
+    from . import fulltext
+
+    transaction.on_commit(lambda: fulltext.record(reviews=[instance]))
+
+
+@receiver(post_delete, sender=Review)
+def unindex_review_content(sender, instance, **kwargs):
+    from . import fulltext
+
+    review_id = instance.pk
+    transaction.on_commit(lambda: fulltext.record(deleted=[review_id]))
+
+
+@receiver(post_save, sender=Review)
+def update_movie_rating_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, "_loaded_values", {})
+    if created:
+        apply_rating_change(instance.movie_id, 1, instance.rating)
+    elif old.get("movie_id") is None or old.get("rating") is None:
+        enqueue(resync_movie_rating, {"movie_id": instance.movie_id}, key=f"movie:{instance.movie_id}")
+    elif (old["movie_id"], old["rating"]) != (instance.movie_id, instance.rating):
+        apply_rating_change(old["movie_id"], -1, -old["rating"])
+        apply_rating_change(instance.movie_id, 1, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_movie_rating_on_delete(sender, instance, **kwargs):
+    apply_rating_change(instance.movie_id, -1, -instance.rating)
+
+
+def _queue_stats_refresh(*user_ids):
+    # A full recount is several subqueries per user; workers run it once per burst of writes.
+    for user_id in user_ids:
+        enqueue(refresh_user_stats, {"user_ids": [user_id]}, key=f"user:{user_id}")
+
+
+@receiver(post_save, sender=Review)
+def update_author_stats_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, "_loaded_values", {})
+    if created:
+        stats.adjust(instance.user_id, review_count=1, rating_sum=instance.rating)
+    elif old.get("user_id") is None or old.get("rating") is None:
+        _queue_stats_refresh(instance.user_id)
+    elif old["user_id"] != instance.user_id:
+        _queue_stats_refresh(old["user_id"], instance.user_id)
+    elif old["rating"] != instance.rating:
+        stats.adjust(instance.user_id, rating_sum=instance.rating - old["rating"])
+
+
+@receiver(post_delete, sender=Review)
+def update_author_stats_on_delete(sender, instance, **kwargs):
+    # Reactions on the review were deleted first and settled likes/dislikes received.
+    stats.adjust(instance.user_id, review_count=-1, rating_sum=-instance.rating)
+
+
+@receiver(pre_delete, sender=Review)
+def delete_review_reactions(sender, instance, **kwargs):
+    # Reactions have no foreign key to cascade through; they may be on a shard or archived.
+    delete_reactions(shards.for_review(instance.pk), pause=0)
+    delete_archived([instance.pk], pause=0)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_reactions(sender, instance, **kwargs):
+    for reactions in shards.scatter(Reaction.objects.filter(user_id=instance.pk)):
+        delete_reactions(reactions, pause=0)
+    delete_archived(user_id=instance.pk, pause=0)
+
+
+@receiver(post_save, sender=Reaction)
+def update_reaction_stats_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, "_loaded_values", {})
+    if created:
+        stats.adjust(instance.user_id, reactions_given=1)
+        if instance.is_like:
+            stats.adjust_review_author(instance.review_id, likes_received=1)
+            counters.adjust(instance.review_id, likes=1)
+        else:
+            stats.adjust_review_author(instance.review_id, dislikes_received=1)
+            counters.adjust(instance.review_id, dislikes=1)
+    elif old.get("is_like") is None:
+        # The author's stats refresh recounts their reviews' likes too.
+        _queue_stats_refresh(instance.review.user_id)
+    elif old["is_like"] != instance.is_like:
+        flip = 1 if instance.is_like else -1
+        stats.adjust_review_author(instance.review_id, likes_received=flip, dislikes_received=-flip)
+        counters.adjust(instance.review_id, likes=flip, dislikes=-flip)
+
+
+@receiver(post_delete, sender=Reaction)
+def update_reaction_stats_on_delete(sender, instance, **kwargs):
+    stats.adjust(instance.user_id, reactions_given=-1)
+    if instance.is_like:
+        stats.adjust_review_author(instance.review_id, likes_received=-1)
+        counters.adjust(instance.review_id, likes=-1)
+    else:
+        stats.adjust_review_author(instance.review_id, dislikes_received=-1)
+        counters.adjust(instance.review_id, dislikes=-1)
+
+
+# Connected last so every handler above sees the values from before the save.
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Reaction)
+def remember_loaded_values(sender, instance, **kwargs):
+    fields = ("movie_id", "rating", "user_id") if sender is Review else ("is_like",)
+    instance._loaded_values = {name: getattr(instance, name) for name in fields}
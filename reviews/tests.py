@@ -1,11 +1,21 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from movies.models import Movie
-from .models import Review, Reaction
+from .models import Review, Reaction, ReactionBucket
+from . import trending
 
 User = get_user_model()
 
@@ -296,3 +306,701 @@ class ReviewAPITestCase(APITestCase):
         
         # Should get a 400 error due to unique constraint
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryPlanAuditTestCase(TestCase):
+    def seed(self, **options):
+        call_command('seed_data', users=5, movies=10, reviews_per_user=3, reactions_per_user=4, flush=True,
+                     stdout=StringIO(), **options)
+        return (
+            sorted(Movie.objects.values_list('title', 'description', 'release_year', 'genre')),
+            sorted(Review.objects.values_list('user__username', 'movie__title', 'rating', 'content')),
+            sorted(Reaction.objects.values_list('user__username', 'review__user__username',
+                                                'review__movie__title', 'is_like')),
+        )
+
+    def test_seed_data_is_deterministic_and_complete(self):
+        """Test that seed_data recreates the same rows for a seed, in the requested volume"""
+        movies, reviews, reactions = first = self.seed()
+
+        self.assertEqual((len(movies), len(reviews), len(reactions)), (10, 15, 20))
+        self.assertEqual(self.seed(), first)
+        self.assertNotEqual(self.seed(seed=7), first)
+
+    def test_audit_query_plans_strict_passes_on_synthetic_data(self):
+        """Test that no endpoint regresses to an unexpected full scan or temp sort"""
+        call_command('seed_data', users=5, movies=10, reviews_per_user=3, reactions_per_user=4, stdout=StringIO())
+        out = StringIO()
+        call_command('audit_query_plans', strict=True, json=True, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertTrue(report)
+        self.assertTrue(all(not entry['unexpected'] for entry in report))
+
+    def test_audit_query_plans_requires_data(self):
+        """Test that the audit refuses to run against an empty database"""
+        with self.assertRaises(CommandError):
+            call_command('audit_query_plans', stdout=StringIO())
+
+
+class TrendingReviewsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.movie = Movie.objects.create(title='Test Movie', genre='Action', release_year=2023)
+        self.other_movie = Movie.objects.create(title='Other Movie', genre='Drama', release_year=2023)
+        self.old = Review.objects.create(user=self.user, movie=self.movie, rating=5, content='Old favourite')
+        self.fresh = Review.objects.create(user=self.user, movie=self.other_movie, rating=4, content='New hotness')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def bucket(self, review, hours_ago, likes=0, dislikes=0):
+        return ReactionBucket.objects.create(
+            review=review, movie=review.movie, hour=trending.current_hour() - hours_ago, likes=likes, dislikes=dislikes
+        )
+
+    def test_reactions_update_current_bucket(self):
+        """Test that like/dislike toggles keep the current hour's bucket in sync"""
+        self.client.post(reverse('review-like', kwargs={'pk': self.fresh.pk}))
+        self.client.post(reverse('review-dislike', kwargs={'pk': self.fresh.pk}))
+
+        bucket = ReactionBucket.objects.get(review=self.fresh)
+        self.assertEqual((bucket.likes, bucket.dislikes), (0, 1))
+
+        self.client.post(reverse('review-dislike', kwargs={'pk': self.fresh.pk}))
+        self.client.post(reverse('review-like', kwargs={'pk': self.fresh.pk}))
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.likes, bucket.dislikes), (1, 0))
+
+        response = self.client.get(reverse('review-trending'))
+        self.assertEqual([r['id'] for r in response.data['results']], [self.fresh.pk])
+        self.assertAlmostEqual(response.data['results'][0]['trending_score'], 1.0)
+
+    def test_withdrawing_an_old_reaction_leaves_current_score_alone(self):
+        """Test that removing or flipping a days-old like is taken back from the hour it was counted in"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        three_days_ago = timezone.now() - timedelta(days=3)
+        for reviewer, review in ((self.user, self.old), (other, self.old), (self.user, self.fresh)):
+            reaction = Reaction.objects.create(user=reviewer, review=review, is_like=True)
+            Reaction.objects.filter(pk=reaction.pk).update(created_at=three_days_ago)
+        call_command('compact_reaction_buckets', rebuild=True, stdout=StringIO())
+        call_command('compact_reaction_buckets', stdout=StringIO())
+        ReactionBucket.objects.create(review=self.fresh, movie=self.other_movie, hour=trending.current_hour(), likes=1)
+        before = {row['review_id']: row['score'] for row in trending.scores()}
+
+        self.client.post(reverse('review-like', kwargs={'pk': self.old.pk}))
+        self.client.post(reverse('review-like', kwargs={'pk': self.fresh.pk}))
+
+        response = self.client.get(reverse('review-trending'))
+        self.assertEqual([r['id'] for r in response.data['results']], [self.fresh.pk, self.old.pk])
+        self.assertAlmostEqual(response.data['results'][0]['trending_score'], 1.0)
+        self.assertEqual(ReactionBucket.objects.filter(hour=trending.current_hour(), review=self.old).count(), 0)
+
+        self.client.post(reverse('review-dislike', kwargs={'pk': self.fresh.pk}))
+        scores = {row['review_id']: row['score'] for row in trending.scores()}
+        self.assertAlmostEqual(scores[self.old.pk], before[self.old.pk] / 2)
+        self.assertNotIn(self.fresh.pk, scores)
+        bucket = ReactionBucket.objects.get(review=self.fresh, hour=trending.current_hour())
+        self.assertEqual((bucket.likes, bucket.dislikes), (1, 1))
+
+    def test_older_activity_decays(self):
+        """Test that recent likes outrank a larger number of older likes"""
+        self.bucket(self.old, hours_ago=48, likes=3)
+        self.bucket(self.fresh, hours_ago=0, likes=2)
+        self.bucket(self.old, hours_ago=trending.WINDOW_HOURS + 1, likes=100)
+
+        response = self.client.get(reverse('review-trending'))
+
+        self.assertEqual([r['id'] for r in response.data['results']], [self.fresh.pk, self.old.pk])
+        self.assertAlmostEqual(response.data['results'][1]['trending_score'], 0.75)
+
+    def test_trending_per_movie(self):
+        """Test that trending can be limited to one movie"""
+        self.bucket(self.old, hours_ago=1, likes=1)
+        self.bucket(self.fresh, hours_ago=1, likes=5)
+
+        response = self.client.get(reverse('review-trending'), {'movie': self.movie.pk})
+
+        self.assertEqual([r['id'] for r in response.data['results']], [self.old.pk])
+
+    def test_compaction_merges_hourly_buckets_and_drops_expired(self):
+        """Test that compaction keeps scores while bounding the bucket table"""
+        now = trending.current_hour()
+        day = (now - 48) - (now - 48) % 24
+        for hour in (day + 1, day + 2, day + 3):
+            ReactionBucket.objects.create(review=self.old, movie=self.movie, hour=hour, likes=2, dislikes=1)
+        self.bucket(self.old, hours_ago=trending.WINDOW_HOURS, likes=7)
+        self.bucket(self.fresh, hours_ago=0, likes=1)
+
+        call_command('compact_reaction_buckets', stdout=StringIO())
+
+        merged = ReactionBucket.objects.get(review=self.old)
+        self.assertEqual((merged.hour, merged.likes, merged.dislikes), (day, 6, 3))
+        self.assertEqual(ReactionBucket.objects.count(), 2)
+
+    def test_rebuild_from_reactions(self):
+        """Test that buckets can be rebuilt from the reaction table"""
+        Reaction.objects.create(user=self.user, review=self.old, is_like=True)
+
+        call_command('compact_reaction_buckets', rebuild=True, stdout=StringIO())
+
+        bucket = ReactionBucket.objects.get()
+        self.assertEqual((bucket.review_id, bucket.likes, bucket.hour), (self.old.pk, 1, trending.current_hour()))
+
+
+class ThrottlingTestCase(APITestCase):
+    def setUp(self):
+        from core.throttling import get_store
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.store_path = os.path.join(tmpdir.name, 'throttle.sqlite3')
+        rates = {'review-like': '2/min', 'review-dislike': None, 'login': None, 'register': None, 'list': '3/min'}
+        override = override_settings(
+            THROTTLE_STORE=self.store_path,
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(lambda: get_store().reset())
+
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        self.reviews = [
+            Review.objects.create(user=author, movie=Movie.objects.create(title=f'M{i}'), rating=3, content='Ok')
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='clicker', email='clicker@example.com', password='testpass123')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+
+    def like(self, user, review):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return self.client.post(reverse('review-like', args=[review.id]))
+
+    def test_like_throttled_with_retry_after(self):
+        """Test that likes beyond the bucket size get 429 with a Retry-After header"""
+        self.assertEqual(self.like(self.user, self.reviews[0]).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.like(self.user, self.reviews[1]).status_code, status.HTTP_201_CREATED)
+
+        response = self.like(self.user, self.reviews[2])
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 30)
+        self.assertFalse(Reaction.objects.filter(review=self.reviews[2]).exists())
+
+    def test_buckets_are_per_user(self):
+        """Test that one user's empty bucket does not limit another user"""
+        for review in self.reviews:
+            self.like(self.user, review)
+
+        self.assertEqual(self.like(self.other, self.reviews[0]).status_code, status.HTTP_201_CREATED)
+
+    def test_list_scope_for_anonymous_clients(self):
+        """Test that list endpoints share the "list" scope per client address"""
+        responses = [self.client.get(reverse('review-list')) for _ in range(3)]
+        responses.append(self.client.get(reverse('review-top-liked')))
+
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+        self.assertEqual(self.client.get(reverse('review-detail', args=[self.reviews[0].id])).status_code, 200)
+
+    def test_store_shared_between_workers(self):
+        """Test that two stores on the same file (as in two worker processes) share one bucket"""
+        from core.throttling import SQLiteBucketStore
+
+        first, second = SQLiteBucketStore(self.store_path), SQLiteBucketStore(self.store_path)
+
+        self.assertEqual(first.consume('k', 2, 1 / 30, 1000.0), 0)
+        self.assertEqual(second.consume('k', 2, 1 / 30, 1000.0), 0)
+        self.assertAlmostEqual(first.consume('k', 2, 1 / 30, 1000.0), 30.0)
+        self.assertAlmostEqual(second.consume('k', 2, 1 / 30, 1015.0), 15.0)
+        self.assertEqual(second.consume('k', 2, 1 / 30, 1030.0), 0)
+
+
+class BulkReviewCreateTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='partner', email='partner@example.com', password='testpass123')
+        self.movies = [Movie.objects.create(title=f'Movie {i}') for i in range(60)]
+        Review.objects.create(user=self.user, movie=self.movies[0], rating=3, content='Already here')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = reverse('review-bulk')
+
+    def test_bulk_create_reports_per_item_results(self):
+        """Test that valid items are created and each invalid one gets its own error"""
+        items = [
+            {'movie': self.movies[1].id, 'rating': 5, 'content': 'Great'},
+            {'movie': self.movies[2].id, 'rating': 9, 'content': 'Too high'},
+            {'movie': 999999, 'rating': 4, 'content': 'No such movie'},
+            {'movie': self.movies[0].id, 'rating': 4, 'content': 'Reviewed before'},
+            {'movie': self.movies[1].id, 'rating': 2, 'content': 'Twice in one batch'},
+            {'movie': self.movies[3].id, 'rating': 1, 'content': 'Awful'},
+        ]
+        response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 4))
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['created', 'error', 'error', 'error', 'error', 'created'])
+        self.assertIn('rating', response.data['results'][1]['errors'])
+        self.assertEqual(Review.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_create_updates_aggregates(self):
+        """Test that movie counters and author stats match what per-row creates would give"""
+        items = [{'movie': movie.id, 'rating': 1 + i % 5, 'content': 'Feed'} for i, movie in enumerate(self.movies[1:])]
+        self.client.post(self.url, items, format='json')
+
+        from django.db.models import Count, Sum
+        from accounts import stats
+
+        recounted = {
+            row['movie']: (row['n'], row['s'])
+            for row in Review.objects.values('movie').annotate(n=Count('id'), s=Sum('rating'))
+        }
+        for movie in Movie.objects.all():
+            self.assertEqual((movie.rating_count, movie.rating_sum), recounted.get(movie.id, (0, 0)))
+            self.assertIsNotNone(movie.weighted_rating)
+        maintained = User.objects.get(pk=self.user.pk).stats
+        stats.refresh(user_ids=[self.user.pk])
+        refreshed = User.objects.get(pk=self.user.pk).stats
+        self.assertEqual((maintained.review_count, maintained.rating_sum), (refreshed.review_count, refreshed.rating_sum))
+        self.assertEqual(maintained.review_count, 60)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test that the batch is validated and written with a fixed number of queries"""
+        items = [{'movie': movie.id, 'rating': 4, 'content': 'Feed'} for movie in self.movies[1:]]
+        # auth user, movies, duplicates, savepoint x2, insert, movie aggregates, stats, similarity
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.data['created'], 59)
+
+    def test_bulk_create_rejects_non_list(self):
+        """Test that the body must be a non-empty list"""
+        response = self.client.post(self.url, {'movie': self.movies[1].id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_requires_authentication(self):
+        """Test that bulk creation requires authentication"""
+        self.client.credentials()
+        response = self.client.post(self.url, [], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ReviewSearchTestCase(APITestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(REVIEW_SEARCH_DIR=tmpdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.url = reverse('review-search')
+        self.users = [User.objects.create_user(username=f'critic{i}', email=f'critic{i}@example.com',
+                                               password='testpass123') for i in range(4)]
+        self.movie = Movie.objects.create(title='Interstellar')
+        self.other = Movie.objects.create(title='Arrival')
+        self.reviews = [
+            Review.objects.create(user=self.users[0], movie=self.movie, rating=5,
+                                  content='The soundtrack! Such a soundtrack, the organ soundtrack stays with you.'),
+            Review.objects.create(user=self.users[1], movie=self.movie, rating=3,
+                                  content='Long, but the soundtrack carries the slower scenes.'),
+            Review.objects.create(user=self.users[2], movie=self.other, rating=5,
+                                  content='A quiet film about language; the soundtrack is haunting.'),
+            Review.objects.create(user=self.users[3], movie=self.other, rating=2,
+                                  content='Too slow for me.'),
+        ]
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [review['id'] for review in response.data['results']]
+
+    def test_search_ranks_by_bm25_and_filters(self):
+        """Test that matches are ranked by term frequency and can be filtered by movie and rating"""
+        from reviews import fulltext
+
+        fulltext.build()
+        first, second, third, _ = self.reviews
+        response = self.client.get(self.url, {'q': 'Soundtrack'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([review['id'] for review in response.data['results']], [first.id, second.id, third.id])
+        self.assertGreater(response.data['results'][0]['score'], response.data['results'][1]['score'])
+        self.assertEqual(self.ids(q='soundtrack', movie=self.other.id), [third.id])
+        self.assertEqual(self.ids(q='soundtrack slow', rating=3), [second.id])
+        self.assertEqual(self.ids(q='soundtrack', limit=1, offset=1), [second.id])
+        self.assertEqual(self.ids(q='the'), [])
+
+    def test_small_memory_budget_gives_same_index(self):
+        """Test that a build spilled into many runs answers exactly like a single-run build"""
+        from reviews import fulltext
+
+        Review.objects.bulk_create([
+            Review(user=self.users[i % 4], movie=Movie.objects.create(title=f'Filler {i}'), rating=1 + i % 5,
+                   content=f'filler words number {i} soundtrack {"slow " * (i % 3)}')
+            for i in range(40)
+        ])
+        queries = ['soundtrack', 'slow filler', 'number 7', 'organ language']
+        fulltext.build()
+        expected = [fulltext.current_index().search(q, limit=100) for q in queries]
+        meta = fulltext.build(memory_bytes=400, chunk_size=7)
+        self.assertGreater(meta['runs'], 1)
+        self.assertEqual([fulltext.current_index().search(q, limit=100) for q in queries], expected)
+
+    def test_common_term_is_merged_within_the_memory_budget(self):
+        """Test that a term in every review is merged in bounded reads into the same index files"""
+        from reviews import fulltext
+
+        Review.objects.bulk_create([
+            Review(user=self.users[i % 4], movie=Movie.objects.create(title=f'Score {i}'), rating=1 + i % 5,
+                   content=f'soundtrack review {i} word{i % 7}')
+            for i in range(120)
+        ])
+        fulltext.build()
+        directory = fulltext.current_index().directory
+        expected = {name: open(os.path.join(directory, name), 'rb').read() for name in fulltext.FILES}
+        memory_bytes = 2000
+        with mock.patch.object(fulltext, '_read', wraps=fulltext._read) as read:
+            meta = fulltext.build(memory_bytes=memory_bytes, chunk_size=7)
+        self.assertGreater(meta['runs'], 1)
+        self.assertLessEqual(max(hi - lo for (_, _, lo, hi), _ in read.call_args_list), memory_bytes // (4 * fulltext.POSTING_BYTES))
+        directory = fulltext.current_index().directory
+        for name, data in expected.items():
+            with open(os.path.join(directory, name), 'rb') as fh:
+                self.assertEqual(fh.read(), data, name)
+
+    def test_writes_after_build_are_searchable(self):
+        """Test that created, edited and deleted reviews are reflected through the journal"""
+        from reviews import fulltext
+
+        fulltext.build()
+        first, second, third, fourth = self.reviews
+        with self.captureOnCommitCallbacks(execute=True):
+            new = Review.objects.create(user=self.users[3], movie=self.movie, rating=4,
+                                        content='Docking scene and soundtrack, unforgettable.')
+            fourth.content = 'Slow, yet the docking sequence is unforgettable.'
+            fourth.save()
+            first.delete()
+        self.assertEqual(set(self.ids(q='unforgettable docking')), {new.id, fourth.id})
+        self.assertEqual(set(self.ids(q='soundtrack')), {second.id, third.id, new.id})
+        self.assertEqual(set(self.ids(q='soundtrack', movie=self.movie.id)), {second.id, new.id})
+        self.assertEqual(self.ids(q='organ'), [])
+
+        fulltext.build()
+        self.assertEqual(set(self.ids(q='soundtrack')), {second.id, third.id, new.id})
+
+    def test_missing_index_and_query(self):
+        """Test that search needs a query and reports a missing index"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'q': 'soundtrack'}).status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_varint_round_trip(self):
+        """Test that posting gaps survive varint encoding"""
+        import numpy as np
+        from reviews import fulltext
+
+        values = np.array([0, 1, 127, 128, 300, 2**32, 2**63 - 1], dtype=np.uint64)
+        data, sizes = fulltext.encode_varints(values)
+        self.assertEqual(sizes.tolist(), [1, 1, 1, 2, 2, 5, 9])
+        self.assertEqual(fulltext.decode_varints(data).tolist(), values.tolist())
+
+
+class ReviewBatchTestCase(APITestCase):
+    def setUp(self):
+        self.url = reverse('review-batch')
+        self.users = [User.objects.create_user(username=f'critic{i}', email=f'critic{i}@example.com',
+                                               password='testpass123') for i in range(3)]
+        self.reviews = [
+            Review.objects.create(user=user, movie=Movie.objects.create(title=f'Movie {i}'), rating=4, content='Good.')
+            for i, user in enumerate(self.users)
+        ]
+        first, second, _ = self.reviews
+        Reaction.objects.create(user=self.users[1], review=first, is_like=True)
+        Reaction.objects.create(user=self.users[2], review=first, is_like=False)
+        Reaction.objects.create(user=self.users[2], review=second, is_like=True)
+
+    def test_batch_resolves_reactions_in_bulk(self):
+        """Test that batch returns reviews in request order with counts and the viewer's reactions"""
+        first, second, third = self.reviews
+        self.client.force_authenticate(self.users[2])
+        ids = f'{third.id},{first.id},0,{second.id}'
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'ids': ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([review['id'] for review in results], [third.id, first.id, second.id])
+        self.assertEqual([(review['likes_count'], review['dislikes_count']) for review in results],
+                         [(0, 0), (1, 1), (1, 0)])
+        self.assertEqual([review['user_reaction'] for review in results], [None, 'dislike', 'like'])
+        self.assertEqual(response.data['missing'], [0])
+        self.assertEqual(results[1], self.client.get(reverse('review-detail', args=[first.id])).data)
+
+    def test_batch_requires_ids(self):
+        """Test that batch refuses a missing or non-integer id list"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReactionShardingTestCase(APITestCase):
+    databases = {'default', 'reactions_0', 'reactions_1'}
+
+    def setUp(self):
+        override = override_settings(REACTION_SHARDS=['reactions_0', 'reactions_1'])
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', email='fan@example.com', password='testpass123')
+        self.reviews = [
+            Review.objects.create(user=self.author, movie=Movie.objects.create(title=f'Movie {i}'), rating=4,
+                                  content='Good.')
+            for i in range(4)
+        ]
+
+    def react(self, review, action='like', user=None):
+        self.client.force_authenticate(user or self.fan)
+        return self.client.post(reverse(f'review-{action}', args=[review.id]))
+
+    def test_reactions_live_on_the_review_shard(self):
+        """Test that like/dislike write to the review's shard and update the stored counts"""
+        from . import shards
+
+        for review in self.reviews:
+            self.assertEqual(self.react(review).status_code, status.HTTP_201_CREATED)
+        self.react(self.reviews[0], 'dislike', self.author)
+        for review in self.reviews:
+            alias = shards.alias_for(review.id)
+            self.assertTrue(Reaction.objects.using(alias).filter(review_id=review.id, user=self.fan).exists())
+        self.assertEqual(Reaction.objects.using('default').count(), 0)
+        self.assertEqual({shards.alias_for(review.id) for review in self.reviews}, {'reactions_0', 'reactions_1'})
+
+        review = Review.objects.get(pk=self.reviews[0].pk)
+        self.assertEqual((review.likes_count, review.dislikes_count), (1, 1))
+        self.author.stats.refresh_from_db()
+        self.assertEqual((self.author.stats.likes_received, self.author.stats.dislikes_received), (4, 1))
+        response = self.client.get(reverse('review-reactions', args=[review.id]))
+        self.assertEqual(([user['username'] for user in response.data['likers']],
+                          [user['username'] for user in response.data['dislikers']]), (['fan'], ['author']))
+
+    def test_unrouted_reaction_query_is_refused(self):
+        """Test that reactions cannot be read without saying which shard"""
+        from django.core.exceptions import ImproperlyConfigured
+
+        with self.assertRaises(ImproperlyConfigured):
+            Reaction.objects.count()
+
+    def test_my_reactions_merge_shards_newest_first(self):
+        """Test that a user's reactions from every shard are listed newest first"""
+        for review in self.reviews:
+            self.react(review)
+        self.client.force_authenticate(self.fan)
+        response = self.client.get(reverse('me-reactions'))
+        self.assertEqual([item['review']['id'] for item in response.data['results']],
+                         [review.id for review in reversed(self.reviews)])
+
+    def test_deleting_review_deletes_its_reactions(self):
+        """Test that a review's reactions are removed from its shard when it is deleted"""
+        from . import shards
+
+        review = self.reviews[1]
+        review_id = review.id
+        self.react(review)
+        review.delete()
+        self.assertFalse(shards.for_review(review_id).exists())
+        self.author.stats.refresh_from_db()
+        self.fan.stats.refresh_from_db()
+        self.assertEqual((self.author.stats.likes_received, self.fan.stats.reactions_given), (0, 0))
+
+    def test_reshard_moves_reactions_and_keeps_timestamps(self):
+        """Test that reshard_reactions moves rows from the old layout to their shards"""
+        from . import shards
+
+        created = {}
+        with override_settings(REACTION_SHARDS=[]):
+            for review in self.reviews:
+                reaction = Reaction.objects.create(user=self.fan, review=review, is_like=True)
+                created[review.id] = reaction.created_at
+        out = StringIO()
+        call_command('reshard_reactions', '--from', 'default', '--batch-size', '3', stdout=out)
+        self.assertIn('Moved 4 reactions', out.getvalue())
+        self.assertEqual(Reaction.objects.using('default').count(), 0)
+        for review in self.reviews:
+            self.assertEqual(shards.for_review(review.id).get().created_at, created[review.id])
+        call_command('reshard_reactions', '--from', 'default', stdout=StringIO())
+        self.assertEqual(sum(Reaction.objects.using(alias).count() for alias in shards.aliases()), 4)
+
+    def test_reshard_moves_archived_reactions(self):
+        """Test that reshard_reactions moves archived reactions and rebuilds the per-user rows"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import archive
+
+        with override_settings(REACTION_SHARDS=[]):
+            for review in self.reviews:
+                Reaction.objects.create(user=self.fan, review=review, is_like=review.id % 2 == 0)
+            self.assertEqual(archive.archive(timezone.now() + timedelta(seconds=1)), 4)
+        call_command('reshard_reactions', '--from', 'default', stdout=StringIO())
+        expected = {review.id: review.id % 2 == 0 for review in self.reviews}
+        self.assertEqual(archive.viewer_reactions(self.fan.pk, list(expected)), expected)
+        self.assertEqual(archive.given([self.fan.pk]), {self.fan.pk: 4})
+        with override_settings(REACTION_SHARDS=[]):
+            self.assertEqual(archive.given(), {})
+
+    def test_refresh_repairs_counters(self):
+        """Test that counters.refresh recounts reviews from every shard"""
+        from . import counters
+
+        for review in self.reviews:
+            self.react(review)
+        Review.objects.update(likes_count=7)
+        self.assertEqual(counters.refresh(), 4)
+        self.assertEqual(set(Review.objects.values_list('likes_count', flat=True)), {1})
+
+
+class ReactionArchiveTestCase(APITestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        self.fans = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com',
+                                              password='testpass123') for i in range(3)]
+        self.reviews = [
+            Review.objects.create(user=self.author, movie=Movie.objects.create(title=f'Movie {i}'), rating=4,
+                                  content='Good.')
+            for i in range(2)
+        ]
+        first, second = self.reviews
+        Reaction.objects.create(user=self.fans[0], review=first, is_like=True)
+        Reaction.objects.create(user=self.fans[1], review=first, is_like=False)
+        Reaction.objects.create(user=self.fans[0], review=second, is_like=True)
+        self.old = timezone.now() - timedelta(days=settings.REACTION_ARCHIVE_DAYS + 1)
+        Reaction.objects.update(created_at=self.old)
+        # Newer than the cutoff: stays a row.
+        Reaction.objects.create(user=self.fans[2], review=first, is_like=True)
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_reactions', stdout=out)
+        return out.getvalue()
+
+    def counts(self, review):
+        review = Review.objects.get(pk=review.pk)
+        return review.likes_count, review.dislikes_count
+
+    def test_archive_packs_old_reactions(self):
+        """Test that old reactions move into per-review and per-user rows and keep their counts"""
+        from .models import ReviewReactionArchive, UserReactionArchive
+        from . import archive
+
+        self.assertIn('Archived 3 reactions', self.archive())
+        self.assertEqual(list(Reaction.objects.values_list('user__username', flat=True)), ['fan2'])
+        first, second = self.reviews
+        row = ReviewReactionArchive.objects.get(review=first)
+        self.assertEqual((row.likes, row.dislikes), (1, 1))
+        self.assertEqual((list(archive.unpack(row.likers)), list(archive.unpack(row.dislikers))),
+                         ([self.fans[0].pk], [self.fans[1].pk]))
+        self.assertEqual(list(archive.unpack(UserReactionArchive.objects.get(user=self.fans[0]).liked)),
+                         [first.pk, second.pk])
+        self.assertEqual((self.counts(first), self.counts(second)), ((2, 1), (1, 0)))
+        self.assertIn('Archived 0 reactions', self.archive())
+
+    def test_archive_rejects_days_inside_the_trending_window(self):
+        """Test that --days below the trending window is refused and nothing is archived"""
+        with self.assertRaisesMessage(CommandError, '--days must be at least 7'):
+            call_command('archive_reactions', days=3, stdout=StringIO())
+        self.assertEqual(Reaction.objects.count(), 4)
+        self.assertIn('Archived 3 reactions', self.archive())
+
+    def test_packed_ids_are_little_endian_64_bit(self):
+        """Test that archived ids use a fixed 8-byte little-endian layout that fits ids beyond 32 bits"""
+        import struct
+        from . import archive
+
+        blob = archive.pack([2 ** 40 + 7, 3])
+        self.assertEqual(blob, struct.pack('<2Q', 3, 2 ** 40 + 7))
+        self.assertEqual(list(archive.unpack(blob)), [3, 2 ** 40 + 7])
+
+    def test_reads_combine_rows_and_archive(self):
+        """Test that the viewer's reaction and the reactions list include archived reactions"""
+        self.archive()
+        first, second = self.reviews
+        self.client.force_authenticate(self.fans[0])
+        response = self.client.get(reverse('review-batch'), {'ids': f'{first.id},{second.id}'})
+        self.assertEqual([review['user_reaction'] for review in response.data['results']], ['like', 'like'])
+        self.assertEqual([(review['likes_count'], review['dislikes_count']) for review in response.data['results']],
+                         [(2, 1), (1, 0)])
+        response = self.client.get(reverse('review-reactions', args=[first.id]))
+        self.assertEqual([(user['username'], user['reacted_at'] is None) for user in response.data['likers']],
+                         [('fan2', False), ('fan0', True)])
+        self.assertEqual([user['username'] for user in response.data['dislikers']], ['fan1'])
+
+    def test_detail_includes_archived_reaction(self):
+        """Test that the review detail shows the viewer's archived reaction like the list views do"""
+        self.archive()
+        first, second = self.reviews
+        self.client.force_authenticate(self.fans[1])
+        self.assertEqual(self.client.get(reverse('review-detail', args=[first.id])).data['user_reaction'], 'dislike')
+        self.assertIsNone(self.client.get(reverse('review-detail', args=[second.id])).data['user_reaction'])
+
+    def test_toggles_restore_archived_reactions(self):
+        """Test that liking again removes an archived like and disliking flips an archived like"""
+        from . import archive
+
+        self.archive()
+        first, second = self.reviews
+        self.client.force_authenticate(self.fans[0])
+        response = self.client.post(reverse('review-like', args=[first.id]))
+        self.assertEqual(response.data['reaction'], None)
+        self.assertEqual(self.counts(first), (1, 1))
+        response = self.client.post(reverse('review-dislike', args=[second.id]))
+        self.assertEqual(response.data['reaction'], 'dislike')
+        self.assertEqual(self.counts(second), (0, 1))
+        # The flip counts as a new reaction, so it is dated now rather than when it was archived.
+        self.assertGreater(Reaction.objects.get(review=second).created_at, self.old)
+        self.assertEqual(archive.viewer_reactions(self.fans[0].pk, [first.id, second.id]), {})
+        self.author.stats.refresh_from_db()
+        self.assertEqual((self.author.stats.likes_received, self.author.stats.dislikes_received), (1, 2))
+
+    def test_refresh_counts_archived_reactions(self):
+        """Test that counter and stats recounts include archived reactions"""
+        from accounts import stats
+        from . import counters
+
+        self.archive()
+        self.assertEqual(counters.refresh(), 0)
+        stats.refresh()
+        self.author.stats.refresh_from_db()
+        self.fans[0].stats.refresh_from_db()
+        self.assertEqual((self.author.stats.likes_received, self.author.stats.dislikes_received), (3, 1))
+        self.assertEqual(self.fans[0].stats.reactions_given, 2)
+
+    def test_deletes_remove_archived_reactions(self):
+        """Test that deleting a review or a user deletes their archived reactions and settles the counts"""
+        from .models import ReviewReactionArchive, UserReactionArchive
+
+        self.archive()
+        first, second = self.reviews
+        first.delete()
+        self.assertFalse(ReviewReactionArchive.objects.filter(review_id=first.pk).exists())
+        self.assertFalse(UserReactionArchive.objects.filter(user=self.fans[1]).exists())
+        self.fans[1].stats.refresh_from_db()
+        self.assertEqual(self.fans[1].stats.reactions_given, 0)
+        self.fans[0].delete()
+        self.assertFalse(ReviewReactionArchive.objects.exists())
+        self.assertFalse(UserReactionArchive.objects.exists())
+        self.assertEqual(self.counts(second), (0, 0))
+        self.author.stats.refresh_from_db()
+        self.assertEqual((self.author.stats.likes_received, self.author.stats.dislikes_received), (0, 0))
+
+    def test_recommendations_read_archived_reactions(self):
+        """Test that the recommender's training data is the same before and after archiving"""
+        from accounts import recommendations
+
+        Review.objects.create(user=self.fans[2], movie=Movie.objects.create(title='Other'), rating=3, content='Ok.')
+        before = recommendations.load_interactions()
+        self.archive()
+        after = recommendations.load_interactions()
+        key = lambda arrays: sorted(zip(*(array.tolist() for array in arrays)))
+        self.assertEqual(key(after), key(before))
+        self.assertEqual(len(before[0]), 7)
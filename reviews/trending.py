@@ -0,0 +1,140 @@
+"""
+Time-decayed trending reviews from hourly reaction buckets.
+
+Like/dislike toggles add their net effect to the review's bucket for the
+current hour. Withdrawing or changing a reaction takes it back from the bucket
+it was counted in (``withdraw``), not from the current hour, so removing an old
+like cannot push a review below zero; a reaction that has left the window is
+no longer counted and needs nothing taken back. A review's trending score is
+the sum over buckets in the last ``WINDOW_HOURS`` of
+``(likes - dislikes) * 0.5 ** (age_hours / HALF_LIFE_HOURS)``, so ranking only
+touches the bounded set of recent buckets. ``compact`` folds hourly buckets
+older than a day into one bucket per day and drops buckets that left the
+window.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum, Value
+from django.db.models.functions import Mod, Power, TruncHour
+from django.utils import timezone
+
+from . import shards
+from .models import Reaction, ReactionBucket, Review
+
+WINDOW_HOURS = 7 * 24
+HALF_LIFE_HOURS = 24
+COMPACT_AFTER_HOURS = 24
+
+
+def current_hour(now=None):
+    return int((now or timezone.now()).timestamp() // 3600)
+
+
+def _add(review_id, movie_id, hour, likes, dislikes):
+    buckets = ReactionBucket.objects.filter(review_id=review_id, hour=hour)
+    if buckets.update(likes=F("likes") + likes, dislikes=F("dislikes") + dislikes):
+        return
+    try:
+        with transaction.atomic():
+            ReactionBucket.objects.create(review_id=review_id, movie_id=movie_id, hour=hour, likes=likes, dislikes=dislikes)
+    except IntegrityError:
+        # Another request created the bucket between our UPDATE and INSERT.
+        buckets.update(likes=F("likes") + likes, dislikes=F("dislikes") + dislikes)
+
+
+def record(review, likes=0, dislikes=0, now=None):
+    """Add a like/dislike delta (may be negative when a reaction is withdrawn)."""
+    if likes or dislikes:
+        _add(review.pk, review.movie_id, current_hour(now), likes, dislikes)
+
+
+def withdraw(review, reacted_at, likes=0, dislikes=0, now=None):
+    """
+    Take a withdrawn reaction (negative deltas) back from the bucket it was
+    recorded in: the hour of ``reacted_at``, or its day once ``compact`` merged it.
+    A reaction with no bucket was never counted, so there is nothing to take back.
+    """
+    hour = current_hour(reacted_at)
+    if not (likes or dislikes) or hour <= current_hour(now) - WINDOW_HOURS:
+        return
+    slots = [hour]
+    if hour < current_hour(now) - COMPACT_AFTER_HOURS:
+        slots.append(hour - hour % 24)
+    for slot in slots:
+        if ReactionBucket.objects.filter(review_id=review.pk, hour=slot).update(
+            likes=F("likes") + likes, dislikes=F("dislikes") + dislikes
+        ):
+            return
+
+
+def scores(movie_id=None, now=None):
+    """``values()`` queryset of ``{"review_id", "score"}`` ordered by descending score."""
+    hour = current_hour(now)
+    buckets = ReactionBucket.objects.filter(hour__gt=hour - WINDOW_HOURS)
+    if movie_id is not None:
+        buckets = buckets.filter(movie_id=movie_id)
+    decay = Power(Value(0.5), ExpressionWrapper((Value(hour) - F("hour")) / Value(float(HALF_LIFE_HOURS)),
+                                                output_field=FloatField()))
+    score = Sum(ExpressionWrapper((F("likes") - F("dislikes")) * decay, output_field=FloatField()))
+    return (
+        buckets.order_by()
+        .values("review_id")
+        .annotate(score=score)
+        .filter(score__gt=0)
+        .order_by("-score", "-review_id")
+    )
+
+
+def compact(now=None):
+    """Merge old hourly buckets into daily ones and delete expired buckets."""
+    hour = current_hour(now)
+    with transaction.atomic():
+        expired, _ = ReactionBucket.objects.filter(hour__lte=hour - WINDOW_HOURS).delete()
+        hourly = (
+            ReactionBucket.objects.filter(hour__lt=hour - COMPACT_AFTER_HOURS)
+            .annotate(day=F("hour") - Mod(F("hour"), 24))
+            .exclude(hour=F("day"))
+        )
+        groups = list(
+            hourly.order_by().values("review_id", "movie_id", "day").annotate(likes=Sum("likes"), dislikes=Sum("dislikes"))
+        )
+        merged, _ = ReactionBucket.objects.filter(pk__in=hourly.values("pk")).delete()
+        for group in groups:
+            _add(group["review_id"], group["movie_id"], group["day"], group["likes"], group["dislikes"])
+    return expired, merged
+
+
+def rebuild(now=None):
+    """Recreate the buckets inside the window from the reaction table."""
+    hour = current_hour(now)
+    since = (now or timezone.now()) - timedelta(hours=WINDOW_HOURS)
+    totals = {}
+    # Reactions may be on other databases than reviews (reviews.shards): count per shard, then look up movies.
+    for reactions in shards.scatter(Reaction.objects.filter(created_at__gt=since)):
+        rows = (
+            reactions.annotate(slot=TruncHour("created_at"))
+            .order_by()
+            .values("review_id", "slot", "is_like")
+            .annotate(n=Count("id"))
+        )
+        for row in rows.iterator():
+            key = (row["review_id"], min(current_hour(row["slot"]), hour))
+            likes, dislikes = totals.get(key, (0, 0))
+            totals[key] = (likes + row["n"], dislikes) if row["is_like"] else (likes, dislikes + row["n"])
+    review_ids = list({review_id for review_id, _ in totals})
+    movies = {}
+    for start in range(0, len(review_ids), shards.CHUNK_SIZE):
+        chunk = review_ids[start:start + shards.CHUNK_SIZE]
+        movies.update(Review.objects.filter(pk__in=chunk).values_list("pk", "movie_id"))
+    with transaction.atomic():
+        ReactionBucket.objects.all().delete()
+        ReactionBucket.objects.bulk_create(
+            [
+                ReactionBucket(review_id=r, movie_id=movies[r], hour=h, likes=l, dislikes=d)
+                for (r, h), (l, d) in totals.items()
+                if h > hour - WINDOW_HOURS and r in movies
+            ],
+            batch_size=2000,
+        )
+    return ReactionBucket.objects.count()
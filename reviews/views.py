@@ -1,37 +1,46 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Count, Q
-from .models import Review, Reaction
+from accounts.models import User
+from .models import Review
 from .serializers import ReviewSerializer
 from .permissions import IsOwnerOrReadOnly
+from core import batch as batch_fetch
+from . import archive, bulk, history, shards, trending
 
 class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.select_related("user", "movie").annotate(
-        likes_count=Count("reactions", filter=Q(reactions__is_like=True)),
-        dislikes_count=Count("reactions", filter=Q(reactions__is_like=False))
-    )
+    queryset = Review.objects.select_related("user", "movie")
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    throttle_scope = None  # set per action; `list` falls back to the "list" scope
 
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    # filter by movie id and rating; search by movie title; order by rating/date
-    filterset_fields = ["movie", "rating"]
+    # filter by movie id, author and rating; search by movie title; order by rating/date
+    filterset_fields = ["movie", "user", "rating"]
     search_fields = ["movie__title"]
     ordering_fields = ["rating", "created_at", "likes_count", "dislikes_count"]
 
     def get_queryset(self):
-        return Review.objects.select_related("user", "movie").annotate(
-            likes_count=Count("reactions", filter=Q(reactions__is_like=True)),
-            dislikes_count=Count("reactions", filter=Q(reactions__is_like=False))
-        )
+        # Like/dislike counts are stored on the review; see reviews.counters.
+        return Review.objects.select_related("user", "movie")
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    @action(detail=False, methods=["get"], url_path="by-movie")
+    def list(self, request, *args, **kwargs):
+        return self._paginated(self.filter_queryset(self.get_queryset()))
+
+    def _paginated(self, queryset):
+        # The viewer's reactions are loaded for the whole page at once, not one query per review.
+        page = self.paginate_queryset(queryset)
+        reviews = history.attach_reactions(queryset if page is None else page, self.request.user)
+        data = self.get_serializer(reviews, many=True).data
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    @action(detail=False, methods=["get"], url_path="by-movie", throttle_scope="list")
     def by_movie(self, request):
         """
         /api/reviews/by-movie?title=Inception
@@ -39,15 +48,73 @@ class ReviewViewSet(viewsets.ModelViewSet):
         title = request.query_params.get("title")
         if not title:
             return Response({"detail": "Provide ?title=<movie title>."}, status=400)
-        qs = self.get_queryset().filter(movie__title__iexact=title)
-        page = self.paginate_queryset(qs)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        return self._paginated(self.get_queryset().filter(movie__title__iexact=title))
 
-    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=False, methods=["get"], throttle_scope="list")
+    def search(self, request):
+        """
+        GET /api/reviews/search/?q=great+soundtrack&movie=3&rating=5 - Reviews whose
+        content matches `q`, ranked by BM25 (`limit` up to 100, `offset`).
+        """
+        from . import fulltext  # NumPy is only loaded once this is used
+
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"detail": "Provide ?q=<search terms>."}, status=400)
+        try:
+            filters = {name: int(request.query_params[name])
+                       for name in ("movie", "rating") if request.query_params.get(name)}
+            limit = min(max(int(request.query_params.get("limit", 20)), 0), 100)
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+        except ValueError:
+            return Response({"detail": "movie, rating, limit and offset must be integers."}, status=400)
+        index = fulltext.current_index()
+        if index is None:
+            return Response({"detail": "The review search index has not been built."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        total, hits = index.search(query, limit=limit, offset=offset, **filters)
+        reviews = self.get_queryset().in_bulk([review_id for review_id, _ in hits])
+        history.attach_reactions(reviews.values(), request.user)
+        results = []
+        for review_id, score in hits:
+            review = reviews.get(review_id)
+            if review is not None:
+                results.append({**self.get_serializer(review).data, "score": round(score, 4)})
+        return Response({"query": query, "count": total, "results": results})
+
+    @action(detail=False, methods=["get"], throttle_scope="list")
+    def batch(self, request):
+        """
+        GET /api/reviews/batch/?ids=3,1,2 - Several reviews in the order asked for, with
+        reaction counts and the viewer's own reaction resolved in bulk; ids that do not
+        exist are listed under `missing`.
+        """
+        ids = batch_fetch.requested_ids(request)
+        reviews = Review.objects.select_related("user", "movie").in_bulk(ids)
+        history.attach_reactions(reviews.values(), request.user)
+        return batch_fetch.ordered_response(ids, reviews, lambda found: self.get_serializer(found, many=True).data)
+
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def bulk(self, request):
+        """
+        POST /api/reviews/bulk/ - Create up to 500 reviews as the current user from a
+        JSON list of {"movie", "rating", "content"}. Valid items are created even when
+        others fail; each gets a result with its index.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Provide a non-empty JSON list of reviews."}, status=400)
+        if len(items) > bulk.MAX_BATCH:
+            return Response({"detail": f"At most {bulk.MAX_BATCH} reviews per request."}, status=400)
+        results = bulk.create_reviews(request.user, items)
+        created = sum(1 for result in results if result["status"] == "created")
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated], throttle_scope="review-like")
     def like(self, request, pk=None):
         """
         POST /api/reviews/{id}/like/ - Like the review
@@ -55,25 +122,32 @@ class ReviewViewSet(viewsets.ModelViewSet):
         review = self.get_object()
         user = request.user
         
-        reaction, created = Reaction.objects.get_or_create(user=user, review=review)
+        # An archived reaction becomes a row again, so it can be toggled like any other.
+        archive.restore(review.pk, user.pk)
+        reaction, created = shards.for_review(review.pk).get_or_create(user=user, review=review,
+                                                                       defaults={"is_like": True})
         
         if not created:
             if reaction.is_like:
                 # Already liked, remove the reaction
                 reaction.delete()
+                trending.withdraw(review, reaction.created_at, likes=-1)
                 return Response({"reaction": None, "message": "Like removed"}, status=status.HTTP_200_OK)
             else:
                 # Currently disliked, change to like
+                # Counted from now on: the dislike is taken back from the hour it was made in.
+                trending.withdraw(review, reaction.created_at, dislikes=-1)
                 reaction.is_like = True
+                reaction.created_at = timezone.now()
                 reaction.save()
+                trending.record(review, likes=1)
                 return Response({"reaction": "like", "message": "Changed to like"}, status=status.HTTP_200_OK)
         else:
-            # New reaction, set as like
-            reaction.is_like = True
-            reaction.save()
+            # New reaction, created as a like
+            trending.record(review, likes=1)
             return Response({"reaction": "like", "message": "Like added"}, status=status.HTTP_201_CREATED)
 
-    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated], throttle_scope="review-dislike")
     def dislike(self, request, pk=None):
         """
         POST /api/reviews/{id}/dislike/ - Dislike the review
@@ -81,22 +155,27 @@ class ReviewViewSet(viewsets.ModelViewSet):
         review = self.get_object()
         user = request.user
         
-        reaction, created = Reaction.objects.get_or_create(user=user, review=review)
+        archive.restore(review.pk, user.pk)
+        reaction, created = shards.for_review(review.pk).get_or_create(user=user, review=review,
+                                                                       defaults={"is_like": False})
         
         if not created:
             if not reaction.is_like:
                 # Already disliked, remove the reaction
                 reaction.delete()
+                trending.withdraw(review, reaction.created_at, dislikes=-1)
                 return Response({"reaction": None, "message": "Dislike removed"}, status=status.HTTP_200_OK)
             else:
                 # Currently liked, change to dislike
+                trending.withdraw(review, reaction.created_at, likes=-1)
                 reaction.is_like = False
+                reaction.created_at = timezone.now()
                 reaction.save()
+                trending.record(review, dislikes=1)
                 return Response({"reaction": "dislike", "message": "Changed to dislike"}, status=status.HTTP_200_OK)
         else:
-            # New reaction, set as dislike
-            reaction.is_like = False
-            reaction.save()
+            # New reaction, created as a dislike
+            trending.record(review, dislikes=1)
             return Response({"reaction": "dislike", "message": "Dislike added"}, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["get"], permission_classes=[permissions.IsAuthenticatedOrReadOnly])
@@ -105,12 +184,22 @@ class ReviewViewSet(viewsets.ModelViewSet):
         GET /api/reviews/{id}/reactions/ - List users who reacted to this review
         """
         review = self.get_object()
-        reactions = review.reactions.select_related('user').all()
+        reactions = list(shards.for_review(review.pk))
+        # Archived reactions have no timestamp of their own; they are older than every row.
+        archived_likers, archived_dislikers = archive.reactions_on(review.pk)
+        # Users live in the default database, reactions possibly on a shard: no join.
+        users = User.objects.only("username").in_bulk(
+            [r.user_id for r in reactions] + archived_likers + archived_dislikers
+        )
         
-        likers = [{"id": r.user.id, "username": r.user.username, "reacted_at": r.created_at} 
-                 for r in reactions if r.is_like]
-        dislikers = [{"id": r.user.id, "username": r.user.username, "reacted_at": r.created_at} 
-                    for r in reactions if not r.is_like]
+        likers = [{"id": r.user_id, "username": users[r.user_id].username, "reacted_at": r.created_at} 
+                 for r in reactions if r.is_like and r.user_id in users]
+        likers += [{"id": pk, "username": users[pk].username, "reacted_at": None}
+                   for pk in archived_likers if pk in users]
+        dislikers = [{"id": r.user_id, "username": users[r.user_id].username, "reacted_at": r.created_at} 
+                    for r in reactions if not r.is_like and r.user_id in users]
+        dislikers += [{"id": pk, "username": users[pk].username, "reacted_at": None}
+                      for pk in archived_dislikers if pk in users]
         
         return Response({
             "review_id": review.id,
@@ -120,17 +209,35 @@ class ReviewViewSet(viewsets.ModelViewSet):
             "dislikers": dislikers
         })
 
-    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticatedOrReadOnly])
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticatedOrReadOnly], throttle_scope="list")
     def top_liked(self, request):
         """
         GET /api/reviews/top-liked/ - Get reviews ordered by likes count descending
         """
-        qs = self.get_queryset().order_by('-likes_count', '-created_at')
-        page = self.paginate_queryset(qs)
+        return self._paginated(self.get_queryset().order_by('-likes_count', '-created_at'))
+
+    @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticatedOrReadOnly], throttle_scope="list")
+    def trending(self, request):
+        """
+        GET /api/reviews/trending/?movie=<id> - Reviews ranked by recent, time-decayed
+        like activity (see reviews.trending), optionally for a single movie.
+        """
+        movie = request.query_params.get("movie")
+        if movie is not None and not movie.isdigit():
+            return Response({"detail": "movie must be an integer id."}, status=400)
+        ranked = trending.scores(movie_id=int(movie) if movie else None)
+        page = self.paginate_queryset(ranked)
+        rows = page if page is not None else list(ranked)
+        reviews = self.get_queryset().in_bulk([row["review_id"] for row in rows])
+        ordered = history.attach_reactions(
+            [reviews[row["review_id"]] for row in rows if row["review_id"] in reviews], request.user
+        )
+        data = self.get_serializer(ordered, many=True).data
+        scores = {row["review_id"]: row["score"] for row in rows}
+        for item in data:
+            item["trending_score"] = round(scores[item["id"]], 4)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+            return self.get_paginated_response(data)
+        return Response(data)
 
 # Create your views here.
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Task
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "key", "status", "attempts", "run_after", "created_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "key")
@@ -0,0 +1,77 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from tasks import queue
+
+
+def _thread_main(options, stop, counts):
+    try:
+        counts.append(queue.work(poll=options["poll"], lease=options["lease"], once=options["once"], stop=stop))
+    finally:
+        # Each thread has its own connection; nothing else will close it.
+        connection.close()
+
+
+def _process_main(options):
+    import django
+
+    django.setup()  # no-op when forked from an initialised parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent stops its children
+    return _run_threads(options)
+
+
+def _run_threads(options):
+    stop = threading.Event()
+    counts = []
+    threads = [threading.Thread(target=_thread_main, args=(options, stop, counts), daemon=True)
+               for _ in range(options["threads"])]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return sum(counts)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background tasks (snapshot rebuilds, stats and rating resyncs) with a pool of worker "
+        "threads, optionally in several processes. Tasks are claimed under a lease, retried with backoff "
+        "and kept as 'failed' once they run out of attempts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="Worker threads per process.")
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes.")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--lease", type=int, default=queue.LEASE,
+                            help="Seconds a claimed task is reserved before another worker may retry it.")
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due instead of polling.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["processes"] < 1:
+            raise CommandError("--threads and --processes must be at least 1.")
+        worker_options = {name: options[name] for name in ("threads", "poll", "lease", "once")}
+        if options["processes"] == 1:
+            processed = _run_threads(worker_options)
+        else:
+            # Forked children must not share the parent's database connections.
+            connections.close_all()
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+            with context.Pool(options["processes"]) as pool:
+                try:
+                    processed = sum(pool.map(_process_main, [worker_options] * options["processes"]))
+                except KeyboardInterrupt:
+                    pool.terminate()
+                    raise
+        self.stdout.write(self.style.SUCCESS(f"Ran {processed} tasks."))
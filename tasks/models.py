@@ -0,0 +1,41 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """
+    A deferred call to a function decorated with ``tasks.queue.task``, stored
+    until a worker (``manage.py run_workers``) claims it. At most one pending
+    task exists per ``(name, key)`` when ``key`` is set, so repeated work for
+    the same object coalesces.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["run_after"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "key"], condition=Q(status="pending") & ~Q(key=""), name="unique_pending_task_key"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.key}] ({self.status})" if self.key else f"{self.name} ({self.status})"
@@ -0,0 +1,143 @@
+"""
+Durable background tasks stored in the database.
+
+Functions decorated with ``task`` are enqueued by dotted name with a JSON
+payload of keyword arguments::
+
+    enqueue(refresh_user_stats, {"user_ids": [42]}, key="user:42")
+
+``enqueue`` inserts a row in the caller's transaction, so the task is
+committed (or rolled back) together with the write that caused it. Tasks
+sharing a ``key`` coalesce: while one is pending, enqueueing another is a
+no-op, and the pending one runs after everything it was asked to cover. A
+task already running does not absorb new requests, since it may have read
+the data before they were made.
+
+``manage.py run_workers`` claims due tasks with a conditional UPDATE and a
+lease (a worker that dies mid-task leaves it to be reclaimed once the lease
+expires), deletes them on success and retries failures with exponential
+backoff until ``max_attempts``, after which they stay as ``failed`` for
+inspection in the admin. With ``TASKS_EAGER`` tasks run inline in
+``enqueue`` instead.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+LEASE = 300
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 60 * 60
+
+
+class TaskError(Exception):
+    pass
+
+
+def task(func):
+    """Mark ``func`` as runnable by workers; its name is its dotted import path."""
+    func.is_task = True
+    func.task_name = f"{func.__module__}.{func.__qualname__}"
+    return func
+
+
+def resolve(name):
+    try:
+        func = import_string(name)
+    except ImportError as exc:
+        raise TaskError(f"Unknown task {name!r}.") from exc
+    if not getattr(func, "is_task", False):
+        raise TaskError(f"{name!r} is not a task.")
+    return func
+
+
+def enqueue(func, payload=None, key="", delay=0, max_attempts=3):
+    """Schedule ``func`` (a task or its name) with ``payload`` as keyword arguments."""
+    name = func if isinstance(func, str) else func.task_name
+    payload = payload or {}
+    if settings.TASKS_EAGER:
+        resolve(name)(**payload)
+        return None
+    task = Task(name=name, key=key, payload=payload, max_attempts=max_attempts,
+                run_after=timezone.now() + timedelta(seconds=delay))
+    # A conflict means a pending task with this key already exists and will cover this one.
+    Task.objects.bulk_create([task], ignore_conflicts=bool(key))
+    return task
+
+
+def claim(lease=LEASE):
+    """Lease the next due task to this worker, or return ``None`` if there is none."""
+    now = timezone.now()
+    due = Q(status=Task.PENDING, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    for pk in Task.objects.filter(due).order_by("run_after").values_list("pk", flat=True)[:20]:
+        # Another worker may have claimed it since the SELECT; only one UPDATE matches.
+        claimed = Task.objects.filter(due, pk=pk).update(
+            status=Task.RUNNING, locked_until=now + timedelta(seconds=lease), attempts=F("attempts") + 1
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def run(task):
+    """Run a claimed task, then delete it or schedule its retry. Returns whether it succeeded."""
+    try:
+        if task.attempts > task.max_attempts:
+            raise TaskError("Lease expired on the last attempt.")
+        resolve(task.name)(**task.payload)
+    except Exception:
+        logger.exception("Task %s failed (attempt %d of %d).", task, task.attempts, task.max_attempts)
+        _fail(task, traceback.format_exc())
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def _fail(task, error):
+    if task.attempts >= task.max_attempts:
+        Task.objects.filter(pk=task.pk).update(status=Task.FAILED, locked_until=None, last_error=error)
+        return
+    delay = min(RETRY_DELAY * 2 ** (task.attempts - 1), MAX_RETRY_DELAY)
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.PENDING, locked_until=None, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # A newer pending task with the same key was enqueued meanwhile and will redo this work.
+        Task.objects.filter(pk=task.pk).delete()
+
+
+def work(poll=1.0, lease=LEASE, once=False, stop=None):
+    """Claim and run tasks until ``stop`` is set (or, with ``once``, the queue is empty); returns the count run."""
+    stop = stop or threading.Event()
+    processed = 0
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            task = claim(lease)
+            if task is not None:
+                run(task)
+                processed += 1
+        except OperationalError as exc:
+            # SQLite allows one writer at a time; back off and try again (an unfinished task is
+            # retried once its lease expires).
+            logger.warning("Task queue unavailable: %s", exc)
+            stop.wait(poll)
+            continue
+        if task is None:
+            if once:
+                break
+            stop.wait(poll)
+    return processed
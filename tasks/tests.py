@@ -0,0 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import TaskError, claim, enqueue, run, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def explode():
+    raise RuntimeError("boom")
+
+
+def not_a_task():
+    pass
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_keyed_tasks_coalesce_while_pending(self):
+        """Test that a pending task absorbs later ones with the same key but not keyless or running ones"""
+        enqueue(record, {"value": 1}, key="movie:1")
+        enqueue(record, {"value": 2}, key="movie:1")
+        enqueue(record, {"value": 3}, key="movie:2")
+        enqueue(record, {"value": 4})
+        enqueue(record, {"value": 5})
+        self.assertEqual(Task.objects.count(), 4)
+
+        Task.objects.filter(key="movie:1").update(status=Task.RUNNING)
+        enqueue(record, {"value": 6}, key="movie:1")
+        self.assertEqual(Task.objects.filter(key="movie:1").count(), 2)
+
+    def test_claimed_task_runs_and_is_deleted(self):
+        """Test that claiming leases the oldest due task and a successful run removes it"""
+        enqueue(record, {"value": "later"}, delay=60)
+        enqueue(record, {"value": "now"})
+        claimed = claim()
+        self.assertEqual(claimed.payload, {"value": "now"})
+        self.assertEqual((claimed.status, claimed.attempts), (Task.RUNNING, 1))
+        self.assertIsNone(claim())
+
+        self.assertTrue(run(claimed))
+        self.assertEqual(calls, ["now"])
+        self.assertEqual(list(Task.objects.values_list("payload", flat=True)), [{"value": "later"}])
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        """Test that a failing task is rescheduled with growing delays and kept as failed after its last attempt"""
+        enqueue(explode, max_attempts=2)
+        self.assertFalse(run(claim()))
+        retried = Task.objects.get()
+        self.assertEqual(retried.status, Task.PENDING)
+        self.assertGreater(retried.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertIn("boom", retried.last_error)
+
+        Task.objects.update(run_after=timezone.now())
+        self.assertFalse(run(claim()))
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Task.FAILED, 2))
+        self.assertIsNone(claim())
+
+    def test_retry_yields_to_newer_pending_task(self):
+        """Test that a failed run is dropped when a task with the same key was enqueued while it ran"""
+        enqueue(explode, key="user:1")
+        claimed = claim()
+        enqueue(explode, key="user:1")
+        run(claimed)
+        self.assertEqual(list(Task.objects.values_list("status", "attempts")), [(Task.PENDING, 0)])
+
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a task whose worker died is claimed again once its lease expires"""
+        enqueue(record, {"value": 1})
+        first = claim(lease=60)
+        Task.objects.filter(pk=first.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim().attempts, 2)
+
+    def test_only_decorated_functions_run(self):
+        """Test that names which are not tasks are refused"""
+        enqueue("tasks.tests.not_a_task")
+        self.assertFalse(run(claim()))
+        self.assertIn(TaskError.__name__, Task.objects.get().last_error)
+
+    def test_eager_mode_runs_inline(self):
+        """Test that TASKS_EAGER runs the task in enqueue without storing it"""
+        with override_settings(TASKS_EAGER=True):
+            enqueue(record, {"value": "inline"}, key="x")
+        self.assertEqual(calls, ["inline"])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_EAGER=False)
+class RunWorkersTestCase(TransactionTestCase):
+    def setUp(self):
+        from movies.models import RatingPrior
+        from movies.ratings import PRIOR_PK
+
+        calls.clear()
+        # Flushing after a TransactionTestCase also drops the row the data migration created.
+        RatingPrior.objects.get_or_create(pk=PRIOR_PK)
+
+    def test_once_drains_due_tasks(self):
+        """Test that run_workers --once runs every due task across threads and exits"""
+        for value in range(10):
+            enqueue(record, {"value": value})
+        enqueue(record, {"value": "later"}, delay=60)
+        out = StringIO()
+        call_command("run_workers", "--once", "--threads", "3", "--poll", "0.05", stdout=out)
+        self.assertIn("Ran 10 tasks", out.getvalue())
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_stats_fallback_is_queued(self):
+        """Test that a reaction saved without its loaded values queues a stats recount for the author"""
+        from accounts.models import User, UserStats
+        from movies.models import Movie
+        from reviews.models import Reaction, Review
+
+        author = User.objects.create_user(username="author", email="author@example.com", password="testpass123")
+        fan = User.objects.create_user(username="fan", email="fan@example.com", password="testpass123")
+        review = Review.objects.create(user=author, movie=Movie.objects.create(title="Heat"), rating=5, content="x")
+        Reaction.objects.create(user=fan, review=review, is_like=True)
+        Reaction.objects.filter(review=review).update(is_like=False)
+        Reaction.objects.defer("is_like").get(review=review).save()
+        self.assertEqual(Task.objects.get().key, f"user:{author.pk}")
+
+        call_command("run_workers", "--once", stdout=StringIO())
+        stats = UserStats.objects.get(user=author)
+        self.assertEqual((stats.likes_received, stats.dislikes_received), (0, 1))